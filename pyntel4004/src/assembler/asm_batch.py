@@ -0,0 +1,180 @@
+"""Batch assembly of many source files."""
+
+# Each worker process holds a single Processor, which the assembler needs
+# only for opcode lookups and to receive the assembled program. All output
+# which would normally be printed (listings and errors) is captured per file
+# and returned to the caller as part of the summary.
+
+import contextlib
+import glob
+import io
+import os
+from typing import Tuple
+
+from hardware.processor import Processor
+
+# Processor used by the assemblies in this (worker) process
+_CHIP = None
+
+
+def find_sources(sources: str) -> list:
+    """
+    Find the assembly language source files to assemble.
+
+    Parameters
+    ----------
+    sources: str, mandatory
+        A directory (all .asm files within it are used) or a glob pattern
+
+    Returns
+    -------
+    files: list
+        Sorted list of the source files found
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    if os.path.isdir(sources):
+        sources = os.path.join(sources, '*.asm')
+    return sorted(glob.glob(sources))
+
+
+def init_worker() -> None:
+    """Create the processor used by a worker process."""
+    global _CHIP
+    _CHIP = Processor()
+
+
+def error_lines(listing: str) -> str:
+    """Extract the error messages from the output of an assembly."""
+    errors = [line for line in listing.splitlines()
+              if 'FATAL' in line or 'halted' in line]
+    return '\n'.join(errors)
+
+
+def assemble_one(job: Tuple[str, str, str, str]) -> dict:
+    """
+    Assemble a single source file within a worker process.
+
+    Parameters
+    ----------
+    job: tuple, mandatory
+        (source file, object file, output type, cache directory)
+
+    Returns
+    -------
+    result: dict
+        Summary of the assembly of the source file with the keys
+            program     the source file
+            object      the object file (without extension)
+            result      True if the program assembled correctly
+            error       error message(s) ('' if none)
+            listing     everything output by the assembler
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    from assembler.assemble import assemble  # noqa
+
+    if _CHIP is None:
+        init_worker()
+    program_name, object_file, output_type, cache = job
+
+    # Reset the state which a previous assembly may have left behind
+    _CHIP.write_pin10(0)
+
+    output = io.StringIO()
+    error = ''
+    with contextlib.redirect_stdout(output):
+        try:
+            result = assemble(program_name, object_file, _CHIP, False,
+                              output_type, cache)
+        except Exception as ex:  # noqa
+            result = False
+            error = type(ex).__name__ + ': ' + str(ex)
+    listing = output.getvalue()
+    if not result and error == '':
+        error = error_lines(listing)
+    return {'program': program_name, 'object': object_file,
+            'result': result, 'error': error, 'listing': listing}
+
+
+def assemble_batch(sources: str, output_dir: str, type: str,
+                   quiet: bool, processes: int = 0,
+                   cache: str = '') -> list:
+    """
+    Assemble many source files across a pool of processes.
+
+    Parameters
+    ----------
+    sources: str, mandatory
+        A directory (all .asm files within it are assembled) or a glob pattern
+
+    output_dir: str, mandatory
+        Directory in which to place the object code ('' for alongside
+        each source file)
+
+    type: str, mandatory
+        Determines the type of output file(s) to create.
+
+    quiet: bool, mandatory
+        Determines whether quiet mode is on i.e. no summary is printed
+
+    processes: int, optional
+        Number of worker processes (0 for one per CPU, 1 to assemble
+        within the current process)
+
+    cache: str, optional
+        Directory of the assembly cache ('' to disable the cache)
+
+    Returns
+    -------
+    results: list
+        One summary per source file (see assemble_one), in source order
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    jobs = []
+    for program_name in find_sources(sources):
+        base = os.path.splitext(os.path.basename(program_name))[0]
+        folder = output_dir
+        if folder == '':
+            folder = os.path.dirname(program_name)
+        jobs.append((program_name, os.path.join(folder, base), type, cache))
+    if output_dir != '':
+        os.makedirs(output_dir, exist_ok=True)
+
+    if processes == 0:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(jobs))
+
+    if processes <= 1:
+        init_worker()
+        results = [assemble_one(job) for job in jobs]
+    else:
+        import multiprocessing  # noqa
+        with multiprocessing.Pool(processes, init_worker) as pool:
+            results = pool.map(assemble_one, jobs)
+
+    from shared.shared import print_messages  # noqa
+    print_messages(quiet, 'BATCH', None, results)
+    return results
@@ -0,0 +1,317 @@
+"""Assembly cache supporting functions."""
+
+# The cache is content-addressed: the key is a hash of the source text, the
+# version of the assembler, the requested output type(s) and the name of
+# the object file (which is embedded in the .obj and .h artifacts).
+# Each entry is a directory holding the artifacts produced by the original
+# assembly, plus a small JSON document with the memory image, label table
+# and target location, so that the processor can be loaded without running
+# pass 1 or pass 2.
+
+import hashlib
+import json
+import os
+import shutil
+from typing import Any, Tuple
+
+from hardware.processor import Processor
+
+# Bump when the layout of a cache entry changes
+CACHE_FORMAT = 1
+
+# Default maximum size in bytes of a cache directory
+CACHE_SIZE = 64 * 1024 * 1024
+
+# Name of the metadata document in each cache entry
+CACHE_META = 'meta.json'
+
+# Extensions of the artifacts which may be produced by the assembler, and
+# the output type producing each
+ARTIFACTS = ('.obj', '.bin', '.h')
+ARTIFACT_TYPES = {'.obj': 'OBJ', '.bin': 'BIN', '.h': 'H'}
+
+# Version of the assembler (calculated once, see assembler_version)
+_VERSION = ''
+
+
+def assembler_version() -> str:
+    """
+    Return a version identifier for the assembler.
+
+    Parameters
+    ----------
+    N/A
+
+    Returns
+    -------
+    version: str
+        A hash of the modules which determine the assembled output
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    The identifier is derived from the source of the assembler (its passes
+    and supporting functions), the shared opcode lookups and the opcode
+    table, so that any change to them invalidates the cache without a
+    version number having to be maintained by hand.
+
+    """
+    global _VERSION
+    if _VERSION == '':
+        from assembler import assemble, asm_supporting  # noqa
+        from hardware import opcodes  # noqa
+        from shared import shared  # noqa
+        version = hashlib.sha256(str(CACHE_FORMAT).encode('utf-8'))
+        for module in (assemble, asm_supporting, shared, opcodes):
+            with open(module.__file__, 'rb') as source:
+                version.update(source.read())
+        _VERSION = version.hexdigest()
+    return _VERSION
+
+
+def cache_key(program_name: str, object_file: str, type: str) -> str:
+    """
+    Calculate the cache key of a source file.
+
+    Parameters
+    ----------
+    program_name: str, mandatory
+        Name of the source file to load
+
+    object_file: str, mandatory
+        Name of the output file in which to place the object code
+
+    type: str, mandatory
+        Determines the type of output file(s) to create.
+
+    Returns
+    -------
+    key: str
+        The hexadecimal cache key, or '' if the source cannot be read
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    try:
+        with open(program_name, 'rb') as program:
+            source = program.read()
+    except IOError:
+        return ''
+    key = hashlib.sha256(source)
+    for item in (assembler_version(), type.upper(), object_file):
+        key.update(b'\0' + item.encode('utf-8'))
+    return key.hexdigest()
+
+
+def produced_artifacts(type: str) -> list:
+    """Return the extensions of the artifacts an output type produces."""
+    types = type.upper()
+    return [extension for extension in ARTIFACTS
+            if 'ALL' in types or ARTIFACT_TYPES[extension] in types]
+
+
+def cache_entry(cache: str, key: str) -> str:
+    """Return the directory of a cache entry."""
+    return os.path.join(cache, key)
+
+
+def cache_fetch(cache: str, key: str, chip: Processor,
+                object_file: str) -> Tuple[bool, str, Any]:
+    """
+    Retrieve a previously assembled program from the cache.
+
+    Parameters
+    ----------
+    cache: str, mandatory
+        The cache directory
+
+    key: str, mandatory
+        Cache key of the program (see cache_key)
+
+    chip: Processor, mandatory
+        Instance of a processor to place the assembled code in.
+
+    object_file: str, mandatory
+        Name of the output file in which to place the object code
+
+    Returns
+    -------
+    hit: bool
+        True if the program was found in the cache
+
+    location: str
+        'rom' or 'ram'
+
+    labels: list
+        Label table of the program
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    A hit refreshes the entry so that it is the last to be evicted.
+
+    """
+    entry = cache_entry(cache, key)
+    meta = os.path.join(entry, CACHE_META)
+    try:
+        with open(meta, 'r', encoding='utf-8') as document:
+            data = json.load(document)
+        for extension in data['artifacts']:
+            shutil.copyfile(os.path.join(entry, 'program' + extension),
+                            object_file + extension)
+    except (IOError, ValueError, KeyError):
+        return False, '', []
+
+    # Place assembled code into correct location
+    if data['location'] == 'rom':
+        chip.ROM = data['memory']
+    if data['location'] == 'ram':
+        chip.PRAM = data['memory']
+    chip.write_pin10(data['pin10'])
+
+    # Mark as most recently used
+    os.utime(meta, None)
+    return True, data['location'], data['labels']
+
+
+def cache_store(cache: str, key: str, chip: Processor, location: str,
+                tps: list, _labels: list, object_file: str, type: str,
+                cache_size: int = CACHE_SIZE) -> bool:
+    """
+    Place a newly assembled program in the cache.
+
+    Parameters
+    ----------
+    cache: str, mandatory
+        The cache directory
+
+    key: str, mandatory
+        Cache key of the program (see cache_key)
+
+    chip: Processor, mandatory
+        Instance of a processor containing the assembled code.
+
+    location: str, mandatory
+        'rom' or 'ram'
+
+    tps: list, mandatory
+        Assembled code
+
+    _labels: list, mandatory
+        Label table
+
+    object_file: str, mandatory
+        Name of the output file containing the object code
+
+    type: str, mandatory
+        The type of output file(s) created (only those are stored)
+
+    cache_size: int, optional
+        Maximum size of the cache directory in bytes
+
+    Returns
+    -------
+    True if the program was stored, False otherwise
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    The entry is written to a temporary directory first and then renamed,
+    so that concurrent builds sharing a cache never see a partial entry.
+
+    """
+    entry = cache_entry(cache, key)
+    staging = entry + '.' + str(os.getpid()) + '.tmp'
+    artifacts = []
+    try:
+        os.makedirs(staging, exist_ok=True)
+        for extension in produced_artifacts(type):
+            if os.path.isfile(object_file + extension):
+                shutil.copyfile(object_file + extension,
+                                os.path.join(staging, 'program' + extension))
+                artifacts.append(extension)
+        data = {'location': location, 'labels': _labels,
+                'pin10': chip.read_pin10(), 'artifacts': artifacts,
+                'memory': list(tps)}
+        with open(os.path.join(staging, CACHE_META), 'w',
+                  encoding='utf-8') as document:
+            json.dump(data, document)
+        if os.path.isdir(entry):
+            shutil.rmtree(entry, ignore_errors=True)
+        os.replace(staging, entry)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+        return False
+    evict(cache, cache_size)
+    return True
+
+
+def entry_size(entry: str) -> int:
+    """Return the number of bytes used by a cache entry."""
+    size = 0
+    for name in os.listdir(entry):
+        size = size + os.path.getsize(os.path.join(entry, name))
+    return size
+
+
+def evict(cache: str, cache_size: int = CACHE_SIZE) -> int:
+    """
+    Evict the least recently used entries until the cache fits its size.
+
+    Parameters
+    ----------
+    cache: str, mandatory
+        The cache directory
+
+    cache_size: int, optional
+        Maximum size of the cache directory in bytes
+
+    Returns
+    -------
+    evicted: int
+        The number of entries removed from the cache
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    The last use of an entry is the modification time of its metadata
+    document, which is refreshed on every hit.
+
+    """
+    entries = []
+    total = 0
+    for name in os.listdir(cache):
+        entry = os.path.join(cache, name)
+        meta = os.path.join(entry, CACHE_META)
+        if name.endswith('.tmp') or not os.path.isfile(meta):
+            continue
+        size = entry_size(entry)
+        entries.append((os.path.getmtime(meta), size, entry))
+        total = total + size
+
+    evicted = 0
+    for _mtime, size, entry in sorted(entries):
+        if total <= cache_size:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total = total - size
+        evicted = evicted + 1
+    return evicted
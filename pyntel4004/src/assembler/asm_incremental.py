@@ -0,0 +1,445 @@
+"""Incremental reassembly supporting functions."""
+
+# An incremental assembly keeps, for every line of the program, its tokens,
+# address, size, assembled code and the labels it refers to, together with
+# the label table and the memory image.
+#
+# When the program is edited, only the lines which have changed and the
+# instructions whose label operands have moved are re-encoded (using the
+# same pass 2 functions as the full assembler); all other instructions keep
+# their previously assembled code and are simply moved if their address has
+# changed. A copy of the memory image is patched, and the copy (with the new
+# lines) becomes the state only once pass 2 has succeeded.
+#
+# The same-page constraint of JCN and ISZ (the destination must be on the
+# same page as the instruction which follows) is only rechecked for the
+# instructions which have been re-encoded or moved.
+
+from typing import Any, Tuple
+
+from hardware.processor import Processor
+from assembler.asm_supporting import asm_main, pass0  # noqa
+from shared.shared import get_opcodeinfo  # noqa
+
+# Pseudo-opcodes (directives)
+PSEUDO = ('org', 'end', 'pin', '=')
+
+# Instructions whose 8-bit destination must be on the same page
+SAME_PAGE = ('jcn', 'isz')
+
+
+def opcode_words(chip: Processor, opcode: str) -> int:
+    """
+    Return the number of words used by a (short) mnemonic.
+
+    Parameters
+    ----------
+    chip: Processor, mandatory
+        The instance of the processor containing the instruction table
+
+    opcode: str, mandatory
+        The mnemonic (e.g. 'ldm', 'jun', 'ld')
+
+    Returns
+    -------
+    words: int
+        The number of words, or -1 if the mnemonic is invalid
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    if opcode == 'ld':
+        opcode = 'ld '
+    opcodeinfo = get_opcodeinfo(chip, 'S', opcode[:3])
+    if opcodeinfo['opcode'] == -1:
+        return -1
+    return opcodeinfo['words']
+
+
+def parse_line(chip: Processor, line: str, count: int) -> Tuple[Any, dict]:
+    """
+    Break a line of assembly language into its components.
+
+    Parameters
+    ----------
+    chip: Processor, mandatory
+        The instance of the processor containing the instruction table
+
+    line: str, mandatory
+        Line of program code (stripped)
+
+    count: int, mandatory
+        Current assembly program line
+
+    Returns
+    -------
+    err:
+        False if no error, error text if error
+
+    entry: dict
+        The line's components:
+            line        the line of code
+            tokens      the line split into its component parts
+            label       any label defined on the line ('' if none)
+            opcode      the opcode or pseudo-opcode ('' for a comment)
+            words       number of words of memory the line occupies
+            value       value of a label defined by '='
+            refs        labels referred to by the operands
+            address     address of the line (see place_entries)
+            code        assembled code (see encode_entry)
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    err = False
+    x = line.split()
+    entry = {'line': line, 'tokens': x, 'label': '', 'opcode': '',
+             'words': 0, 'value': -1, 'refs': [], 'address': 0,
+             'code': []}
+    if line[0] == '/':
+        return err, entry
+
+    operands = x[1:]
+    if x[0][-1] == ',':
+        entry['label'] = x[0]
+        operands = x[2:]
+    if len(x) < 2 and entry['label'] != '':
+        err = "FATAL: Pass 1:  Label without an instruction at line: " + \
+            str(count + 1)
+        return err, entry
+    opcode = x[1] if entry['label'] != '' else x[0]
+    entry['opcode'] = opcode
+
+    if opcode == '=':
+        entry['value'] = int(x[2])
+    elif opcode not in PSEUDO:
+        words = opcode_words(chip, opcode)
+        if words == -1:
+            err = "FATAL: Pass 1:  Invalid mnemonic '" + \
+                opcode + "' at line: " + str(count + 1)
+        entry['words'] = words
+        entry['refs'] = [operand + ',' for operand in operands]
+    return err, entry
+
+
+def place_entries(entries: list, start: int) -> Tuple[Any, dict, list]:
+    """
+    Calculate the addresses of the lines and the resulting label table.
+
+    Parameters
+    ----------
+    entries: list, mandatory
+        The components of each line (see parse_line)
+
+    start: int, mandatory
+        Index of the first entry whose address may have changed
+
+    Returns
+    -------
+    err:
+        False if no error, error text if error
+
+    labels: dict
+        label --> address (or value for a label defined by '=')
+
+    moved: list
+        Indexes of the entries (from start onwards) whose address changed
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    Addresses are calculated in the same way as pass 2: an "org" directive
+    resets the address, and "end" occupies no memory.
+
+    """
+    err = False
+    labels = {}
+    moved = []
+    address = 0
+    org_found = False
+    for index, entry in enumerate(entries):
+        opcode = entry['opcode']
+        if opcode == 'org':
+            org_found = True
+            target = entry['tokens'][-1]
+            address = 0 if target in ('rom', 'ram') else int(target)
+        elif opcode not in ('', '=', 'pin', 'end') and not org_found:
+            err = "FATAL: Pass 2: No 'org'" + \
+                " found at line: " + str(index + 1)
+            break
+        if index >= start and entry['address'] != address:
+            moved.append(index)
+        entry['address'] = address
+        if entry['label'] != '':
+            if entry['label'] in labels:
+                err = 'FATAL: Pass 1: Duplicate label: ' + \
+                    entry['label'] + ' at line ' + str(index + 1)
+                break
+            if opcode == '=':
+                labels[entry['label']] = entry['value']
+            else:
+                labels[entry['label']] = address
+        address = address + entry['words']
+    return err, labels, moved
+
+
+def check_page(entry: dict, labels: dict, count: int) -> Any:
+    """
+    Check that a JCN/ISZ destination is on the same page as the instruction.
+
+    Parameters
+    ----------
+    entry: dict, mandatory
+        The components of the line (see parse_line)
+
+    labels: dict, mandatory
+        label --> address
+
+    count: int, mandatory
+        Current assembly program line
+
+    Returns
+    -------
+    err:
+        False if no error, error text if error
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    The page is that of the instruction following the JCN/ISZ, so that a
+    JCN/ISZ occupying the last two words of a page jumps into the next page.
+
+    """
+    if entry['opcode'] not in SAME_PAGE:
+        return False
+    destination = entry['tokens'][-1] + ','
+    if destination not in labels:
+        return False
+    page = (entry['address'] + 2) // Processor.PAGE_SIZE
+    if labels[destination] // Processor.PAGE_SIZE != page:
+        return "FATAL: Pass 2: Label '" + destination[:-1] + \
+            "' is not on the same page as the instruction at line: " + \
+            str(count + 1)
+    return False
+
+
+def encode_entry(chip: Processor, entry: dict, _labels: list,
+                 memory: list, count: int, location: str) -> Tuple[Any, str]:
+    """
+    Assemble a single line into memory (pass 2).
+
+    Parameters
+    ----------
+    chip: Processor, mandatory
+        The instance of the processor containing the instruction table
+
+    entry: dict, mandatory
+        The components of the line (see parse_line)
+
+    _labels: list, mandatory
+        Label table (in the format used by the assembler)
+
+    memory: list, mandatory
+        The memory image to assemble into
+
+    count: int, mandatory
+        Current assembly program line
+
+    location: str, mandatory
+        'rom' or 'ram'
+
+    Returns
+    -------
+    err:
+        False if no error, error text if error
+
+    location: str
+        'rom' or 'ram' (changed by an "org" directive)
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    The assembled code is also recorded in the entry, so that it can be
+    moved without being re-encoded.
+
+    """
+    opcode = entry['opcode']
+    address = entry['address']
+    if opcode == '':
+        return False, location
+    x = list(entry['tokens'])
+    label = entry['label']
+    opcodeinfo = get_opcodeinfo(chip, 'S', opcode)
+    _, _, _, _, _, _, _, _, err, _, new_location = \
+        asm_main(chip, x, _labels, address, memory, opcode, opcodeinfo,
+                 label, count, True, location, True)
+    if opcode == 'end':
+        entry['code'] = [memory[address]]
+    else:
+        entry['code'] = memory[address:address + entry['words']]
+    if opcode == 'org':
+        location = new_location
+    return err, location
+
+
+def assemble_incremental(chip: Processor, lines: list,
+                         state: dict = None) -> Tuple[Any, dict]:
+    """
+    Assemble a program, reusing the result of a previous assembly.
+
+    Parameters
+    ----------
+    chip: Processor, mandatory
+        Instance of a processor to place the assembled code in.
+
+    lines: list, mandatory
+        The lines of the program
+
+    state: dict, optional
+        The state returned by the previous assembly of the program
+        (None for a full assembly)
+
+    Returns
+    -------
+    err:
+        False if no error, error text if error
+
+    state: dict
+        The state to supply to the next assembly of the program:
+            lines       the (stripped, non-blank) lines of the program
+            entries     the components of each line (see parse_line)
+            labels      label --> address
+            memory      the memory image
+            location    'rom' or 'ram'
+            encoded     number of lines re-encoded by this assembly
+            moved       number of lines moved by this assembly
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    If an error is found (in pass 1, in the label table, by the same-page
+    checks or in pass 2, including any exception raised while encoding a
+    line), the previous state is returned unchanged and the processor's
+    memory is left as it was.
+
+    """
+    #     mccabe: MC0001 / assemble_incremental is too complex (12)
+    lines = [line.strip() for line in lines if line.strip() != '']
+    if state is None:
+        _lbls, memory, _tfile = pass0(chip)
+        state = {'lines': [], 'entries': [], 'labels': {},
+                 'memory': memory, 'location': '',
+                 'encoded': 0, 'moved': 0}
+    old_lines = state['lines']
+    old_entries = state['entries']
+
+    # Find the region of the program which has changed
+    limit = min(len(lines), len(old_lines))
+    prefix = 0
+    while prefix < limit and lines[prefix] == old_lines[prefix]:
+        prefix = prefix + 1
+    suffix = 0
+    while suffix < limit - prefix and \
+            lines[-1 - suffix] == old_lines[-1 - suffix]:
+        suffix = suffix + 1
+
+    # Pass 1 - only for the changed lines
+    changed = []
+    for count in range(prefix, len(lines) - suffix):
+        err, entry = parse_line(chip, lines[count], count)
+        if err:
+            return err, state
+        changed.append(entry)
+    kept = [dict(entry) for entry in old_entries[len(old_lines) - suffix:]]
+    entries = [dict(entry) for entry in old_entries[:prefix]] + changed + kept
+    err, labels, moved = place_entries(entries, prefix)
+    if err:
+        return err, state
+
+    # Labels whose address (or value) has changed
+    old_labels = state['labels']
+    changed_labels = set(label for label in labels
+                         if old_labels.get(label) != labels[label])
+    changed_labels.update(set(old_labels) - set(labels))
+
+    new_first = prefix + len(changed)
+    moved = [index for index in moved if index >= new_first]
+    encode = set(range(prefix, new_first))
+    for index, entry in enumerate(entries):
+        if index not in encode and changed_labels.intersection(entry['refs']):
+            encode.add(index)
+
+    # Recheck the same-page constraints where needed
+    for index in sorted(encode.union(moved)):
+        err = check_page(entries[index], labels, index)
+        if err:
+            return err, state
+
+    # Remove the code of the lines which have changed or moved
+    memory = list(state['memory'])
+    stale = old_entries[prefix:len(old_lines) - suffix] + \
+        [old_entries[len(old_lines) - suffix + index - new_first]
+         for index in moved]
+    for entry in stale:
+        for offset in range(len(entry['code'])):
+            memory[entry['address'] + offset] = 0
+
+    # Move the lines which only changed address
+    for index in moved:
+        entry = entries[index]
+        if index not in encode:
+            for offset, code in enumerate(entry['code']):
+                memory[entry['address'] + offset] = code
+
+    # Pass 2 - only for the lines which have changed or whose labels moved
+    _labels = [{'label': label, 'address': labels[label]}
+               for label in labels]
+    location = ''
+    for index, entry in enumerate(entries):
+        if index in encode:
+            try:
+                err, location = encode_entry(chip, entry, _labels, memory,
+                                             index, location)
+            except Exception as ex:  # noqa
+                err = 'FATAL: Pass 2: ' + type(ex).__name__ + ': ' + \
+                    str(ex) + ' at line: ' + str(index + 1)
+            if err:
+                return err, state
+        elif entry['opcode'] == 'org':
+            target = entry['tokens'][-1]
+            location = target if target in ('rom', 'ram') else 'ram'
+
+    # Place assembled code into correct location
+    if location == 'rom':
+        chip.ROM = memory
+    if location == 'ram':
+        chip.PRAM = memory
+
+    state = {'lines': lines, 'entries': entries, 'labels': labels,
+             'memory': memory, 'location': location,
+             'encoded': len(encode), 'moved': len(moved)}
+    return False, state
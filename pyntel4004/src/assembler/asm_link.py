@@ -0,0 +1,453 @@
+"""Relocatable object modules and linker supporting functions."""
+
+# A relocatable module is assembled as if it started at address 0 and
+# contains no "org" directive. Alongside the code it records:
+#
+#   symbols         label --> offset of each label defined in the module
+#   externals       labels referred to but not defined in the module
+#   relocations     the instructions whose operand is a label:
+#                       offset  offset of the (2 word) instruction
+#                       type    'abs12' for JUN/JMS (12-bit address)
+#                               'page8' for JCN/ISZ (8-bit same-page address)
+#                       symbol  the label referred to
+#                       local   True if the label is defined in the module
+#
+# The linker lays the modules out one after another, moving a module which
+# contains same-page references to the start of the next page (rather than
+# let it straddle a page boundary), resolves the symbols across the modules
+# and patches each relocation. Library modules are only linked in when they
+# define a symbol which is otherwise undefined.
+
+import json
+import os
+from typing import Any, Tuple
+
+from hardware.processor import Processor
+from assembler.asm_incremental import encode_entry, parse_line  # noqa
+from assembler.asm_supporting import pass0  # noqa
+
+# Bump when the layout of a relocatable module changes
+MODULE_FORMAT = 1
+
+# Extension of relocatable module files
+MODULE_EXTENSION = '.rel'
+
+# Relocation types by mnemonic
+RELOCATIONS = {'jun': 'abs12', 'jms': 'abs12',
+               'jcn': 'page8', 'isz': 'page8'}
+
+
+def module_entries(chip: Processor, lines: list) \
+        -> Tuple[Any, list, dict, dict]:
+    """
+    Pass 1 for a relocatable module.
+
+    Parameters
+    ----------
+    chip: Processor, mandatory
+        The instance of the processor containing the instruction table
+
+    lines: list, mandatory
+        The lines of the module
+
+    Returns
+    -------
+    err:
+        False if no error, error text if error
+
+    entries: list
+        The components of each line (see asm_incremental.parse_line)
+
+    labels: dict
+        label --> offset
+
+    constants: dict
+        label --> value (for a label defined by '=')
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    entries = []
+    labels = {}
+    constants = {}
+    address = 0
+    for count, line in enumerate(lines):
+        err, entry = parse_line(chip, line, count)
+        if err:
+            return err, entries, labels, constants
+        if entry['opcode'] in ('org', 'pin'):
+            err = "FATAL: Pass 1: '" + entry['opcode'] + \
+                "' is not permitted in a relocatable module at line: " + \
+                str(count + 1)
+            return err, entries, labels, constants
+        entry['address'] = address
+        if entry['label'] != '':
+            if entry['label'] in labels or entry['label'] in constants:
+                err = 'FATAL: Pass 1: Duplicate label: ' + \
+                    entry['label'] + ' at line ' + str(count + 1)
+                return err, entries, labels, constants
+            if entry['opcode'] == '=':
+                constants[entry['label']] = entry['value']
+            else:
+                labels[entry['label']] = address
+        address = address + entry['words']
+        entries.append(entry)
+    return False, entries, labels, constants
+
+
+def assemble_module(chip: Processor, program_name: str,
+                    module_file: str = '') -> Tuple[Any, dict]:
+    """
+    Assemble a source file into a relocatable module.
+
+    Parameters
+    ----------
+    chip: Processor, mandatory
+        The instance of the processor containing the instruction table
+
+    program_name: str, mandatory
+        Name of the source file
+
+    module_file: str, optional
+        Name of the module file to write (without extension), '' for none
+
+    Returns
+    -------
+    err:
+        False if no error, error text if error
+
+    module: dict
+        The relocatable module:
+            format          version of the module layout
+            module          name of the module
+            code            the assembled code (offset 0 onwards)
+            symbols         label --> offset
+            externals       labels used, but not defined, by the module
+            relocations     instructions to patch when linking
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    The code of a module which ends with an "end" directive includes the
+    "end" pseudo-opcode, so that the linked program stops there.
+
+    """
+    with open(program_name, 'r', encoding='utf-8') as source:
+        lines = [line.strip() for line in source if line.strip() != '']
+    name = os.path.splitext(os.path.basename(program_name))[0]
+    module = {'format': MODULE_FORMAT, 'module': name, 'code': [],
+              'symbols': {}, 'externals': [], 'relocations': []}
+
+    err, entries, labels, constants = module_entries(chip, lines)
+    if err:
+        return err, module
+
+    # Labels which are referred to but not defined are external: assemble
+    # them as address 0, as the linker will patch them.
+    externals = []
+    for entry in entries:
+        if entry['opcode'] in RELOCATIONS:
+            symbol = entry['tokens'][-1] + ','
+            if symbol not in labels and symbol not in constants and \
+                    symbol not in externals:
+                externals.append(symbol)
+    _labels = [{'label': label, 'address': address}
+               for label, address in list(labels.items()) +
+               list(constants.items())]
+    _labels = _labels + [{'label': label, 'address': 0}
+                         for label in externals]
+
+    # Pass 2
+    _lbls, memory, _tfile = pass0(chip)
+    size = 0
+    for count, entry in enumerate(entries):
+        err, _location = encode_entry(chip, entry, _labels, memory,
+                                      count, 'rom')
+        if err:
+            return err, module
+        size = max(size, entry['address'] + len(entry['code']))
+        opcode = entry['opcode']
+        symbol = entry['tokens'][-1] + ','
+        if opcode in RELOCATIONS and symbol not in constants:
+            module['relocations'].append(
+                {'offset': entry['address'], 'type': RELOCATIONS[opcode],
+                 'symbol': symbol[:-1], 'local': symbol in labels})
+
+    module['code'] = memory[:size]
+    module['symbols'] = dict((label[:-1], labels[label]) for label in labels)
+    module['externals'] = [label[:-1] for label in externals]
+    if module_file != '':
+        write_module(module, module_file)
+    return False, module
+
+
+def write_module(module: dict, module_file: str) -> bool:
+    """Write a relocatable module to a file (JSON format)."""
+    with open(module_file + MODULE_EXTENSION, 'w', encoding='utf-8') as rel:
+        json.dump(module, rel)
+    return True
+
+
+def read_module(module_file: str) -> dict:
+    """Read a relocatable module from a file (JSON format)."""
+    with open(module_file, 'r', encoding='utf-8') as rel:
+        return json.load(rel)
+
+
+def load_modules(modules: list) -> list:
+    """Load any modules supplied as file names (dicts are passed through)."""
+    return [read_module(module) if isinstance(module, str) else module
+            for module in modules]
+
+
+def select_modules(objects: list, libraries: list) -> Tuple[Any, list]:
+    """
+    Select the modules to link.
+
+    Parameters
+    ----------
+    objects: list, mandatory
+        Modules which are always linked
+
+    libraries: list, mandatory
+        Modules which are linked only if they define an undefined symbol
+
+    Returns
+    -------
+    err:
+        False if no error, error text if error
+
+    modules: list
+        The modules to link, in link order
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    Library modules are searched in the order supplied.
+
+    """
+    modules = list(objects)
+    pending = list(libraries)
+    while True:
+        defined = set()
+        for module in modules:
+            defined.update(module['symbols'])
+        undefined = [(symbol, module['module']) for module in modules
+                     for symbol in module['externals']
+                     if symbol not in defined]
+        if undefined == []:
+            return False, modules
+        symbol, name = undefined[0]
+        library = next((module for module in pending
+                        if symbol in module['symbols']), None)
+        if library is None:
+            err = "FATAL: Link: Undefined symbol '" + symbol + \
+                "' in module '" + name + "'"
+            return err, modules
+        pending.remove(library)
+        modules.append(library)
+
+
+def layout_modules(modules: list, memory_size: int) -> Tuple[Any, list]:
+    """
+    Calculate the base address of each module.
+
+    Parameters
+    ----------
+    modules: list, mandatory
+        The modules to link, in link order
+
+    memory_size: int, mandatory
+        The size of the memory to link into
+
+    Returns
+    -------
+    err:
+        False if no error, error text if error
+
+    bases: list
+        The base address of each module
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    A module with same-page (JCN/ISZ) references is not allowed to cross a
+    page boundary unless it is larger than a page, in which case it starts
+    on a page boundary to keep its internal page layout.
+
+    """
+    page_size = Processor.PAGE_SIZE
+    bases = []
+    address = 0
+    for module in modules:
+        size = len(module['code'])
+        same_page = any(relocation['type'] == 'page8'
+                        for relocation in module['relocations'])
+        offset = address % page_size
+        if same_page and offset != 0 and \
+                (offset + size > page_size or size > page_size):
+            address = address - offset + page_size
+        if address + size > memory_size:
+            err = "FATAL: Link: Module '" + module['module'] + \
+                "' does not fit in memory"
+            return err, bases
+        bases.append(address)
+        address = address + size
+    return False, bases
+
+
+def global_symbols(modules: list, bases: list) -> dict:
+    """Build the table of symbol --> list of absolute addresses."""
+    symbols = {}
+    for module, base in zip(modules, bases):
+        for symbol, offset in module['symbols'].items():
+            symbols.setdefault(symbol, []).append(base + offset)
+    return symbols
+
+
+def relocate(memory: list, module: dict, base: int,
+             symbols: dict) -> Any:
+    """
+    Place a module into memory and patch its relocations.
+
+    Parameters
+    ----------
+    memory: list, mandatory
+        The memory image being linked
+
+    module: dict, mandatory
+        The module to place
+
+    base: int, mandatory
+        The base address of the module
+
+    symbols: dict, mandatory
+        symbol --> list of the absolute addresses defining it
+
+    Returns
+    -------
+    err:
+        False if no error, error text if error
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    name = module['module']
+    memory[base:base + len(module['code'])] = module['code']
+    for relocation in module['relocations']:
+        address = base + relocation['offset']
+        symbol = relocation['symbol']
+        if relocation['local']:
+            target = base + module['symbols'][symbol]
+        elif len(symbols[symbol]) > 1:
+            return "FATAL: Link: Symbol '" + symbol + \
+                "' is defined in more than one module (used by module '" + \
+                name + "')"
+        else:
+            target = symbols[symbol][0]
+        if relocation['type'] == 'abs12':
+            memory[address] = (memory[address] & 0xF0) | (target >> 8)
+        elif (address + 2) // Processor.PAGE_SIZE != \
+                target // Processor.PAGE_SIZE:
+            return "FATAL: Link: Symbol '" + symbol + \
+                "' is not on the same page as the instruction at " + \
+                "address " + str(address) + " (module '" + name + "')"
+        memory[address + 1] = target & 0xFF
+    return False
+
+
+def link(chip: Processor, objects: list, object_file: str, quiet: bool,
+         type: str, libraries: list = None) -> Tuple[Any, list]:
+    """
+    Link relocatable modules into a program in ROM.
+
+    Parameters
+    ----------
+    chip: Processor, mandatory
+        Instance of a processor to place the linked program in.
+
+    objects: list, mandatory
+        The modules to link (module dicts or module file names). The first
+        module is placed at address 0.
+
+    object_file: str, mandatory
+        The name of the object file(s) to write, '' for none
+
+    quiet: bool, mandatory
+        Determines whether quiet mode is on i.e. no labels are printed
+
+    type: str, mandatory
+        Determines the type of output file(s) to create.
+
+    libraries: list, optional
+        Library modules (module dicts or module file names), linked only
+        when needed to resolve a symbol
+
+    Returns
+    -------
+    err:
+        False if no error, error text if error
+
+    _labels: list
+        Label table of the linked program
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    from assembler.asm_supporting import wrap_up  # noqa
+    from shared.shared import print_messages  # noqa
+
+    objects = load_modules(objects)
+    libraries = load_modules(libraries or [])
+    err, modules = select_modules(objects, libraries)
+    if err:
+        return err, []
+
+    _lbls, memory, _tfile = pass0(chip)
+    err, bases = layout_modules(modules, chip.MEMORY_SIZE_ROM)
+    if err:
+        return err, []
+    symbols = global_symbols(modules, bases)
+    _labels = []
+    for module, base in zip(modules, bases):
+        err = relocate(memory, module, base, symbols)
+        if err:
+            return err, []
+        for symbol, offset in module['symbols'].items():
+            if len(symbols[symbol]) == 1:
+                _labels.append({'label': symbol + ',',
+                                'address': base + offset})
+
+    if object_file == '':
+        chip.ROM = memory
+        print_messages(quiet, 'LABELS', chip, _labels)
+    else:
+        wrap_up(chip, 'rom', memory, _labels, object_file, quiet, type)
+    return False, _labels
@@ -0,0 +1,593 @@
+"""Superoptimisation of short straight-line instruction sequences."""
+
+# A sequence of assembly language lines is replaced by the cheapest
+# sequence (in words, or in instruction cycles) which leaves the same values
+# in its live-out items (accumulator, carry and index registers) for every
+# value of its live-in items.
+#
+# Only instructions without side effects - those which read and write just
+# the accumulator, carry and index registers - are considered, and each is
+# evaluated by table lookup: its effect on every value of the accumulator,
+# carry and its index register is computed once, by executing it on a
+# Processor (so the search follows the processor's own semantics). A state
+# is an int: the accumulator (bits 0-3), carry (bit 4) and then each index
+# register used (4 bits each, in register order), and the state each
+# instruction leaves is remembered for every state it is applied to.
+#
+# The candidates are the instructions of the opcode table (one word, no
+# FIM) which use only the registers of the sequence, its live items and any
+# scratch registers given; any other instructions may be supplied instead.
+#
+# The search is breadth-first by cost. Every sequence is evaluated on a
+# small set of test inputs (SEARCH_TESTS, drawn from the full set), and a
+# sequence reaching the same states, by digest, as a cheaper one already
+# found is pruned. A sequence whose live-out items match the original on
+# the test inputs is then checked against the full set: every combination
+# of the live-in items if there are at most EXHAUSTIVE_TESTS, otherwise
+# RANDOM_TESTS random ones. Items which are not live-in take random values
+# in each test, so a sequence depending upon them is rejected.
+#
+# Each level of the search is expanded across a pool of processes.
+
+# Import system modules
+import array
+import hashlib
+import itertools
+import os
+import random
+
+from hardware.processor import Processor
+
+# Instructions which may be evaluated (without side effects)
+SUPEROPT_INSTRUCTIONS = ('nop', 'ldm', 'ld', 'xch', 'inc', 'add', 'sub',
+                         'fim', 'clb', 'clc', 'iac', 'cmc', 'cma', 'ral',
+                         'rar', 'tcc', 'dac', 'tcs', 'stc', 'daa', 'kbp')
+
+# Instructions never worth a place in a candidate sequence
+SUPEROPT_EXCLUDED = ('nop', 'fim')
+
+# Test inputs on which every sequence searched is evaluated
+SEARCH_TESTS = 32
+
+# Most live-in combinations tested exhaustively
+EXHAUSTIVE_TESTS = 65536
+
+# Random test inputs used if there are too many combinations
+RANDOM_TESTS = 4096
+
+# Most distinct states searched
+MAX_SEARCH_STATES = 500000
+
+# Sequences expanded by a single job
+SUPEROPT_CHUNK = 2048
+
+# Search compiled by a worker process
+_SEARCH = None
+
+
+def item_bits(item: str, registers: tuple) -> tuple:
+    """Return the first bit and number of bits of a live item in a state."""
+    if item == 'ACC':
+        return 0, 4
+    if item == 'CARRY':
+        return 4, 1
+    if item[:1] == 'R' and item[1:].isdigit() and \
+            int(item[1:]) in registers:
+        return 5 + 4 * registers.index(int(item[1:])), 4
+    raise ValueError('Unknown item: ' + item)
+
+
+def parse_lines(chip: Processor, lines: list) -> list:
+    """
+    Assemble a sequence of instructions.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the instruction table
+
+    lines: list, mandatory
+        The lines of the sequence (without 'org' or 'end')
+
+    Returns
+    -------
+    codes: list
+        The code (word or words) of each instruction
+
+    Raises
+    ------
+    ValueError
+        if the lines do not assemble, or hold an instruction with side
+        effects (or a label, or a branch)
+
+    Notes
+    -----
+    N/A
+
+    """
+    from assembler.asm_incremental import assemble_incremental  # noqa
+    from executer.exe_fast import decode_entry  # noqa
+
+    err, state = assemble_incremental(chip, ['org rom'] + list(lines) +
+                                      ['end'])
+    if err:
+        raise ValueError(err)
+    memory = state['memory']
+    codes = []
+    address = 0
+    while memory[address] != 256:
+        code, name, _operation, _arguments, words, _cycles, _target = \
+            decode_entry(chip, memory, address)
+        if name not in SUPEROPT_INSTRUCTIONS:
+            raise ValueError('Instruction with side effects: ' + name)
+        codes.append(code)
+        address = address + words
+    return codes
+
+
+def compile_instruction(chip: Processor, code: tuple,
+                        registers: tuple) -> dict:
+    """
+    Compile an instruction into a table of its effects.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        A processor on which the instruction is executed
+
+    code: tuple, mandatory
+        The word (or words) of the instruction
+
+    registers: tuple, mandatory
+        The index registers held in a state
+
+    Returns
+    -------
+    instruction: dict
+        code, line (the assembly language), words, cycles, shift (the first
+        bit of its register in a state, or None), table (for every value of
+        the accumulator, carry and register: the values it leaves, or None
+        if it fails) and memo (state --> the state it leaves); for FIM,
+        value (the bits it sets in a state) instead of the table
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    from executer.exe_fast import decode_entry  # noqa
+
+    memory = list(code) + [0, 0]
+    _code, name, operation, arguments, words, cycles, _target = \
+        decode_entry(chip, memory, 0)
+    instruction = {'code': code, 'words': words, 'cycles': cycles,
+                   'shift': None, 'table': None, 'value': None, 'memo': {},
+                   'line': ' '.join([name] + [str(argument) for argument in
+                                              arguments])}
+    if name == 'fim':
+        shift = item_bits('R' + str(arguments[0] * 2), registers)[0]
+        high, low = divmod(arguments[1], 16)
+        instruction.update({'line': 'fim ' + str(arguments[0]) + 'p ' +
+                            str(arguments[1]), 'shift': shift,
+                            'value': (high << shift) | (low << (shift + 4))})
+        return instruction
+    register = arguments[0] if name in ('ld', 'xch', 'inc', 'add',
+                                        'sub') else None
+    table = []
+    for accumulator, carry, value in itertools.product(range(16), range(2),
+                                                       range(16)):
+        chip.ACCUMULATOR = accumulator
+        chip.CARRY = carry
+        chip.PROGRAM_COUNTER = 0
+        if register is not None:
+            chip.REGISTERS[register] = value
+        try:
+            operation(*arguments)
+        except Exception:  # noqa
+            table.append(None)
+            continue
+        result = (chip.ACCUMULATOR, chip.CARRY,
+                  value if register is None else chip.REGISTERS[register])
+        valid = 0 <= result[0] <= 15 and result[1] in (0, 1) and \
+            0 <= result[2] <= 15
+        table.append(result if valid else None)
+    if register is not None:
+        instruction['shift'] = item_bits('R' + str(register), registers)[0]
+    instruction['table'] = table
+    return instruction
+
+
+def step(instruction: dict, state: int):
+    """Return the state after an instruction (None if it fails)."""
+    memo = instruction['memo']
+    if state in memo:
+        return memo[state]
+    shift = instruction['shift']
+    if instruction['table'] is None:
+        new = (state & ~(255 << shift)) | instruction['value']
+    else:
+        value = 0 if shift is None else (state >> shift) & 15
+        result = instruction['table'][
+            ((state & 15) * 2 + ((state >> 4) & 1)) * 16 + value]
+        if result is None:
+            new = None
+        else:
+            new = (state & ~31) | result[0] | (result[1] << 4)
+            if shift is not None:
+                new = (new & ~(15 << shift)) | (result[2] << shift)
+    memo[state] = new
+    return new
+
+
+def run_sequence(instructions: list, states: list):
+    """Return the states after a sequence (None if it fails for any)."""
+    for instruction in instructions:
+        states = [step(instruction, state) for state in states]
+        if None in states:
+            return None
+    return states
+
+
+def states_digest(states: list) -> bytes:
+    """Return a digest of the states reached on the test inputs."""
+    try:
+        packed = array.array('Q', states).tobytes()
+    except OverflowError:
+        packed = repr(states).encode('utf-8')
+    return hashlib.blake2b(packed, digest_size=16).digest()
+
+
+def compile_search(spec: tuple) -> dict:
+    """Compile the candidate instructions of a search."""
+    candidates, registers, objective = spec
+    chip = Processor()
+    return {'instructions': [compile_instruction(chip, code, registers)
+                             for code in candidates],
+            'objective': objective}
+
+
+def init_worker(spec: tuple) -> None:
+    """Compile the search used by a worker process."""
+    global _SEARCH
+    _SEARCH = compile_search(spec)
+
+
+def expand_chunk(job: tuple) -> list:
+    """
+    Extend each of a chunk of sequences by every candidate instruction.
+
+    Parameters
+    ----------
+    job: tuple, mandatory
+        The sequences (each a tuple of indices of candidates, with its
+        states on the test inputs) and the highest cost worth searching
+
+    Returns
+    -------
+    found: list
+        For each sequence reached: its indices, cost, states and their
+        digest (sequences reaching the same states as another in the
+        chunk at no lower cost are left out)
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    entries, limit = job
+    instructions = _SEARCH['instructions']
+    objective = _SEARCH['objective']
+    found = {}
+    for sequence, cost, states in entries:
+        for index, instruction in enumerate(instructions):
+            new_cost = cost + instruction[objective]
+            if new_cost > limit:
+                continue
+            memo = instruction['memo']
+            new_states = [memo[state] if state in memo else
+                          step(instruction, state) for state in states]
+            if None in new_states:
+                continue
+            digest = states_digest(new_states)
+            if digest in found and found[digest][1] <= new_cost:
+                continue
+            found[digest] = (sequence + (index,), new_cost, new_states)
+    return [(sequence, cost, states, digest)
+            for digest, (sequence, cost, states) in found.items()]
+
+
+def instruction_registers(chip: Processor, code: tuple) -> list:
+    """Return the index registers an instruction uses."""
+    from executer.exe_fast import decode_entry  # noqa
+
+    _code, name, _operation, arguments, _words, _cycles, _target = \
+        decode_entry(chip, list(code) + [0, 0], 0)
+    if name == 'fim':
+        return [arguments[0] * 2, arguments[0] * 2 + 1]
+    if name in ('ld', 'xch', 'inc', 'add', 'sub'):
+        return [arguments[0]]
+    return []
+
+
+def default_candidates(chip: Processor, registers: tuple) -> list:
+    """Return the one-word instructions using only the given registers."""
+    from executer.exe_fast import decode_entry  # noqa
+
+    candidates = []
+    for opcodeinfo in chip.INSTRUCTIONS:
+        code = (opcodeinfo['opcode'],)
+        if opcodeinfo['words'] != 1 or opcodeinfo['opcode'] > 255:
+            continue
+        name = decode_entry(chip, list(code) + [0, 0], 0)[1]
+        if name not in SUPEROPT_INSTRUCTIONS or name in SUPEROPT_EXCLUDED:
+            continue
+        if all(register in registers
+               for register in instruction_registers(chip, code)):
+            candidates.append(code)
+    return candidates
+
+
+def build_tests(registers: tuple, live_in: list, seed: int) -> tuple:
+    """Return the full set of test inputs, and whether it is exhaustive."""
+    generator = random.Random(seed)
+    size = 5 + 4 * len(registers)
+    bits = [item_bits(item, registers) for item in live_in]
+    combinations = 1
+    for _shift, width in bits:
+        combinations = combinations << width
+    exhaustive = combinations <= EXHAUSTIVE_TESTS
+    if exhaustive:
+        # Repeated (with other dead values) to at least SEARCH_TESTS tests
+        repeats = -(-SEARCH_TESTS // combinations)
+        chosen = itertools.chain.from_iterable(
+            itertools.product(*[range(1 << width) for _shift, width in bits])
+            for _ in range(repeats))
+    else:
+        chosen = ([generator.randrange(1 << width) for _shift, width in bits]
+                  for _ in range(RANDOM_TESTS))
+    tests = []
+    for values in chosen:
+        state = generator.getrandbits(size)
+        for (shift, width), value in zip(bits, values):
+            state = (state & ~(((1 << width) - 1) << shift)) | \
+                (value << shift)
+        tests.append(state)
+    return tests, exhaustive
+
+
+def superoptimise(lines: list, live_in: list, live_out: list,
+                  objective: str = 'cycles', scratch: tuple = (),
+                  candidates: list = None, seed: int = 0,
+                  processes: int = 0) -> dict:
+    """
+    Find the cheapest sequence equivalent to a sequence of instructions.
+
+    Parameters
+    ----------
+    lines: list, mandatory
+        The lines of the sequence (instructions without side effects, see
+        SUPEROPT_INSTRUCTIONS)
+
+    live_in: list, mandatory
+        The items whose values the sequence uses ('ACC', 'CARRY', 'R0' to
+        'R15')
+
+    live_out: list, mandatory
+        The items whose values must be left as the sequence leaves them;
+        any other register used may be left changed
+
+    objective: str, optional
+        'cycles' (fewest instruction cycles) or 'words' (shortest)
+
+    scratch: tuple, optional
+        Other index registers which may be used
+
+    candidates: list, optional
+        The lines of the instructions to search with (None for every
+        one-word instruction using the registers, see module notes)
+
+    seed: int, optional
+        Seed of the random test inputs
+
+    processes: int, optional
+        Number of worker processes (0 for one per CPU, 1 to search within
+        the current process)
+
+    Returns
+    -------
+    report: dict
+        lines           the cheapest sequence found (the original sequence
+                        if none cheaper)
+        words, cycles   its size and instruction cycles
+        original        the words and cycles of the original sequence
+        improved        True if a cheaper sequence was found
+        exhaustive      True if every combination of the live-in items
+                        was tested
+        tests           the number of test inputs each sequence found was
+                        checked on
+        states          the number of distinct states searched
+        complete        False if the search stopped at MAX_SEARCH_STATES
+
+    Raises
+    ------
+    ValueError
+        if the lines or candidates hold an instruction with side effects,
+        or an item is unknown
+
+    Notes
+    -----
+    Sequences are equivalent only for the inputs tested; a search which is
+    not exhaustive may, rarely, accept a sequence which differs upon inputs
+    not tested.
+
+    """
+    global _SEARCH
+    chip = Processor()
+    codes = parse_lines(chip, lines)
+    registers = set(scratch)
+    for item in list(live_in) + list(live_out):
+        if item[:1] == 'R' and item[1:].isdigit():
+            registers.add(int(item[1:]))
+    candidate_codes = None
+    if candidates is not None:
+        candidate_codes = parse_lines(chip, candidates)
+    for code in codes + (candidate_codes or []):
+        registers.update(instruction_registers(chip, code))
+    registers = tuple(sorted(registers))
+
+    if candidate_codes is None:
+        candidate_codes = default_candidates(chip, registers)
+    original = [compile_instruction(chip, code, registers) for code in codes]
+    original_cost = {'words': sum(item['words'] for item in original),
+                     'cycles': sum(item['cycles'] for item in original)}
+    outputs = 0
+    for item in live_out:
+        shift, width = item_bits(item, registers)
+        outputs = outputs | (((1 << width) - 1) << shift)
+
+    # Test inputs (those upon which the original sequence fails are dropped)
+    tests, exhaustive = build_tests(registers, list(live_in), seed)
+    results = [run_sequence(original, [test]) for test in tests]
+    tests = [test for test, result in zip(tests, results) if result]
+    expected = [result[0] & outputs for result in results if result]
+    search = random.Random(seed).sample(range(len(tests)),
+                                        min(SEARCH_TESTS, len(tests)))
+    search_tests = [tests[index] for index in search]
+    search_expected = [expected[index] for index in search]
+
+    spec = (candidate_codes, registers, objective)
+    local = compile_search(spec)
+    report = {'lines': list(lines), 'words': original_cost['words'],
+              'cycles': original_cost['cycles'], 'original': original_cost,
+              'improved': False, 'exhaustive': exhaustive,
+              'tests': len(tests), 'states': 1, 'complete': True}
+    limit = original_cost[objective] - 1
+    if processes == 0:
+        processes = os.cpu_count() or 1
+    pool = None
+    if processes > 1:
+        import multiprocessing  # noqa
+        pool = multiprocessing.Pool(processes, init_worker, (spec,))
+    else:
+        _SEARCH = local
+    try:
+        found = search_levels(local, search_tests, search_expected, tests,
+                              expected, outputs, limit, pool, report)
+    finally:
+        if pool is not None:
+            pool.terminate()
+    if found is not None:
+        instructions = [local['instructions'][index] for index in found]
+        report.update({'lines': [item['line'] for item in instructions],
+                       'words': sum(item['words'] for item in instructions),
+                       'cycles': sum(item['cycles']
+                                     for item in instructions),
+                       'improved': True})
+    return report
+
+
+def equivalent(instructions: list, sequence: tuple, tests: list,
+               expected: list, outputs: int) -> bool:
+    """Return True if a sequence leaves the expected live-out values."""
+    final = run_sequence([instructions[index] for index in sequence], tests)
+    return final is not None and \
+        [state & outputs for state in final] == expected
+
+
+def search_levels(search: dict, search_tests: list, search_expected: list,
+                  tests: list, expected: list, outputs: int, limit: int,
+                  pool, report: dict):
+    """
+    Search, cheapest first, for a sequence equivalent on every test.
+
+    Parameters
+    ----------
+    search: dict, mandatory
+        The compiled search (see compile_search)
+
+    search_tests: list, mandatory
+        The test inputs every sequence is evaluated on
+
+    search_expected: list, mandatory
+        The live-out values of the original sequence on them
+
+    tests: list, mandatory
+        The full set of test inputs
+
+    expected: list, mandatory
+        The live-out values of the original sequence on them
+
+    outputs: int, mandatory
+        The bits of the live-out items in a state
+
+    limit: int, mandatory
+        The highest cost worth searching
+
+    pool: multiprocessing.Pool, mandatory
+        The worker processes (None to search within this process)
+
+    report: dict, mandatory
+        The report, whose 'states' and 'complete' are updated
+
+    Returns
+    -------
+    sequence: tuple
+        The indices of the candidates of the sequence found (None if none)
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    instructions = search['instructions']
+    seen = {states_digest(search_tests): 0}
+    levels = {1: []}
+    goals = {0: [()]}
+    cost = 0
+    while cost <= limit:
+        # Sequences of this cost matching on the search tests (any cheaper
+        # have been checked already)
+        for sequence in goals.pop(cost, []):
+            if equivalent(instructions, sequence, tests, expected, outputs):
+                return sequence
+        level = levels.pop(cost, [((), 0, search_tests)] if cost == 0
+                           else [])
+        jobs = [(level[start:start + SUPEROPT_CHUNK], limit)
+                for start in range(0, len(level), SUPEROPT_CHUNK)]
+        if pool is None:
+            chunks = (expand_chunk(job) for job in jobs)
+        else:
+            chunks = pool.imap(expand_chunk, jobs)
+        for chunk in chunks:
+            for sequence, new_cost, states, digest in chunk:
+                if seen.get(digest, new_cost + 1) <= new_cost:
+                    continue
+                seen[digest] = new_cost
+                levels.setdefault(new_cost, []).append(
+                    (sequence, new_cost, states))
+                if [state & outputs for state in states] != search_expected:
+                    continue
+                # Nothing cheaper than the next level remains unchecked
+                if new_cost == cost + 1 and equivalent(
+                        instructions, sequence, tests, expected, outputs):
+                    report['states'] = len(seen)
+                    return sequence
+                goals.setdefault(new_cost, []).append(sequence)
+            if len(seen) > MAX_SEARCH_STATES:
+                report.update({'states': len(seen), 'complete': False})
+                return None
+        report['states'] = len(seen)
+        cost = cost + 1
+    return None
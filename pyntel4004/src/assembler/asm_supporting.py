@@ -5,12 +5,43 @@
 # arguments, and large numbers of local variables.
 
 
+import contextlib
+import sys
+import threading
 from typing import Tuple, Any
 from hardware.processor import Processor
 from hardware.suboperations.utility import split_address8, zfl  # noqa
 from shared.shared import do_error, get_opcodeinfo, get_opcodeinfobyopcode, \
     print_messages  # noqa
 
+# Format of a line of the assembly listing (see print_ln)
+LISTING_FORMAT = ('{:>4} {:<10} {:>4} {:>4}  {:>4} {:>4} {:>4} '
+                  '{:>4} {:>7} {:<4} {:<4}{:<8}{:<3}'
+                  ' {:<3} {:<3} {} {}').format
+
+# The lines of the listing held (for each thread) while pass 2 assembles,
+# and written to stdout in one go (see held_listing)
+_LISTING = threading.local()
+
+
+@contextlib.contextmanager
+def held_listing():
+    """Hold the lines of the listing, writing them to stdout at the end."""
+    _LISTING.lines = []
+    try:
+        yield
+    finally:
+        flush_listing()
+        _LISTING.lines = None
+
+
+def flush_listing() -> None:
+    """Write the lines of the listing held so far to stdout."""
+    lines = getattr(_LISTING, 'lines', None)
+    if lines:
+        sys.stdout.write(''.join(lines))
+        lines.clear()
+
 
 def asm_comment(label: str, count: int, line: str, quiet: bool) -> None:
     """
@@ -438,16 +469,16 @@ def asm_pin(chip: Processor, value: int, label: str,
     N/A
 
     """
+    err = False
     result = chip.write_pin10(int(value))
     if result is False:
         err = "FATAL: Pass 2:  Invalid value for " \
-              + "TEST PIN 10 at line " + count
+              + "TEST PIN 10 at line " + str(count)
     else:
         if not quiet:
             print_ln('', label, '', '', '', '', '', '', '', '',
                      '', '', '', '', str(count), 'pin',
                      str(value))
-            err = False
     return err
 
 
@@ -628,6 +659,7 @@ def asm_main(chip: Processor, x: list, _labels: list, address: int, tps: list,
                 asm_pseudo(chip, str(opcode), label, count, x, tps,
                            address, org_found, location, quiet)
             if err:
+                flush_listing()
                 do_error(err)
                 _ = ''
                 return _, _, _, _, _, _, _, _, False, _, _
@@ -1517,14 +1549,17 @@ def print_ln(f0: str, f1: str, f2: str, f3: str, f4: str, f5: str, f6: str,
 
     Notes
     -----
-    N/A
+    The line is held, if the listing is (see held_listing), rather than
+    written at once.
 
     """
-    fmt = '{:>4} {:<10} {:>4} {:>4}  {:>4} {:>4} {:>4} '
-    fmt = fmt + '{:>4} {:>7} {:<4} {:<4}{:<8}{:<3}'
-    fmt = fmt + ' {:<3} {:<3} {} {}'
-    print(fmt.format(f0, f1, f2, f3, f4, f5, f6, f7, f8,
-                     f9, f10, f11, f12, f13, f14, f15, f16))
+    line = LISTING_FORMAT(f0, f1, f2, f3, f4, f5, f6, f7, f8,
+                          f9, f10, f11, f12, f13, f14, f15, f16) + '\n'
+    lines = getattr(_LISTING, 'lines', None)
+    if lines is None:
+        sys.stdout.write(line)
+    else:
+        lines.append(line)
 
 
 def deal_with_custom_opcode(chip: Processor, parts: list,
@@ -1636,7 +1671,84 @@ def work_with_a_line_of_asm(chip: Processor, line: str,
     return err, tfile, p_line, address, _labels
 
 
-def write_header_file(filename: str, cd: str, memory_content: list) -> bool:
+def header_lines(program: list):
+    """
+    Generate the lines of the .h (Retroshield) format memory array.
+
+    Parameters
+    ----------
+    program: list, mandatory
+        The assembled program
+
+    Returns
+    -------
+    lines: generator
+        Each line of the array declaration, 16 bytes to a line
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    Values of less than 10 are padded to 2 hex digits.
+
+    """
+    yield 'const unsigned char rom_bin[] = {  \n'
+    for start in range(0, len(program), 16):
+        line = ', '.join(('0x0' if value < 10 else '0x') + '%X' % value
+                         for value in program[start:start + 16])
+        if start + 16 < len(program):
+            yield line + ', \n'
+        else:
+            yield line + '};\n'
+
+
+def stream_header(stream, filename: str, cd: str, program: list) -> bool:
+    """
+    Write the assembled program to a stream in .h (Retroshield) format.
+
+    Parameters
+    ----------
+    stream: file-like object, mandatory
+        The (text) stream to write to
+
+    filename: str, mandatory
+        The name of the program
+
+    cd: str, mandatory
+        the assembly date of the program
+
+    program: list, mandatory
+        The assembled program (with the "end" pseudo-opcode stripped)
+
+    Returns
+    -------
+    True
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    flowerbox = '/' * 68 + '\n'
+    stream.write(flowerbox)
+    stream.write('// Program Name  : ' + filename + "\n")
+    stream.write('// Assembly Date : ' + cd + "\n")
+    stream.write(flowerbox)
+    stream.write('// Program produced in Retroshield Arduino 4004 format.\n')  # noqa
+    stream.write('// by Pyntel4004 Assembler\n')
+    stream.write('\n\n')
+    stream.writelines(header_lines(program))
+    stream.write("\n")
+    return True
+
+
+def write_header_file(filename: str, cd: str, program: list) -> bool:
     """
     Take the assembled program and write to a given filename
     in .h (Retroshield) format
@@ -1649,8 +1761,8 @@ def write_header_file(filename: str, cd: str, memory_content: list) -> bool:
     cd: str, mandatory
         the assembly date of the program
 
-    memory_content: list, mandatory
-        List containing the assembled object code for writing to the file
+    program: list, mandatory
+        The assembled program (with the "end" pseudo-opcode stripped)
 
     Returns
     -------
@@ -1665,21 +1777,8 @@ def write_header_file(filename: str, cd: str, memory_content: list) -> bool:
     N/A
 
     """
-    flowerbox = ''
-    for _ in range(68):
-        flowerbox = flowerbox + '/'
-    flowerbox = flowerbox + '\n'
-
-    with open(filename + ".h", "w") as k4004:
-        k4004.write(flowerbox)  # noqa
-        k4004.write('// Program Name  : ' + filename + "\n")
-        k4004.write('// Assembly Date : ' + cd + "\n")
-        k4004.write(flowerbox)  # noqa
-        k4004.write('// Program produced in Retroshield Arduino 4004 format.\n')  # noqa
-        k4004.write('// by Pyntel4004 Assembler\n')
-        k4004.write('\n\n')
-
-        k4004.write(memory_content + "\n")
+    with open(filename + ".h", "w", encoding='utf-8') as k4004:
+        stream_header(k4004, filename, cd, program)
     return True
 
 
@@ -1693,32 +1792,65 @@ def strip_end(program: list) -> list:
     return program
 
 
+def stream_object(stream, program: list, program_name: str,
+                  assembledate: str, m_location: str, labels: str) -> bool:
+    """
+    Write the assembled program to a stream as a JSON object document.
+
+    Parameters
+    ----------
+    stream: file-like object, mandatory
+        The (text) stream to write to
+
+    program: list, mandatory
+        The assembled program (including the "end" pseudo-opcode)
+
+    program_name, assembledate, m_location, labels: str, mandatory
+        The (JSON formatted) members of the document
+
+    Returns
+    -------
+    True
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    The memory is written a page at a time, so that the document is never
+    built in memory as a whole.
+
+    """
+    page_size = Processor.PAGE_SIZE
+    stream.write('{' + program_name + ',' + assembledate + ',' +
+                 m_location + ',"memory":[')
+    for start in range(0, len(program), page_size):
+        if start > 0:
+            stream.write(', ')
+        stream.write(', '.join('"%x"' % location
+                               for location in
+                               program[start:start + page_size]))
+    stream.write('],' + labels + '}')
+    return True
+
+
 def format_program(program: list, program_name: str, assembledate: str,
                    m_location: str, labels: str):
-    program_out = []
-    memorycontent = '"memory":['
-    for location in program:
-        content = str(hex(location)[2:])
-        if int(content, 16) > 255:
-            program_out.append(0)
-        memorycontent = memorycontent + '"' + content + '", '
-    memory_content = memorycontent[:-2] + ']'
+    import io  # noqa
+
+    json_doc = io.StringIO()
+    stream_object(json_doc, program, program_name, assembledate,
+                  m_location, labels)
 
     # Remove "end" pseudo instruction
     program = strip_end(program)
-
-    json_doc = "{"
-    json_doc = json_doc + program_name + ','
-    json_doc = json_doc + assembledate + ','
-    json_doc = json_doc + m_location + ','
-    json_doc = json_doc + memory_content + ','
-    json_doc = json_doc + labels
-    json_doc = json_doc + '}'
-    return json_doc
+    return json_doc.getvalue()
 
 
 def write_program_to_file(program: list, filename: str, memory_location: str,
-                          _labels: list, output: str) -> bool:
+                          _labels: list, output: str,
+                          streams: dict = None) -> bool:
     """
     Take the assembled program and write to a given filename.
 
@@ -1739,6 +1871,10 @@ def write_program_to_file(program: list, filename: str, memory_location: str,
     output: str, mandatory
         Determines the type of output file(s) to create.
 
+    streams: dict, optional
+        'OBJ', 'BIN' and/or 'H' --> stream to write that output to instead
+        of a file (a binary stream for 'BIN', text streams otherwise)
+
     Returns
     -------
     True
@@ -1749,11 +1885,13 @@ def write_program_to_file(program: list, filename: str, memory_location: str,
 
     Notes
     -----
-    N/A
+    Each output is written in a single pass over the program.
 
     """
     from datetime import datetime  # noqa
 
+    if streams is None:
+        streams = {}
     program_name = '"program":"' + filename + '"'
     m_location = '"location":"' + memory_location + '"'
     labels = '"labels":' + str(_labels).replace("'", '"')
@@ -1762,34 +1900,26 @@ def write_program_to_file(program: list, filename: str, memory_location: str,
 
     types = output.upper()
 
-    json_doc = format_program(program, program_name,
-                              assembledate, m_location, labels)
-
-    if 'ALL' in types or 'OBJ' in types:
+    if 'OBJ' in streams:
+        stream_object(streams['OBJ'], program, program_name,
+                      assembledate, m_location, labels)
+    elif 'ALL' in types or 'OBJ' in types:
         with open(filename + '.obj', "w", encoding='utf-8') as output:
-            output.write(json_doc)
+            stream_object(output, program, program_name,
+                          assembledate, m_location, labels)
 
-    if 'ALL' in types or 'BIN' in types:
+    # Remove "end" pseudo instruction
+    program = strip_end(program)
+
+    if 'BIN' in streams:
+        streams['BIN'].write(bytearray(program))
+    elif 'ALL' in types or 'BIN' in types:
         with open(filename + '.bin', "w+b") as binary:
             binary.write(bytearray(program))
 
-    if 'ALL' in types or 'H' in types:
-        memorycontent = 'const unsigned char rom_bin[] = {  \n'
-        i = 0
-        for location in program:
-            content = str(hex(location)[2:]).upper()
-            if int(content, 16) < 10:
-                zerox = '0x0'
-            else:
-                zerox = "0x"
-            memorycontent = memorycontent + zerox + content + ', '
-            i = i + 1
-            if i == 16:
-                i = 0
-                memorycontent = memorycontent + '\n'
-        memory_content = memorycontent[:-3] + '};\n'
-
-        # Write to a .h file
-        write_header_file(filename, cd, memory_content)
+    if 'H' in streams:
+        stream_header(streams['H'], filename, cd, program)
+    elif 'ALL' in types or 'H' in types:
+        write_header_file(filename, cd, program)
 
     return True
@@ -11,7 +11,7 @@ from hardware.processor import Processor
 
 # Assembler imports
 from assembler.asm_supporting import asm_comment, asm_label, asm_main, \
-        do_error, pass0, pass1, wrap_up  # noqa
+        do_error, held_listing, pass0, pass1, wrap_up  # noqa
 
 # Shared imports
 from shared.shared import get_opcodeinfo, print_messages  # noqa
@@ -28,7 +28,7 @@ from shared.shared import get_opcodeinfo, print_messages  # noqa
 
 
 def assemble(program_name: str, object_file: str, chip: Processor,
-             quiet: bool, type: str) -> bool:
+             quiet: bool, type: str, cache: str = '') -> bool:
     """
     Main two-pass assembler for i4004 code.
 
@@ -49,6 +49,9 @@ def assemble(program_name: str, object_file: str, chip: Processor,
     type: str, mandatory
         Determines the type of output file(s) to create.
 
+    cache: str, optional
+        Directory of the assembly cache ('' to disable the cache)
+
     Returns
     -------
     True if the code assembles correctly
@@ -60,7 +63,10 @@ def assemble(program_name: str, object_file: str, chip: Processor,
 
     Notes
     -----
-    N/A
+    If a cache directory is supplied and the same source has previously
+    been assembled (by the same version of the assembler, to the same
+    object file and output type), the cached artifacts and memory image
+    are used and neither pass 1 nor pass 2 is run.
 
     """
 
@@ -69,6 +75,19 @@ def assemble(program_name: str, object_file: str, chip: Processor,
     #     mccabe: MC0001 / assemble is too complex (10)
     #     SonarLint: S3776: assemble is too complex (25) - start
 
+    # Check the assembly cache
+    key = ''
+    if cache != '':
+        from assembler.asm_cache import cache_fetch, cache_key  # noqa
+        key = cache_key(program_name, object_file, type)
+        if key != '':
+            hit, _location, _labels = cache_fetch(cache, key, chip,
+                                                  object_file)
+            if hit:
+                print_messages(quiet, 'PROG', chip, program_name + ' (cached)')
+                print_messages(quiet, 'LABELS', chip, _labels)
+                return True
+
     # Pass 0 - Initialise label tables, program storage etc
     _labels, tps, tfile = pass0(chip)
 
@@ -89,42 +108,50 @@ def assemble(program_name: str, object_file: str, chip: Processor,
     org_found = False
     location = ''
 
-    while True:
-        line = tfile[count].strip()
-        if len(line) == 0:
-            break  # End of code
-        x = line.split()
-        label = ''
-
-        # Check for initial comments
-        if line[0] == '/':
-            asm_comment(label, count, line, quiet)
-        else:
-            opcode = x[0]
-            if x[0][-1] == ',':
-                label = x[0]
-                opcode = x[1]
-                # Check to see if we are assembling a label
-                if '0' <= str(opcode)[:1] <= '9':
-                    tps = asm_label(tps, address, x, count, label)
-                    break
-
-            opcodeinfo = get_opcodeinfo(chip, 'S', opcode)
-            chip, x, _labels, address, tps, opcodeinfo, label, count, \
-                err, org_found, location = \
-                asm_main(chip, x, _labels, address, tps, opcode,
-                         opcodeinfo, label, count, org_found,
-                         location, quiet)
-        if err:
-            do_error(err)
-            break
-
-        count = count + 1
+    # The listing is written to stdout as pass 2 ends
+    with held_listing():
+        while True:
+            line = tfile[count].strip()
+            if len(line) == 0:
+                break  # End of code
+            x = line.split()
+            label = ''
+
+            # Check for initial comments
+            if line[0] == '/':
+                asm_comment(label, count, line, quiet)
+            else:
+                opcode = x[0]
+                if x[0][-1] == ',':
+                    label = x[0]
+                    opcode = x[1]
+                    # Check to see if we are assembling a label
+                    if '0' <= str(opcode)[:1] <= '9':
+                        tps = asm_label(tps, address, x, count, label)
+                        break
+
+                opcodeinfo = get_opcodeinfo(chip, 'S', opcode)
+                chip, x, _labels, address, tps, opcodeinfo, label, count, \
+                    err, org_found, location = \
+                    asm_main(chip, x, _labels, address, tps, opcode,
+                             opcodeinfo, label, count, org_found,
+                             location, quiet)
+            if err:
+                break
+
+            count = count + 1
 
     if err:
+        do_error(err)
         print("Program Assembly halted")
         return False
 
     # Wrap up assembly process and write to file if necessary.
     chip = wrap_up(chip, location, tps, _labels, object_file, quiet, type)
+
+    # Keep the result for subsequent assemblies of the same source
+    if key != '':
+        from assembler.asm_cache import cache_store  # noqa
+        cache_store(cache, key, chip, location, tps, _labels, object_file,
+                    type)
     return True
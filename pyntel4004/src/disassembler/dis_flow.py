@@ -0,0 +1,196 @@
+"""Control flow recovery (recursive descent) supporting functions."""
+
+# Disassembly starts at one or more entry points and follows the flow of
+# control: the destination of every JUN, JMS, JCN and ISZ is disassembled,
+# as is the instruction following any instruction which may continue in
+# sequence. Disassembly of a path stops at a JUN, BBL, JIN (whose
+# destination is only known at run time), the "end" pseudo-opcode or an
+# invalid opcode. Memory which is never reached is treated as data.
+#
+# The instructions found are grouped into basic blocks: a block starts at an
+# entry point, at the destination of a jump or call, or after an instruction
+# which ends a block; and ends at the instruction before the start of the
+# next block or at an instruction which transfers control.
+
+from hardware.processor import Processor
+from shared.shared import decode_instruction  # noqa
+
+# How each instruction affects the flow of control
+FLOW = {'jun': 'jump', 'jms': 'call', 'jcn': 'branch', 'isz': 'branch',
+        'jin': 'indirect', 'bbl': 'return', 'end': 'stop', '-': 'invalid'}
+
+# Instructions after which control may continue in sequence
+SEQUENTIAL = ('call', 'branch')
+
+
+def discover(chip: Processor, memory: list, entries: list) \
+        -> tuple:
+    """
+    Find the instructions reachable from the entry points.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the instruction table
+
+    memory: list, mandatory
+        The memory (ROM/PRAM) containing the program
+
+    entries: list, mandatory
+        The addresses at which execution may start
+
+    Returns
+    -------
+    instructions: dict
+        address --> decoded instruction (see shared.decode_instruction)
+
+    leaders: set
+        The addresses which must start a basic block
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    instructions = {}
+    leaders = set(entries)
+    pending = list(entries)
+    while pending:
+        address = pending.pop()
+        while 0 <= address < len(memory) and address not in instructions:
+            instruction = decode_instruction(chip, memory, address)
+            instructions[address] = instruction
+            flow = FLOW.get(instruction['name'], '')
+            following = address + instruction['words']
+            if instruction['target'] != -1:
+                leaders.add(instruction['target'])
+                pending.append(instruction['target'])
+            if flow in SEQUENTIAL:
+                leaders.add(following)
+                pending.append(following)
+            if flow != '':
+                break
+            address = following
+    return instructions, leaders
+
+
+def make_label(address: int, kind: str, lbls: dict) -> str:
+    """Return the label of an address (a known label if there is one)."""
+    if address in lbls:
+        return lbls[address]
+    prefix = 'sub' if kind == 'call' else 'lbl'
+    return prefix + str(address)
+
+
+def build_flow_graph(chip: Processor, memory: list, entries: list = None,
+                     lbls: list = None) -> dict:
+    """
+    Recover the flow of control of a program as a graph of basic blocks.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the instruction table
+
+    memory: list, mandatory
+        The memory (ROM/PRAM) containing the program
+
+    entries: list, optional
+        The addresses at which execution may start (default: 0)
+
+    lbls: list, optional
+        Known labels (from an object module), used in preference to
+        synthesised labels
+
+    Returns
+    -------
+    graph: dict
+        blocks      start address --> block:
+                        start           address of the first instruction
+                        end             address following the block
+                        instructions    the decoded instructions
+                        exit            how the last instruction leaves the
+                                        block ('fall', 'jump', 'call',
+                                        'branch', 'return', 'indirect',
+                                        'stop' or 'invalid')
+                        successors      list of (start address, edge kind)
+        edges       list of (from block, to block, kind), where kind is
+                    'fall', 'jump', 'call' or 'branch'
+        index       instruction address --> start address of its block
+        labels      address --> label, for every jump/call destination
+        data        list of (start, end) address ranges not reached as code
+        entries     the entry points
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    if entries is None:
+        entries = [0]
+    known = {}
+    for label in lbls or []:
+        known[label['address']] = label['label'].rstrip(',')
+    instructions, leaders = discover(chip, memory, entries)
+
+    graph = {'blocks': {}, 'edges': [], 'index': {}, 'labels': {},
+             'data': [], 'entries': list(entries)}
+    block = None
+    for address in sorted(instructions):
+        instruction = instructions[address]
+        if block is None or address in leaders or address != block['end']:
+            block = {'start': address, 'end': address, 'instructions': [],
+                     'exit': 'fall', 'successors': []}
+            graph['blocks'][address] = block
+        block['instructions'].append(instruction)
+        block['end'] = address + max(instruction['words'], 1)
+        graph['index'][address] = block['start']
+        flow = FLOW.get(instruction['name'], '')
+        if flow != '':
+            block['exit'] = flow
+            block = None
+
+    for start, block in graph['blocks'].items():
+        last = block['instructions'][-1]
+        if block['exit'] in ('jump', 'call', 'branch'):
+            block['successors'].append((last['target'], block['exit']))
+            graph['labels'][last['target']] = \
+                make_label(last['target'], block['exit'], known)
+        if block['exit'] in ('fall', ) + SEQUENTIAL and \
+                block['end'] in instructions:
+            block['successors'].append((block['end'], 'fall'))
+        for successor, kind in block['successors']:
+            graph['edges'].append((start, successor, kind))
+
+    # Anything else (up to the last non-zero word) is data
+    used = max([address for address, value in enumerate(memory)
+                if value != 0] + [max(instructions) if instructions else -1])
+    data_start = -1
+    for address in range(used + 1):
+        covered = address in graph['index'] or \
+            (address - 1 in instructions and
+             instructions[address - 1]['words'] == 2)
+        if not covered and data_start == -1:
+            data_start = address
+        if covered and data_start != -1:
+            graph['data'].append((data_start, address))
+            data_start = -1
+    if data_start != -1:
+        graph['data'].append((data_start, used + 1))
+    return graph
+
+
+def block_at(graph: dict, address: int) -> dict:
+    """Return the basic block containing an address (None if not code)."""
+    start = graph['index'].get(address)
+    if start is None:
+        return None
+    return graph['blocks'][start]
@@ -0,0 +1,229 @@
+"""Disassembly record generators and writers."""
+
+# The generators yield one record (a dict) per instruction or data word,
+# decoded straight from a memory image (a list, bytes or bytearray) with no
+# use of the processor's state:
+#
+#   address     address of the instruction/data word
+#   code        the raw word(s)
+#   mnemonic    short mnemonic ('jcn', 'ld' etc.), 'data' for a data word
+#   operands    list of the (integer) operands
+#   text        instruction with its operands (a label replacing a
+#               jump/call destination, where one is known)
+#   label       label of the address ('' if none)
+#   target      destination of a JUN/JMS/JCN/ISZ, -1 otherwise
+#
+# The writer renders records in the same columnar layout as the listing
+# printed by disassemble_flow, a chunk of lines at a time.
+
+import sys
+from typing import Iterator
+
+from hardware.processor import Processor
+from shared.shared import decode_instruction  # noqa
+
+# Number of lines rendered before being written out
+CHUNK_LINES = 1024
+
+# Layout of a line of the disassembly listing
+RECORD_FORMAT = '{:4}  {:<10} {:>8}  {:<10}'.format
+
+
+def make_record(instruction: dict, labels: dict) -> dict:
+    """
+    Build a disassembly record from a decoded instruction.
+
+    Parameters
+    ----------
+    instruction: dict, mandatory
+        A decoded instruction (see shared.decode_instruction)
+
+    labels: dict, mandatory
+        address --> label
+
+    Returns
+    -------
+    record: dict
+        The disassembly record (see module notes)
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    text = instruction['text']
+    operands = []
+    if '(' in text:
+        operands = [int(operand) for operand
+                    in text[text.find('(') + 1:-1].split(',')]
+    target = instruction['target']
+    if target in labels:
+        cut = max(text.rfind('('), text.rfind(','))
+        text = text[:cut + 1] + labels[target] + ')'
+    return {'address': instruction['address'],
+            'code': list(instruction['code']),
+            'mnemonic': instruction['name'], 'operands': operands,
+            'text': text, 'label': labels.get(instruction['address'], ''),
+            'target': target}
+
+
+def data_record(memory, address: int, labels: dict) -> dict:
+    """Build a disassembly record for a data word."""
+    return {'address': address, 'code': [memory[address]],
+            'mnemonic': 'data', 'operands': [memory[address]],
+            'text': 'data', 'label': labels.get(address, ''),
+            'target': -1}
+
+
+def linear_records(memory, start: int = 0, end: int = -1,
+                   labels: dict = None, chip: Processor = None,
+                   stop_at_end: bool = True) -> Iterator[dict]:
+    """
+    Disassemble memory sequentially (linear sweep).
+
+    Parameters
+    ----------
+    memory: list, bytes or bytearray, mandatory
+        The memory image
+
+    start: int, optional
+        Address to start at
+
+    end: int, optional
+        Address to stop before (-1 for the end of the memory)
+
+    labels: dict, optional
+        address --> label
+
+    chip: Processor, optional
+        The processor whose instruction table to use (default: the
+        standard i4004 table)
+
+    stop_at_end: bool, optional
+        Stop after the "end" pseudo-opcode
+
+    Returns
+    -------
+    records: generator
+        One record per instruction (see module notes)
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    if chip is None:
+        chip = Processor
+    if labels is None:
+        labels = {}
+    if end == -1:
+        end = len(memory)
+    address = start
+    while address < end:
+        instruction = decode_instruction(chip, memory, address)
+        yield make_record(instruction, labels)
+        if stop_at_end and instruction['name'] == 'end':
+            return
+        address = address + max(instruction['words'], 1)
+
+
+def flow_records(memory, graph: dict) -> Iterator[dict]:
+    """
+    Disassemble the code and data of a basic block graph in address order.
+
+    Parameters
+    ----------
+    memory: list, bytes or bytearray, mandatory
+        The memory image
+
+    graph: dict, mandatory
+        The basic block graph of the program (see build_flow_graph)
+
+    Returns
+    -------
+    records: generator
+        One record per instruction or data word (see module notes)
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    labels = graph['labels']
+    blocks = [(start, 'code') for start in graph['blocks']]
+    blocks = blocks + [(start, 'data') for start, _end in graph['data']]
+    data_ends = dict(graph['data'])
+    for start, kind in sorted(blocks):
+        if kind == 'code':
+            for instruction in graph['blocks'][start]['instructions']:
+                yield make_record(instruction, labels)
+        else:
+            for address in range(start, data_ends[start]):
+                yield data_record(memory, address, labels)
+
+
+def format_record(record: dict) -> str:
+    """Render a disassembly record as a line of a listing."""
+    return RECORD_FORMAT(record['address'], record['label'],
+                         ', '.join(str(word) for word in record['code']),
+                         record['text'])
+
+
+def write_disassembly(records: Iterator[dict], output=None,
+                      chunk_lines: int = CHUNK_LINES) -> int:
+    """
+    Render disassembly records to a file or stream.
+
+    Parameters
+    ----------
+    records: iterable, mandatory
+        Disassembly records (see linear_records/flow_records)
+
+    output: str or file-like object, optional
+        Name of the file to write, or a (text) stream (default: stdout)
+
+    chunk_lines: int, optional
+        Number of lines rendered before each write
+
+    Returns
+    -------
+    count: int
+        Number of records written
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    if output is None:
+        output = sys.stdout
+    if isinstance(output, str):
+        with open(output, 'w', encoding='utf-8') as stream:
+            return write_disassembly(records, stream, chunk_lines)
+    count = 0
+    chunk = []
+    for record in records:
+        chunk.append(format_record(record))
+        count = count + 1
+        if len(chunk) == chunk_lines:
+            output.write('\n'.join(chunk) + '\n')
+            chunk = []
+    if chunk:
+        output.write('\n'.join(chunk) + '\n')
+    return count
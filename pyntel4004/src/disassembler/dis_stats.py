@@ -0,0 +1,328 @@
+"""Corpus disassembly and instruction mix statistics."""
+
+# Each image (.bin or .obj) is disassembled in a worker process, and the
+# statistics gathered for it are returned to the caller:
+#
+#   image           the image file
+#   error           error message ('' if none)
+#   instructions    number of instructions
+#   one_word        number of 1-word instructions
+#   two_word        number of 2-word instructions
+#   data            number of words not reached as code (flow mode only)
+#   opcodes         opcode --> count
+#   mnemonics       short mnemonic --> count
+#   call_targets    JMS destination --> count
+#
+# The statistics for all the images are then added together (the "image"
+# of the aggregate is '*'), and all are written as JSON lines or CSV.
+
+import csv
+import glob
+import json
+import os
+
+from hardware.processor import Processor
+
+# Image types which can be disassembled
+IMAGE_TYPES = ('*.bin', '*.obj')
+
+# Name used for the aggregate statistics
+AGGREGATE = '*'
+
+
+def find_images(sources: str) -> list:
+    """
+    Find the images to disassemble.
+
+    Parameters
+    ----------
+    sources: str, mandatory
+        A directory (all .bin and .obj files within it are used) or a glob
+        pattern
+
+    Returns
+    -------
+    files: list
+        Sorted list of the images found
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    if os.path.isdir(sources):
+        files = []
+        for image_type in IMAGE_TYPES:
+            files = files + glob.glob(os.path.join(sources, image_type))
+        return sorted(files)
+    return sorted(glob.glob(sources))
+
+
+def new_stats(image: str) -> dict:
+    """Return an empty set of statistics."""
+    return {'image': image, 'error': '', 'instructions': 0, 'one_word': 0,
+            'two_word': 0, 'data': 0, 'opcodes': {}, 'mnemonics': {},
+            'call_targets': {}}
+
+
+def count(table: dict, key) -> None:
+    """Increment the count of a key in a histogram."""
+    table[key] = table.get(key, 0) + 1
+
+
+def memory_stats(memory: list, image: str = '', mode: str = 'flow',
+                 lbls: list = None) -> dict:
+    """
+    Gather the instruction mix statistics of a memory image.
+
+    Parameters
+    ----------
+    memory: list, mandatory
+        The memory image
+
+    image: str, optional
+        Name of the image
+
+    mode: str, optional
+        'flow' to count only the instructions reachable from address 0,
+        'linear' to count every word
+
+    lbls: list, optional
+        Known labels (from an object module)
+
+    Returns
+    -------
+    stats: dict
+        The statistics of the image (see module notes)
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    Memory following the last non-zero word is taken to be unused, and
+    is ignored.
+
+    """
+    from disassembler.dis_generator import flow_records, \
+        linear_records  # noqa
+
+    stats = new_stats(image)
+    used = max([address + 1 for address, value in enumerate(memory)
+                if value != 0] + [0])
+    memory = memory[:used]
+    if mode == 'flow':
+        from disassembler.dis_flow import build_flow_graph  # noqa
+        graph = build_flow_graph(Processor, memory, [0], lbls)
+        records = flow_records(memory, graph)
+    else:
+        records = linear_records(memory)
+    for record in records:
+        if record['mnemonic'] == 'data':
+            stats['data'] = stats['data'] + 1
+            continue
+        if record['mnemonic'] == 'end':
+            continue
+        stats['instructions'] = stats['instructions'] + 1
+        if len(record['code']) == 2:
+            stats['two_word'] = stats['two_word'] + 1
+        else:
+            stats['one_word'] = stats['one_word'] + 1
+        count(stats['opcodes'], record['code'][0])
+        count(stats['mnemonics'], record['mnemonic'])
+        if record['mnemonic'] == 'jms':
+            count(stats['call_targets'], record['target'])
+    return stats
+
+
+def image_stats(job: tuple) -> dict:
+    """
+    Load and gather the statistics of a single image (in a worker process).
+
+    Parameters
+    ----------
+    job: tuple, mandatory
+        (image file, mode)
+
+    Returns
+    -------
+    stats: dict
+        The statistics of the image (see module notes)
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    from executer.exe_supporting import reload  # noqa
+    from shared.shared import retrieve_program  # noqa
+
+    image, mode = job
+    try:
+        chip = Processor()
+        location, _pc, lbls = reload(image, chip, True)
+        return memory_stats(retrieve_program(chip, location), image, mode,
+                            lbls)
+    except Exception as ex:  # noqa
+        stats = new_stats(image)
+        stats['error'] = type(ex).__name__ + ': ' + str(ex)
+        return stats
+
+
+def combine_stats(results: list) -> dict:
+    """
+    Add together the statistics of many images.
+
+    Parameters
+    ----------
+    results: list, mandatory
+        The statistics of each image
+
+    Returns
+    -------
+    stats: dict
+        The aggregate statistics (the image is '*', and the error is the
+        number of images which could not be disassembled)
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    total = new_stats(AGGREGATE)
+    errors = 0
+    for stats in results:
+        if stats['error'] != '':
+            errors = errors + 1
+        for key in ('instructions', 'one_word', 'two_word', 'data'):
+            total[key] = total[key] + stats[key]
+        for key in ('opcodes', 'mnemonics', 'call_targets'):
+            for item, value in stats[key].items():
+                total[key][item] = total[key].get(item, 0) + value
+    total['error'] = str(errors) if errors else ''
+    return total
+
+
+def write_stats_jsonl(results: list, filename: str) -> bool:
+    """Write statistics as JSON lines (one document per image)."""
+    with open(filename, 'w', encoding='utf-8') as output:
+        for stats in results:
+            output.write(json.dumps(stats, sort_keys=True) + '\n')
+    return True
+
+
+def write_stats_csv(results: list, filename: str) -> bool:
+    """
+    Write statistics as CSV (one row per image).
+
+    Parameters
+    ----------
+    results: list, mandatory
+        The statistics of each image (and the aggregate)
+
+    filename: str, mandatory
+        The file to write
+
+    Returns
+    -------
+    True
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    There is a column for each mnemonic in the instruction table, and one
+    with the number of distinct call targets.
+
+    """
+    mnemonics = []
+    for opcodeinfo in Processor.INSTRUCTIONS:
+        name = opcodeinfo['mnemonic'][:3].strip()
+        if name not in mnemonics:
+            mnemonics.append(name)
+    columns = ['image', 'error', 'instructions', 'one_word', 'two_word',
+               'data', 'calls', 'call_targets']
+    with open(filename, 'w', encoding='utf-8', newline='') as output:
+        writer = csv.writer(output)
+        writer.writerow(columns + mnemonics)
+        for stats in results:
+            row = [stats[column] for column in columns[:6]]
+            row.append(sum(stats['call_targets'].values()))
+            row.append(len(stats['call_targets']))
+            row = row + [stats['mnemonics'].get(name, 0)
+                         for name in mnemonics]
+            writer.writerow(row)
+    return True
+
+
+def corpus_stats(sources: str, output: str = '', processes: int = 0,
+                 mode: str = 'flow') -> list:
+    """
+    Disassemble many images across a pool of processes.
+
+    Parameters
+    ----------
+    sources: str, mandatory
+        A directory (all .bin and .obj files within it are used) or a glob
+        pattern
+
+    output: str, optional
+        File to write the statistics to: .csv for CSV, otherwise JSON lines
+        ('' for none)
+
+    processes: int, optional
+        Number of worker processes (0 for one per CPU, 1 to disassemble
+        within the current process)
+
+    mode: str, optional
+        'flow' or 'linear' (see memory_stats)
+
+    Returns
+    -------
+    results: list
+        The statistics of each image, in image order, followed by the
+        aggregate statistics
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    jobs = [(image, mode) for image in find_images(sources)]
+    if processes == 0:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(jobs))
+
+    if processes <= 1:
+        results = [image_stats(job) for job in jobs]
+    else:
+        import multiprocessing  # noqa
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(image_stats, jobs,
+                               chunksize=max(1, len(jobs) // (processes * 4)))
+    results.append(combine_stats(results))
+
+    if output.lower().endswith('.csv'):
+        write_stats_csv(results, output)
+    elif output != '':
+        write_stats_jsonl(results, output)
+    return results
@@ -84,3 +84,52 @@ def disassemble(chip: Processor, location: str, pc: int, byte: int,
     if show_lbls:
         msg_labels(lbls)
     return None
+
+
+def disassemble_flow(chip: Processor, location: str, entries: list,
+                     show_lbls: bool, lbls: list) -> dict:
+    """
+    Disassemble a program by following its flow of control.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    location : str, mandatory
+        The location to which the program should be loaded
+
+    entries : list, mandatory
+        The addresses at which execution may start (e.g. [0])
+
+    show_lbls : bool, mandatory
+        true/false - whether to show label table or not.
+
+    lbls: list, optional
+        any list of labels from the object module
+
+    Returns
+    -------
+    graph: dict
+        The basic block graph of the program (see build_flow_graph)
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    Unlike disassemble, words which are never reached as code are shown
+    as data rather than as instructions.
+
+    """
+    from disassembler.dis_flow import build_flow_graph  # noqa
+    from disassembler.dis_generator import flow_records, \
+        write_disassembly  # noqa
+
+    _tps = retrieve_program(chip, location)
+    graph = build_flow_graph(chip, _tps, entries, lbls)
+    write_disassembly(flow_records(_tps, graph), sys.stdout)
+    if show_lbls:
+        msg_labels(lbls)
+    return graph
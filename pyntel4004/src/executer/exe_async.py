@@ -0,0 +1,337 @@
+"""Cooperative execution of a program under asyncio."""
+
+# A program is executed by the fast loop (see executer.exe_fast) in slices
+# of at most SLICE_INSTRUCTIONS instructions (and, optionally, of at most a
+# number of simulated microseconds), and the coroutine yields to the event
+# loop between slices. One event loop may so run many processors at once,
+# each being given a slice in turn.
+#
+# Inputs and outputs
+#
+# The processor may be connected to a pair of asyncio queues (see
+# new_queues). Each item on the input queue is applied between slices:
+#
+#   ('pin10', value)            set the test signal (PIN 10)
+#   ('rom', port, value)        set the input lines of a ROM port (read by
+#                               RDR)
+#
+# and an item is put on the output queue for each port written (by a device
+# connected to every port through the peripheral bus, see
+# hardware.suboperations.bus):
+#
+#   ('rom', port, value)        WRR
+#   ('ram', bank, chip, value)  WMP
+#
+# A program waiting in an idle loop (see executer.exe_fast) waits for the
+# next input, rather than stopping, if there is an input queue; the wait
+# ends at the max_time deadline, and the cancel token is polled every
+# CANCEL_POLL seconds while waiting.
+#
+# Options
+#
+# The options of the fast loop, and:
+#
+#   slice_instructions  the most instructions executed between yields
+#                       (default SLICE_INSTRUCTIONS)
+#   slice_usec          the most simulated microseconds executed between
+#                       yields (default: no limit)
+#
+# The run limits (max_instructions, max_cycles, max_time and cancel) apply
+# to the whole execution, not to each slice. The instructions decoded (when
+# executing from ROM) and the subroutine memos (when memoising) are kept
+# from one slice to the next; a subroutine call still being recorded as a
+# slice ends is not memoised, as the inputs may change before the next.
+
+import asyncio
+import itertools
+
+from hardware.processor import Processor
+from executer.exe_fast import CYCLE_TIME, REASON_BREAK, REASON_CANCELLED, \
+    REASON_CYCLES, REASON_IDLE, REASON_INSTRUCTIONS, REASON_TIME, \
+    execute_fast  # noqa
+
+# Most instructions executed between yields to the event loop
+SLICE_INSTRUCTIONS = 1000
+
+# Seconds between polls of the cancel token while waiting for an input
+CANCEL_POLL = 0.05
+
+# Options of the fast loop which apply to the whole execution
+RUN_LIMITS = ('max_instructions', 'max_cycles', 'max_time')
+
+
+def new_queues() -> dict:
+    """Return an input and an output queue for a processor."""
+    return {'input': asyncio.Queue(), 'output': asyncio.Queue()}
+
+
+def apply_input(chip: Processor, item: tuple) -> None:
+    """Apply an item taken from the input queue."""
+    if item[0] == 'pin10':
+        chip.write_pin10(item[1])
+    elif item[0] == 'rom':
+        chip.ROM_PORT[item[1]] = item[2]
+    else:
+        raise ValueError('Unknown input: ' + str(item))
+
+
+def output_ports() -> list:
+    """Return every port which the processor may write to."""
+    from hardware.suboperations.bus import PORT_KINDS  # noqa
+
+    return [(kind,) + indices for kind in ('rom', 'ram')
+            for indices in itertools.product(
+                *(range(size) for size in PORT_KINDS[kind]))]
+
+
+def connect_outputs(chip: Processor, queue: asyncio.Queue) -> dict:
+    """
+    Put an item on a queue each time the processor writes to a port.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    queue: asyncio.Queue, mandatory
+        The output queue
+
+    Returns
+    -------
+    device: dict
+        The device connected (see disconnect_outputs)
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    The device is connected to every ROM and RAM port through the
+    peripheral bus.
+
+    """
+    def write(port, value, _cycles):
+        """Put the value written to a port on the queue."""
+        queue.put_nowait(port + (value,))
+
+    device = {'write': write, 'bus': chip.BUS}
+    for port in output_ports():
+        chip.connect_device(port, write=write)
+    return device
+
+
+def disconnect_outputs(chip: Processor, device: dict) -> None:
+    """Disconnect the device connected by connect_outputs."""
+    for port in output_ports():
+        chip.disconnect_device(port, write=device['write'])
+    # Leave no bus behind if there was none, and nothing else is connected
+    if device['bus'] is None and not (chip.BUS['writers'] or
+                                      chip.BUS['readers'] or
+                                      chip.BUS['events']):
+        chip.BUS = None
+
+
+async def next_input(inputs: asyncio.Queue, deadline: float,
+                     cancel) -> tuple:
+    """
+    Wait for the next item on the input queue.
+
+    Parameters
+    ----------
+    inputs: asyncio.Queue, mandatory
+        The input queue
+
+    deadline: float, mandatory
+        The time (time.monotonic) at which to stop waiting (None if not set)
+
+    cancel: object, mandatory
+        The cancel token (None if not set)
+
+    Returns
+    -------
+    reason: str
+        '' if an item was taken, or 'TIME' or 'CANCELLED' if the wait ended
+        first
+
+    item: tuple
+        The item taken (None if none)
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    from time import monotonic  # noqa
+
+    while True:
+        if cancel is not None and cancel.is_set():
+            return REASON_CANCELLED, None
+        timeout = None
+        if deadline is not None:
+            timeout = deadline - monotonic()
+            if timeout <= 0:
+                return REASON_TIME, None
+        if cancel is not None:
+            timeout = CANCEL_POLL if timeout is None else \
+                min(timeout, CANCEL_POLL)
+        try:
+            return '', await asyncio.wait_for(inputs.get(), timeout)
+        except asyncio.TimeoutError:
+            continue
+
+
+def slice_options(chip: Processor, options: dict, limits: dict,
+                  executed: int) -> dict:
+    """
+    Return the options of the fast loop for the next slice.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    options: dict, mandatory
+        The execution options (see module notes)
+
+    limits: dict, mandatory
+        The run limits of the whole execution: 'instructions', 'cycles'
+        (the CYCLES at which to stop) and 'deadline' (None if not set)
+
+    executed: int, mandatory
+        The number of instructions executed so far
+
+    Returns
+    -------
+    options: dict
+        The options for the slice
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    from time import monotonic  # noqa
+
+    sliced = {key: value for key, value in options.items()
+              if key not in RUN_LIMITS}
+    instructions = options.get('slice_instructions', SLICE_INSTRUCTIONS)
+    if limits['instructions'] is not None:
+        instructions = min(instructions, limits['instructions'] - executed)
+    sliced['max_instructions'] = instructions
+    cycles = None
+    if options.get('slice_usec') is not None:
+        cycles = max(1, round(options['slice_usec'] / CYCLE_TIME))
+    if limits['cycles'] is not None:
+        remaining = limits['cycles'] - chip.CYCLES
+        cycles = remaining if cycles is None else min(cycles, remaining)
+    if cycles is not None:
+        sliced['max_cycles'] = cycles
+    if limits['deadline'] is not None:
+        sliced['max_time'] = limits['deadline'] - monotonic()
+    sliced['counts'] = {}
+    return sliced
+
+
+async def run(chip: Processor, location: str, pc: int,
+              options: dict = None, queues: dict = None) -> str:
+    """
+    Execute a previously assembled program, yielding between slices.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    location : str, mandatory
+        The location from which the program is executed ('rom' or 'ram')
+
+    pc : int, mandatory
+        The program counter value to commence execution
+
+    options: dict, optional
+        Execution options (see module notes)
+
+    queues: dict, optional
+        The input and output queues (see new_queues)
+
+    Returns
+    -------
+    reason: str
+        Why execution stopped (see execute_fast)
+
+    Raises
+    ------
+    Any exception raised by an instruction
+
+    Notes
+    -----
+    Should the task running the coroutine be cancelled, execution stops
+    between slices.
+
+    """
+    from time import monotonic  # noqa
+    from executer.exe_memo import MEMO_SIZE, new_memo  # noqa
+
+    if options is None:
+        options = {}
+    if location == 'rom' and options.get('decoded') is None:
+        options = dict(options, decoded={})
+    if options.get('memoise', False) and options.get('memo') is None:
+        options = dict(options,
+                       memo=new_memo(options.get('memo_size', MEMO_SIZE)))
+    if queues is None:
+        queues = {}
+    limits = {'instructions': options.get('max_instructions'),
+              'cycles': None, 'deadline': None}
+    if options.get('max_cycles') is not None:
+        limits['cycles'] = chip.CYCLES + options['max_cycles']
+    if options.get('max_time') is not None:
+        limits['deadline'] = monotonic() + options['max_time']
+    breakpoints = set(options.get('breakpoints', []))
+    inputs = queues.get('input')
+    device = None
+    if queues.get('output') is not None:
+        device = connect_outputs(chip, queues['output'])
+    executed = 0
+    try:
+        while True:
+            while inputs is not None and not inputs.empty():
+                apply_input(chip, inputs.get_nowait())
+            sliced = slice_options(chip, options, limits, executed)
+            reason = execute_fast(chip, location, pc, sliced)
+            executed = executed + sliced['counts']['instructions']
+            pc = chip.PROGRAM_COUNTER
+            if reason == REASON_IDLE and inputs is not None:
+                reason, item = await next_input(inputs, limits['deadline'],
+                                                options.get('cancel'))
+                if reason:
+                    return reason
+                apply_input(chip, item)
+                continue
+            if reason not in (REASON_INSTRUCTIONS, REASON_CYCLES):
+                return reason
+            if limits['instructions'] is not None and \
+                    executed >= limits['instructions']:
+                return REASON_INSTRUCTIONS
+            if limits['cycles'] is not None and \
+                    chip.CYCLES >= limits['cycles']:
+                return REASON_CYCLES
+            if limits['deadline'] is not None and \
+                    monotonic() >= limits['deadline']:
+                return REASON_TIME
+            # The next slice would not stop at a breakpoint it starts at
+            if pc in breakpoints:
+                return REASON_BREAK
+            await asyncio.sleep(0)
+    finally:
+        if device is not None:
+            disconnect_outputs(chip, device)
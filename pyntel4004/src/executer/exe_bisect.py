@@ -0,0 +1,250 @@
+"""Bisection of the divergence between two runs."""
+
+# Two runs - of two programs, or of one program from two initial states -
+# are executed in step, an interval of instructions at a time, and a digest
+# of the state of each processor is compared at the end of each interval.
+# Once the digests differ, both runs are replayed from the start of that
+# interval (restored from snapshots taken there) one instruction at a time,
+# to find the first instruction after which their states differ.
+#
+# The runs are executed by the fast loop (see executer.exe_fast) without
+# idle-loop detection or fused idioms, so that every instruction is counted
+# and the intervals of both runs line up exactly.
+#
+# The digests (see hardware.suboperations.digest) cover the components of
+# the state chosen, but never the memory holding the run's program (ROM, or
+# program RAM), so two programs may be compared.
+#
+# Each difference found is reported with the item named: the index
+# registers (R0-R15), accumulator, carry, stack and program counter (with
+# the nearest label of the run's program, if known), RAM and status
+# characters (indexed by bank, chip, register and character), ports etc.
+# Any item may also be given a name of its own (the variable it holds,
+# say).
+
+from hardware.processor import Processor
+from hardware.suboperations.digest import DIGEST_COMPONENTS  # noqa
+from executer.exe_fast import REASON_INSTRUCTIONS, execute_fast  # noqa
+
+# Instructions executed between comparisons of the runs
+BISECT_INTERVAL = 1000
+
+# Most instructions executed by each run
+MAX_BISECT_INSTRUCTIONS = 1000000
+
+# Components of the state of a processor compared by default
+COMPONENTS = DIGEST_COMPONENTS
+
+
+def new_run(chip: Processor, location: str, pc: int = 0,
+            labels: list = None) -> dict:
+    """Return a run of the program loaded into a processor."""
+    chip.PROGRAM_COUNTER = pc
+    return {'chip': chip, 'location': location, 'labels': labels or []}
+
+
+def load_run(image: str) -> dict:
+    """Return a run of an assembled image (.obj or .bin)."""
+    from executer.exe_supporting import reload  # noqa
+
+    chip = Processor()
+    location, pc, labels = reload(image, chip, True)
+    return new_run(chip, location, pc, labels)
+
+
+def run_components(run: dict, components: tuple) -> tuple:
+    """Return the components of a run's state, less its program memory."""
+    program = 'pram' if run['location'] == 'ram' else 'rom'
+    return tuple(component for component in components
+                 if component != program)
+
+
+def run_digest(run: dict, components: tuple = COMPONENTS) -> bytes:
+    """Return a digest of components of the state of a run's processor."""
+    return run['chip'].digest(run_components(run, components))
+
+
+def advance(run: dict, count: int) -> tuple:
+    """Execute (at most) a number of a run's instructions."""
+    counts = {}
+    chip = run['chip']
+    reason = execute_fast(chip, run['location'], chip.PROGRAM_COUNTER,
+                          {'idle': False, 'fuse': False,
+                           'max_instructions': count, 'counts': counts})
+    return reason, counts['instructions']
+
+
+def label_address(address: int, labels: list) -> str:
+    """Return an address, with the nearest label at or before it."""
+    best = None
+    for label in labels:
+        if 0 <= label['address'] <= address and \
+                (best is None or label['address'] > best['address']):
+            best = label
+    if best is None:
+        return str(address)
+    name = best['label'].rstrip(',')
+    offset = address - best['address']
+    return str(address) + ' (' + name + \
+        ('+' + str(offset) if offset else '') + ')'
+
+
+def differences(first: dict, second: dict, names: dict = None,
+                components: tuple = COMPONENTS) -> list:
+    """
+    List the items of state which differ between two runs.
+
+    Parameters
+    ----------
+    first: dict, mandatory
+        The first run (see new_run)
+
+    second: dict, mandatory
+        The second run
+
+    names: dict, optional
+        Names of items (e.g. {'R2': 'count', 'RAM[0][0][0][0]': 'total'})
+
+    components: tuple, optional
+        The components of the state compared (see COMPONENTS)
+
+    Returns
+    -------
+    differences: list
+        A dict for each item which differs: 'item' (its name, with any name
+        given to it), 'first' and 'second' (its values in each run)
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    The program counter and stack are labelled (see label_address).
+
+    """
+    names = names or {}
+    found = []
+    for difference in first['chip'].diff(
+            second['chip'], run_components(first, components)):
+        item = difference['item']
+        first_value = difference['first']
+        second_value = difference['second']
+        if item == 'PC' or item.startswith('STACK['):
+            first_value = label_address(first_value, first['labels'])
+            second_value = label_address(second_value, second['labels'])
+        if item in names:
+            item = item + ' (' + names[item] + ')'
+        found.append({'item': item, 'first': first_value,
+                      'second': second_value})
+    return found
+
+
+def current_instruction(run: dict) -> dict:
+    """Return the address and text of a run's next instruction."""
+    from shared.shared import decode_instruction, retrieve_program  # noqa
+
+    chip = run['chip']
+    address = chip.PROGRAM_COUNTER
+    if address >= chip.MEMORY_SIZE_RAM:
+        return {'address': label_address(address, run['labels']),
+                'instruction': ''}
+    instruction = decode_instruction(
+        chip, retrieve_program(chip, run['location']), address)
+    return {'address': label_address(address, run['labels']),
+            'instruction': instruction['text']}
+
+
+def bisect_runs(first: dict, second: dict,
+                interval: int = BISECT_INTERVAL,
+                max_instructions: int = MAX_BISECT_INSTRUCTIONS,
+                names: dict = None, components: tuple = COMPONENTS) -> dict:
+    """
+    Find the first instruction after which two runs differ.
+
+    Parameters
+    ----------
+    first: dict, mandatory
+        The first run (see new_run and load_run)
+
+    second: dict, mandatory
+        The second run
+
+    interval: int, optional
+        The number of instructions executed between comparisons
+
+    max_instructions: int, optional
+        The most instructions executed by each run
+
+    names: dict, optional
+        Names of items of state (see differences)
+
+    components: tuple, optional
+        The components of the state compared (see COMPONENTS); to compare
+        the same program from two initial states, leave out those which
+        differ from the start
+
+    Returns
+    -------
+    report: dict
+        diverged        True if the runs differ
+        instructions    the number of instructions both executed alike
+        first, second   the instruction (its 'address' and 'instruction')
+                        after which the runs differ, and why each run
+                        stopped ('reason')
+        differences     the items of state which differ (see differences)
+
+    Raises
+    ------
+    Any exception raised by an instruction
+
+    Notes
+    -----
+    The processors of the runs are left in the state after the instruction
+    at which the runs differ (or where they stopped).
+
+    The runs are compared only at the end of each interval, so a difference
+    which vanishes again within an interval is not found; a smaller interval
+    finds more of them.
+
+    """
+    executed = 0
+    report = {'diverged': False, 'differences': []}
+    while executed < max_instructions:
+        saved = (first['chip'].snapshot(), second['chip'].snapshot())
+        step = min(interval, max_instructions - executed)
+        first_reason, first_count = advance(first, step)
+        second_reason, second_count = advance(second, step)
+        same = (first_reason, first_count) == (second_reason, second_count)
+        if same and run_digest(first, components) == \
+                run_digest(second, components):
+            executed = executed + first_count
+            report['first'] = {'reason': first_reason}
+            report['second'] = {'reason': second_reason}
+            if first_reason != REASON_INSTRUCTIONS:
+                break
+            continue
+
+        # Replay the interval, an instruction at a time
+        first['chip'].restore(saved[0])
+        second['chip'].restore(saved[1])
+        for _ in range(step):
+            first_instruction = current_instruction(first)
+            second_instruction = current_instruction(second)
+            first_reason, first_count = advance(first, 1)
+            second_reason, second_count = advance(second, 1)
+            if (first_reason, first_count) != \
+                    (second_reason, second_count) or \
+                    run_digest(first, components) != \
+                    run_digest(second, components):
+                break
+            executed = executed + 1
+        first_instruction['reason'] = first_reason
+        second_instruction['reason'] = second_reason
+        report.update({'diverged': True, 'first': first_instruction,
+                       'second': second_instruction,
+                       'differences': differences(
+                           first, second, names, components)})
+        break
+    report['instructions'] = executed
+    return report
@@ -0,0 +1,79 @@
+"""Execution with periodic checkpoints."""
+
+# A program is executed by the fast loop (see executer.exe_fast) in
+# intervals of a number of instructions, and an incremental checkpoint of
+# the processor (see hardware.suboperations.checkpoint) is taken before the
+# first interval and after each, so that execution may later be resumed (or
+# replayed) from any of them.
+
+from hardware.processor import Processor
+from executer.exe_fast import REASON_INSTRUCTIONS, execute_fast  # noqa
+
+# Instructions executed between checkpoints
+CHECKPOINT_INTERVAL = 10000
+
+
+def run_with_checkpoints(chip: Processor, location: str, pc: int,
+                         interval: int = CHECKPOINT_INTERVAL,
+                         options: dict = None) -> tuple:
+    """
+    Execute a previously assembled program, taking periodic checkpoints.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    location : str, mandatory
+        The location from which the program is executed ('rom' or 'ram')
+
+    pc : int, mandatory
+        The program counter value to commence execution
+
+    interval: int, optional
+        The number of instructions executed between checkpoints
+
+    options: dict, optional
+        Options for the fast loop (see executer.exe_fast); max_instructions
+        applies to the whole execution
+
+    Returns
+    -------
+    reason: str
+        Why execution stopped (see execute_fast)
+
+    checkpoints: list
+        The checkpoints taken, each with the number of instructions
+        executed before it was taken (its 'instructions')
+
+    Raises
+    ------
+    Any exception raised by an instruction
+
+    Notes
+    -----
+    The last checkpoint is taken when execution stops, however far into
+    an interval.
+
+    """
+    if options is None:
+        options = {}
+    limit = options.get('max_instructions')
+    executed = 0
+    chip.PROGRAM_COUNTER = pc
+    checkpoint = chip.checkpoint()
+    checkpoint['instructions'] = 0
+    checkpoints = [checkpoint]
+    while True:
+        step = interval if limit is None else min(interval, limit - executed)
+        counts = {}
+        reason = execute_fast(chip, location, chip.PROGRAM_COUNTER,
+                              dict(options, max_instructions=step,
+                                   counts=counts))
+        executed = executed + counts['instructions']
+        checkpoint = chip.checkpoint(checkpoint)
+        checkpoint['instructions'] = executed
+        checkpoints.append(checkpoint)
+        if reason != REASON_INSTRUCTIONS or \
+                (limit is not None and executed >= limit):
+            return reason, checkpoints
@@ -0,0 +1,442 @@
+"""Exhaustive exploration of the state space of a small routine."""
+
+# A routine is executed once for every combination of the values of its
+# inputs - index registers, accumulator, carry, test signal (PIN 10), RAM
+# and status characters - from the same initial state, and the values of
+# its outputs are recorded against the inputs, giving the complete
+# input --> output relation of the routine.
+#
+# The initial state is taken as a snapshot of the processor (see
+# hardware.suboperations.snapshot), which is restored once by each worker.
+# Between combinations only the state which the routine can change is put
+# back: the registers, stack, ports etc, and the RAM chips and program RAM
+# pages written (see write_ram and write_pram). The routine is executed by
+# the fast loop (see executer.exe_fast), keeping its decoded instructions
+# from one combination to the next.
+#
+# The final states reached are told apart by their digests (see
+# hardware.suboperations.digest), so the distinct states reached, and how
+# many combinations reach each, are reported too. Rather than digesting the
+# whole of RAM and program RAM each time, a final state's digest covers its
+# other components and just the RAM chips and program RAM pages (written by
+# the routine, or holding an input) which differ from the initial state;
+# all the final states share the same initial state, so they are still told
+# apart exactly.
+#
+# Items are named as in the digest's diff: 'ACC', 'CARRY', 'PIN10', 'R0' to
+# 'R15', 'RAM[bank][chip][register][character]',
+# 'STATUS[bank][chip][register][character]', 'ROM_PORT[port]' and
+# 'RAM_PORT[bank][port]'.
+#
+# The combinations are split into chunks of EXPLORE_CHUNK, explored across
+# a pool of processes.
+
+# Import system modules
+import hashlib
+import itertools
+import os
+import re
+
+from hardware.processor import Processor
+from executer.exe_fast import REASON_END, execute_fast  # noqa
+
+# Combinations explored by a single job
+EXPLORE_CHUNK = 4096
+
+# Most instructions executed for a single combination
+MAX_EXPLORE_INSTRUCTIONS = 100000
+
+# Components of the final state told apart (ROM is never written, and the
+# cycles taken differ between paths which reach the same state)
+STATE_COMPONENTS = ('stack', 'accumulator', 'registers', 'ram', 'ports',
+                    'pram')
+
+# Items held by an attribute of the processor, with their number of values
+SCALAR_ITEMS = {'ACC': ('ACCUMULATOR', 16), 'CARRY': ('CARRY', 2),
+                'PIN10': ('PIN_10_SIGNAL_TEST', 2), 'ACBR': ('ACBR', 16)}
+
+# Name and indices of an item held in a list
+ITEM_PATTERN = re.compile(r'^(R|RAM|STATUS|ROM_PORT|RAM_PORT)'
+                          r'((?:\[\d+\])*|\d+)$')
+
+
+def locate_item(chip: Processor, item: str) -> tuple:
+    """
+    Locate an item of the state of a processor.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    item: str, mandatory
+        The name of the item (see module notes)
+
+    Returns
+    -------
+    location: tuple
+        The list holding the item (None for an attribute of the processor),
+        its index within the list (or the attribute's name), and the number
+        of values it may hold
+
+    Raises
+    ------
+    ValueError
+        if the item is unknown
+
+    Notes
+    -----
+    N/A
+
+    """
+    if item in SCALAR_ITEMS:
+        attribute, values = SCALAR_ITEMS[item]
+        return None, attribute, values
+    match = ITEM_PATTERN.match(item)
+    if match is None:
+        raise ValueError('Unknown item: ' + item)
+    name = match.group(1)
+    indices = [int(index) for index in re.findall(r'\d+', match.group(2))]
+    location = None
+    if name == 'R' and len(indices) == 1:
+        location = chip.REGISTERS, indices[0]
+    elif name == 'RAM' and len(indices) == 4 and \
+            indices[1] < chip.NO_CHIPS_PER_BANK and \
+            indices[2] < chip.RAM_CHIP_SIZE // chip.RAM_REGISTER_SIZE and \
+            indices[3] < chip.RAM_REGISTER_SIZE:
+        location = chip.RAM, indices[0] * chip.RAM_BANK_SIZE + \
+            indices[1] * chip.RAM_CHIP_SIZE + \
+            indices[2] * chip.RAM_REGISTER_SIZE + indices[3]
+    elif name == 'STATUS' and len(indices) == 4 and \
+            indices[0] < chip.NO_DRB and \
+            indices[1] < chip.NO_CHIPS_PER_BANK and \
+            indices[2] < chip.NO_STATUS_REGISTERS:
+        location = chip.STATUS_CHARACTERS[indices[0]][indices[1]][
+            indices[2]], indices[3]
+    elif name == 'ROM_PORT' and len(indices) == 1:
+        location = chip.ROM_PORT, indices[0]
+    elif name == 'RAM_PORT' and len(indices) == 2 and \
+            indices[0] < len(chip.RAM_PORT):
+        location = chip.RAM_PORT[indices[0]], indices[1]
+    if location is None or location[1] >= len(location[0]):
+        raise ValueError('Unknown item: ' + item)
+    return location[0], location[1], 16
+
+
+def read_item(chip: Processor, location: tuple) -> int:
+    """Return the value of a located item (see locate_item)."""
+    values, index, _count = location
+    if values is None:
+        return getattr(chip, index)
+    return values[index]
+
+
+def write_item(chip: Processor, location: tuple, value: int) -> None:
+    """Set the value of a located item (see locate_item)."""
+    values, index, _count = location
+    if values is None:
+        setattr(chip, index, value)
+    else:
+        values[index] = value
+
+
+def item_page(chip: Processor, item: str) -> int:
+    """Return the RAM chip holding an item in RAM (None if not in RAM)."""
+    values, index, _count = locate_item(chip, item)
+    if values is chip.RAM:
+        return index // chip.RAM_CHIP_SIZE
+    for page, status in enumerate(itertools.chain.from_iterable(
+            chip.STATUS_CHARACTERS)):
+        if any(values is characters for characters in status):
+            return page
+    return None
+
+
+def input_values(chip: Processor, inputs) -> tuple:
+    """Return the names of the inputs, and the values each may take."""
+    if isinstance(inputs, dict):
+        names = tuple(inputs)
+        return names, [list(inputs[name]) for name in names]
+    names = tuple(inputs)
+    return names, [list(range(locate_item(chip, name)[2]))
+                   for name in names]
+
+
+def reset_chip(chip: Processor, base: Processor, state: bytes,
+               marks: tuple) -> tuple:
+    """
+    Put back the state of a processor which a routine can change.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    base : Processor, mandatory
+        A clone of the processor in its initial state
+
+    state: bytes, mandatory
+        The initial state, less its memories (see pack_state)
+
+    marks: tuple, mandatory
+        RAM_GENERATION and PRAM_GENERATION when last reset
+
+    Returns
+    -------
+    marks: tuple
+        RAM_GENERATION and PRAM_GENERATION after this reset
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    Only the RAM chips and program RAM pages written since the last reset
+    are copied back.
+
+    """
+    from hardware.suboperations.snapshot import unpack_state  # noqa
+
+    unpack_state(chip, state)
+    ram_mark, pram_mark = marks
+    for page, written in enumerate(chip.RAM_PAGES):
+        if written > ram_mark:
+            start = page * chip.RAM_CHIP_SIZE
+            chip.RAM[start:start + chip.RAM_CHIP_SIZE] = \
+                base.RAM[start:start + chip.RAM_CHIP_SIZE]
+            bank, ram = divmod(page, chip.NO_CHIPS_PER_BANK)
+            for characters, initial in zip(
+                    chip.STATUS_CHARACTERS[bank][ram],
+                    base.STATUS_CHARACTERS[bank][ram]):
+                characters[:] = initial
+    for page, written in enumerate(chip.PRAM_PAGES):
+        if written > pram_mark:
+            start = page * chip.PAGE_SIZE
+            chip.PRAM[start:start + chip.PAGE_SIZE] = \
+                base.PRAM[start:start + chip.PAGE_SIZE]
+    return chip.RAM_GENERATION, chip.PRAM_GENERATION
+
+
+def final_digest(chip: Processor, base: Processor, components: tuple,
+                 marks: tuple, pages: set) -> bytes:
+    """
+    Return a digest of the final state of a processor.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    base : Processor, mandatory
+        A clone of the processor in its initial state
+
+    components: tuple, mandatory
+        The components of the state digested (see DIGEST_COMPONENTS)
+
+    marks: tuple, mandatory
+        RAM_GENERATION and PRAM_GENERATION when last reset
+
+    pages: set, mandatory
+        The RAM chips holding an input
+
+    Returns
+    -------
+    digest: bytes
+        The digest
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    Only the RAM chips and program RAM pages which differ from the initial
+    state are digested (see module notes).
+
+    """
+    from hardware.suboperations.checkpoint import ram_page  # noqa
+    from hardware.suboperations.digest import DIGEST_PERSON, DIGEST_SIZE, \
+        pack_selection  # noqa
+
+    state = hashlib.blake2b(digest_size=DIGEST_SIZE, person=DIGEST_PERSON)
+    state.update(chip.digest(tuple(component for component in components
+                                   if component not in ('ram', 'pram'))))
+    if 'ram' in components:
+        state.update(pack_selection(chip))
+        for page, written in enumerate(chip.RAM_PAGES):
+            if written > marks[0] or page in pages:
+                content = ram_page(chip, page)
+                if content != ram_page(base, page):
+                    state.update(bytes([page]) + content)
+    if 'pram' in components:
+        state.update(bytes([chip.WPM_COUNTER == 'RIGHT']))
+        for page, written in enumerate(chip.PRAM_PAGES):
+            start = page * chip.PAGE_SIZE
+            content = chip.PRAM[start:start + chip.PAGE_SIZE]
+            if written > marks[1] and \
+                    content != base.PRAM[start:start + chip.PAGE_SIZE]:
+                state.update(bytes([page]) + repr(content).encode('utf-8'))
+    return state.digest()
+
+
+def explore_chunk(job: tuple) -> list:
+    """
+    Explore a chunk of the combinations of the inputs of a routine.
+
+    Parameters
+    ----------
+    job: tuple, mandatory
+        The snapshot of the initial state, location and program counter of
+        the routine, its inputs (names and values), outputs, components of
+        the state told apart, fast loop options, and the first and last
+        (excluded) combination of the chunk
+
+    Returns
+    -------
+    results: list
+        For each combination, in order: the values of the outputs, the
+        digest of the final state and why execution stopped (or the
+        exception raised by an instruction)
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    from hardware.suboperations.snapshot import pack_state  # noqa
+
+    blob, location, pc, names, values, outputs, components, options, \
+        start, stop = job
+    chip = Processor()
+    chip.restore(blob)
+    base = chip.clone()
+    state = pack_state(chip)
+    marks = (chip.RAM_GENERATION, chip.PRAM_GENERATION)
+    inputs = [locate_item(chip, name) for name in names]
+    pages = {item_page(chip, name) for name in names} - {None}
+    outputs = [locate_item(chip, name) for name in outputs]
+    options = dict(options, decoded={})
+    results = []
+    for combination in itertools.islice(itertools.product(*values),
+                                        start, stop):
+        marks = reset_chip(chip, base, state, marks)
+        for item, value in zip(inputs, combination):
+            write_item(chip, item, value)
+        try:
+            reason = execute_fast(chip, location, pc, options)
+        except Exception as ex:  # noqa
+            reason = type(ex).__name__ + ': ' + str(ex)
+        results.append((tuple(read_item(chip, item) for item in outputs),
+                        final_digest(chip, base, components, marks,
+                                     pages), reason))
+    return results
+
+
+def explore(chip: Processor, location: str, pc: int, inputs,
+            outputs: tuple = ('ACC', 'CARRY'),
+            components: tuple = STATE_COMPONENTS, processes: int = 0,
+            options: dict = None) -> dict:
+    """
+    Explore every combination of the inputs of a routine.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor holding the routine and the initial
+        state (left unchanged)
+
+    location : str, mandatory
+        The location from which the routine is executed ('rom' or 'ram')
+
+    pc : int, mandatory
+        The program counter value to commence execution
+
+    inputs: list or dict, mandatory
+        The names of the inputs (each taking every value it can hold), or
+        name --> the values it takes
+
+    outputs: tuple, optional
+        The names of the outputs
+
+    components: tuple, optional
+        The components of the final state told apart (see DIGEST_COMPONENTS)
+
+    processes: int, optional
+        Number of worker processes (0 for one per CPU, 1 to explore within
+        the current process)
+
+    options: dict, optional
+        Options for the fast loop (see executer.exe_fast); max_instructions
+        applies to each combination (default MAX_EXPLORE_INSTRUCTIONS)
+
+    Returns
+    -------
+    report: dict
+        inputs          the names of the inputs
+        outputs         the names of the outputs
+        combinations    the number of combinations explored
+        relation        input values --> output values, for every
+                        combination
+        states          digest --> the number of combinations reaching
+                        each distinct final state ('count'), and the first
+                        of them ('inputs') with its outputs ('outputs')
+        stopped         input values --> why execution stopped, for every
+                        combination which did not reach the end (an
+                        exception raised by an instruction is given by its
+                        type and message)
+
+    Raises
+    ------
+    ValueError
+        if an item is unknown
+
+    Notes
+    -----
+    N/A
+
+    """
+    options = dict({'max_instructions': MAX_EXPLORE_INSTRUCTIONS},
+                   **(options or {}))
+    names, values = input_values(chip, inputs)
+    outputs = tuple(outputs)
+    for name in outputs:
+        locate_item(chip, name)
+    combinations = 1
+    for choices in values:
+        combinations = combinations * len(choices)
+
+    blob = chip.snapshot()
+    jobs = [(blob, location, pc, names, values, outputs, components,
+             options, start, min(start + EXPLORE_CHUNK, combinations))
+            for start in range(0, combinations, EXPLORE_CHUNK)]
+    if processes == 0:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(jobs))
+
+    if processes <= 1:
+        chunks = [explore_chunk(job) for job in jobs]
+    else:
+        import multiprocessing  # noqa
+        with multiprocessing.Pool(processes) as pool:
+            chunks = pool.map(explore_chunk, jobs)
+
+    report = {'inputs': names, 'outputs': outputs,
+              'combinations': combinations, 'relation': {}, 'states': {},
+              'stopped': {}}
+    for combination, (output, digest, reason) in zip(
+            itertools.product(*values), itertools.chain(*chunks)):
+        report['relation'][combination] = output
+        reached = report['states'].get(digest)
+        if reached is None:
+            report['states'][digest] = {'count': 1, 'inputs': combination,
+                                        'outputs': output}
+        else:
+            reached['count'] = reached['count'] + 1
+        if reason != REASON_END:
+            report['stopped'][combination] = reason
+    return report
@@ -0,0 +1,678 @@
+"""Fast (untraced) execution of a previously assembled program."""
+
+# The fast loop decodes each instruction once, caching the operation to call
+# and its arguments against the instruction's address. There is no monitor
+# and no trace of the instructions executed, and the number of instruction
+# cycles executed is kept in the processor's CYCLES counter.
+#
+# Only program RAM can change during execution (by WPM, which counts its
+# writes in PRAM_GENERATION and marks the page written in PRAM_PAGES). When
+# executing from program RAM, the generation is compared after each
+# instruction; if it has moved on, the entries decoded from the pages
+# written are discarded, as is everything derived from the program (the
+# analysis of loops and the subroutine memos).
+#
+# Idle and counting loops
+#
+# A loop is a run of instructions ending in a JCN, ISZ or JUN back to its
+# first instruction. If the run contains no calls or writes to RAM, ports
+# or program memory, and any jump within it stays within it, an iteration
+# can depend only upon the processor's registers and inputs which the loop
+# itself cannot change (the test signal on PIN 10, ROM/RAM ports and RAM).
+# The state of the registers is recorded each time the loop branches back,
+# and once a state recurs the loop's future is known:
+#
+#   JCN/JUN     the loop repeats the same states forever, so it runs until
+#               an input changes - execution stops with the reason 'IDLE',
+#               leaving the program counter at the start of the loop
+#   ISZ         the loop repeats the same states (ignoring the counter
+#               register) until the counter wraps to 0, so the remaining
+#               iterations are done as one bulk update: the registers are
+#               set to the state the last iteration would leave, the counter
+#               to 0, and the cycles are counted as if the loop had run
+#
+# An ISZ loop qualifies only if no other instruction in it uses the counter
+# register (or the register pair containing it). Loops within loops are
+# accelerated from the inside out, so nested delay loops collapse to a
+# handful of dispatched instructions.
+#
+# A loop reading a ROM port or the test signal is not accelerated while its
+# inputs may change through the peripheral bus (see
+# hardware.suboperations.bus): while a device supplies an input, or an
+# input is scheduled. An idle loop waiting for a scheduled input passes
+# over the cycles up to it instead, in whole iterations.
+#
+# Fused idioms
+#
+# Common sequences of instructions (see IDIOMS) are decoded as a single
+# entry whose handler runs each instruction's operation in turn, so the
+# sequence costs a single dispatch. A sequence is not fused if a breakpoint
+# sits on any but its first instruction.
+#
+# Options
+#
+#   idle        detect idle loops (default True)
+#   fuse        fuse common idioms (default True)
+#   breakpoints addresses at which execution stops (with the reason
+#               'BREAK') before executing the instruction there; the first
+#               instruction executed is never stopped at, so execution may
+#               be resumed from a breakpoint
+#   memoise     memoise subroutine calls (default False, see
+#               executer.exe_memo); ignored if there are breakpoints, which
+#               a memoised call would pass over
+#   memo_size   number of memos kept for each subroutine
+#   memo        a set of subroutine memos (see executer.exe_memo.new_memo)
+#               kept from one execution to the next, when memoising; a
+#               recording in progress is abandoned as each execution stops
+#   max_instructions    stop (with the reason 'INSTRUCTIONS') once this
+#                       many instructions have been executed
+#   max_cycles  stop (with the reason 'CYCLES') once this many instruction
+#               cycles have been executed
+#   max_time    stop (with the reason 'TIME') once this many seconds of
+#               wall-clock time have passed
+#   counts      a dict, whose 'instructions' entry is increased by the
+#               number of instructions executed
+#   cancel      a cancel token (a threading.Event, or any object with an
+#               is_set method), which stops execution (with the reason
+#               'CANCELLED') once set from any thread
+#   decoded     a dict in which the decoded instructions are kept from one
+#               execution to the next, so a short routine executed many
+#               times is decoded once; it must be used only with the same
+#               processor, program (in ROM) and options
+#
+# Run limits
+#
+# The limits, and the cancel token, are checked only after every
+# LIMIT_BATCH instructions (or as the instruction limit is reached), so
+# they cost a single comparison per instruction. Execution stops between
+# instructions, and may be resumed from the program counter. Cycles skipped
+# over by an accelerated loop or memoised call count towards the cycle
+# limit, but their instructions do not count towards the instruction limit.
+
+from hardware.processor import Processor
+from shared.shared import decode_instruction, retrieve_program  # noqa
+
+# Reasons for the fast loop to stop
+REASON_END = 'END'              # "end" pseudo-opcode, or end of memory
+REASON_IDLE = 'IDLE'            # Idle loop waiting on an input
+REASON_INVALID = 'INVALID'      # Invalid opcode
+REASON_BREAK = 'BREAK'          # Breakpoint reached
+REASON_INSTRUCTIONS = 'INSTRUCTIONS'    # Instruction limit reached
+REASON_CYCLES = 'CYCLES'        # Cycle limit reached
+REASON_TIME = 'TIME'            # Wall-clock limit reached
+REASON_CANCELLED = 'CANCELLED'  # Cancel token set
+
+# Instructions executed between checks of the run limits
+LIMIT_BATCH = 256
+
+# Execution time of a single instruction cycle (usec)
+CYCLE_TIME = 10.8
+
+# Longest loop (in words) examined
+MAX_LOOP_WORDS = 64
+
+# Most states recorded for a loop before its record is started afresh
+MAX_LOOP_STATES = 64
+
+# Instructions which end a loop (or jump within one)
+LOOP_BRANCHES = ('jcn', 'isz', 'jun')
+
+# Instructions which may not appear within a loop
+LOOP_EXCLUDED = ('jms', 'jin', 'bbl', 'wrm', 'wmp', 'wrr', 'wpm', 'wr0',
+                 'wr1', 'wr2', 'wr3', 'end', '-')
+
+# Idioms fused into a single dispatch (longest first)
+IDIOMS = (('src', 'adm', 'daa', 'wrm'),
+          ('fim', 'src', 'rdm'),
+          ('fim', 'src', 'wrm'),
+          ('adm', 'daa', 'wrm'),
+          ('rdm', 'adm', 'wrm'),
+          ('src', 'rdm'),
+          ('src', 'wrm'),
+          ('src', 'adm'),
+          ('ldm', 'xch'),
+          ('clb', 'add'))
+
+# Instructions whose first operand is an index register
+REGISTER_OPERANDS = ('inc', 'add', 'sub', 'ld', 'xch', 'isz')
+
+# Instructions whose first operand is a register pair
+PAIR_OPERANDS = ('fim', 'src', 'fin')
+
+
+def opcode_cycles(chip: Processor, opcode: int) -> int:
+    """Return the number of instruction cycles an opcode takes."""
+    opcodeinfo = chip.INSTRUCTIONS[opcode]
+    return max(opcodeinfo['words'], round(opcodeinfo.get('exe', 0) /
+                                          CYCLE_TIME))
+
+
+def decode_entry(chip: Processor, memory: list, address: int) -> tuple:
+    """
+    Decode an instruction into a form ready for repeated execution.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    memory: list, mandatory
+        The memory (ROM/PRAM) containing the program
+
+    address: int, mandatory
+        The address of the instruction
+
+    Returns
+    -------
+    entry: tuple
+        (code, name, operation, arguments, words, cycles, target), where
+        code is the word(s) of the instruction, operation the processor
+        method which executes it and cycles the number of instruction
+        cycles it takes
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    JCN, ISZ, JUN and JMS are given their full destination address.
+
+    """
+    instruction = decode_instruction(chip, memory, address)
+    name = instruction['name']
+    opcodeinfo = chip.INSTRUCTIONS[instruction['opcode']]
+    words = instruction['words']
+    cycles = opcode_cycles(chip, instruction['opcode'])
+    code = tuple(instruction['code'])
+    mnemonic = opcodeinfo['mnemonic']
+    arguments = ()
+    if name in ('jun', 'jms'):
+        arguments = (instruction['target'],)
+    elif '(' in mnemonic and mnemonic[mnemonic.find('(') + 1].isdigit():
+        first = int(mnemonic[mnemonic.find('(') + 1:].split(',')[0].
+                    rstrip(')').rstrip('p'))
+        if name in ('jcn', 'isz'):
+            arguments = (first, instruction['target'])
+        elif name == 'fim':
+            arguments = (first, code[1] if len(code) == 2 else 0)
+        else:
+            arguments = (first,)
+    return code, name, chip.OPERATIONS.get(name), arguments, words, cycles, \
+        instruction['target']
+
+
+def fuse_operations(operations: list):
+    """Return a handler which runs a sequence of operations in turn."""
+    def fused():
+        for operation, arguments in operations:
+            operation(*arguments)
+    return fused
+
+
+def decode_fused(chip: Processor, memory: list, address: int,
+                 breakpoints) -> tuple:
+    """
+    Decode an instruction, fused with those following it if an idiom.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    memory: list, mandatory
+        The memory (ROM/PRAM) containing the program
+
+    address: int, mandatory
+        The address of the first instruction
+
+    breakpoints: set, mandatory
+        Addresses at which execution must be able to stop
+
+    Returns
+    -------
+    entry: tuple
+        As decode_entry, the name of a fused entry being the names of the
+        instructions joined by '+'
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    first = decode_entry(chip, memory, address)
+    for idiom in IDIOMS:
+        if idiom[0] != first[1]:
+            continue
+        entries = [first]
+        following = address + first[4]
+        for name in idiom[1:]:
+            if following in breakpoints or following >= len(memory):
+                break
+            entry = decode_entry(chip, memory, following)
+            if entry[1] != name:
+                break
+            entries.append(entry)
+            following = following + entry[4]
+        if len(entries) == len(idiom):
+            code = tuple(word for entry in entries for word in entry[0])
+            return code, '+'.join(idiom), \
+                fuse_operations([(entry[2], entry[3]) for entry in entries]), \
+                (), len(code), sum(entry[5] for entry in entries), -1
+    return first
+
+
+def uses_register(entry: tuple, register: int) -> bool:
+    """Determine whether an instruction uses an index register."""
+    name = entry[1]
+    arguments = entry[3]
+    if not arguments:
+        return False
+    if name in PAIR_OPERANDS:
+        return arguments[0] == register // 2 or \
+            (name == 'fin' and register < 2)
+    return name in REGISTER_OPERANDS and arguments[0] == register
+
+
+def find_loop(chip: Processor, memory: list, start: int,
+              branch: int) -> dict:
+    """
+    Examine a loop for the possibility of accelerating it.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    memory: list, mandatory
+        The memory (ROM/PRAM) containing the program
+
+    start: int, mandatory
+        The address of the first instruction of the loop
+
+    branch: int, mandatory
+        The address of the JCN/ISZ/JUN which ends the loop
+
+    Returns
+    -------
+    loop: dict
+        kind        name of the instruction ending the loop
+        counter     the counter register of an ISZ loop (-1 otherwise)
+        inputs      True if the loop reads a ROM port or the test signal
+        or None if the loop cannot be accelerated
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    if branch - start >= MAX_LOOP_WORDS:
+        return None
+    entries = {}
+    address = start
+    while address <= branch:
+        entry = decode_entry(chip, memory, address)
+        if entry[1] in LOOP_EXCLUDED:
+            return None
+        entries[address] = entry
+        address = address + entry[4]
+    last = entries.pop(branch, None)
+    if last is None or last[1] not in LOOP_BRANCHES:
+        return None
+    for entry in entries.values():
+        if entry[1] in LOOP_BRANCHES and entry[6] not in entries and \
+                entry[6] != branch:
+            return None
+    inputs = any(entry[1] == 'rdr' or
+                 (entry[1] == 'jcn' and entry[3][0] & 1)
+                 for entry in list(entries.values()) + [last])
+    counter = -1
+    if last[1] == 'isz':
+        counter = last[3][0]
+        for entry in entries.values():
+            if uses_register(entry, counter):
+                return None
+    return {'kind': last[1], 'counter': counter, 'inputs': inputs}
+
+
+def loop_state(chip: Processor, counter: int) -> tuple:
+    """Return the state a loop may change (less its counter)."""
+    registers = list(chip.REGISTERS)
+    if counter != -1:
+        registers[counter] = 0
+    return (chip.ACCUMULATOR, chip.CARRY, tuple(registers),
+            chip.COMMAND_REGISTER, chip.CURRENT_DRAM_BANK, chip.ACBR)
+
+
+def restore_state(chip: Processor, state: tuple) -> None:
+    """Set the state a loop may change (see loop_state)."""
+    chip.ACCUMULATOR, chip.CARRY, registers, chip.COMMAND_REGISTER, \
+        chip.CURRENT_DRAM_BANK, chip.ACBR = state
+    chip.REGISTERS[:] = registers
+
+
+def skip_loop(chip: Processor, loop: dict, history: dict, first: int,
+              branch: int) -> None:
+    """
+    Complete the remaining iterations of an ISZ loop as one bulk update.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    loop: dict, mandatory
+        The loop (see find_loop)
+
+    history: dict, mandatory
+        The states recorded each time the loop branched back (states) and
+        the CYCLES count at those times (cycles)
+
+    first: int, mandatory
+        The index in the history of the state which has now recurred
+
+    branch: int, mandatory
+        The address of the ISZ which ends the loop
+
+    Returns
+    -------
+    N/A
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    The states from the first occurrence onwards repeat with a period of
+    the number of iterations since, as do the cycles taken by each
+    iteration.
+
+    """
+    marks = history['cycles'][first:] + [chip.CYCLES]
+    per_iteration = [marks[i + 1] - marks[i] for i in range(len(marks) - 1)]
+    period = len(per_iteration)
+    remaining = (chip.MAX_4_BITS + 1) - chip.REGISTERS[loop['counter']]
+    restore_state(chip, history['states'][first + remaining % period])
+    chip.REGISTERS[loop['counter']] = 0
+    chip.CYCLES = chip.CYCLES + (remaining // period) * sum(per_iteration) + \
+        sum(per_iteration[:remaining % period])
+    chip.PROGRAM_COUNTER = branch
+    chip.increment_pc(2)
+
+
+def execute_fast(chip: Processor, location: str, pc: int,
+                 options: dict = None) -> str:
+    """
+    Execute a previously assembled program without tracing.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    location : str, mandatory
+        The location from which the program is executed ('rom' or 'ram')
+
+    pc : int, mandatory
+        The program counter value to commence execution
+
+    options: dict, optional
+        Execution options (see module notes)
+
+    Returns
+    -------
+    reason: str
+        Why execution stopped: 'END', 'IDLE', 'BREAK', 'INVALID' or, if a
+        run limit was reached, 'INSTRUCTIONS', 'CYCLES', 'TIME' or
+        'CANCELLED'
+
+    Raises
+    ------
+    Any exception raised by an instruction
+
+    Notes
+    -----
+    Execution stopped by an idle loop may be resumed (from the program
+    counter) once an input has changed; execution stopped by a run limit
+    may be resumed at once.
+
+    """
+    from executer.exe_memo import MEMO_SIZE, abandon, new_memo  # noqa
+
+    if options is None:
+        options = {}
+    memo = None
+    if options.get('memoise', False) and not options.get('breakpoints'):
+        memo = options.get('memo')
+        if memo is None:
+            memo = new_memo(options.get('memo_size', MEMO_SIZE))
+    memory = retrieve_program(chip, location)
+    chip.PROGRAM_COUNTER = pc
+    try:
+        reason, executed = fast_loop(chip, memory, options, memo)
+        counts = options.get('counts')
+        if counts is not None:
+            counts['instructions'] = counts.get('instructions', 0) + executed
+        return reason
+    finally:
+        if memo is not None:
+            abandon(chip, memo)
+
+
+def discard_pages(chip: Processor, cache: dict, pages: dict,
+                  generation: int) -> None:
+    """Discard the decoded entries of the pages written since a generation."""
+    for page, written in enumerate(chip.PRAM_PAGES):
+        if written > generation:
+            for address in pages.pop(page, ()):
+                cache.pop(address, None)
+
+
+def run_limits(chip: Processor, options: dict) -> dict:
+    """Return the run limits of an execution (None if there are none)."""
+    if not any(options.get(option) is not None for option in
+               ('max_instructions', 'max_cycles', 'max_time', 'cancel')):
+        return None
+    limits = {'instructions': options.get('max_instructions'),
+              'cycles': None, 'deadline': None, 'clock': None,
+              'cancel': options.get('cancel')}
+    if options.get('max_cycles') is not None:
+        limits['cycles'] = chip.CYCLES + options['max_cycles']
+    if options.get('max_time') is not None:
+        import time  # noqa
+        limits['clock'] = time.monotonic
+        limits['deadline'] = time.monotonic() + options['max_time']
+    return limits
+
+
+def check_limits(chip: Processor, limits: dict, executed: int) -> tuple:
+    """
+    Check the run limits of an execution.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    limits: dict, mandatory
+        The run limits (see run_limits)
+
+    executed: int, mandatory
+        The number of instructions executed so far
+
+    Returns
+    -------
+    reason: str
+        The limit reached ('' if none)
+
+    check: int
+        The number of instructions executed at which to check again
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    check = executed + LIMIT_BATCH
+    if limits['instructions'] is not None:
+        if executed >= limits['instructions']:
+            return REASON_INSTRUCTIONS, check
+        check = min(check, limits['instructions'])
+    if limits['cycles'] is not None and chip.CYCLES >= limits['cycles']:
+        return REASON_CYCLES, check
+    if limits['deadline'] is not None and \
+            limits['clock']() >= limits['deadline']:
+        return REASON_TIME, check
+    if limits['cancel'] is not None and limits['cancel'].is_set():
+        return REASON_CANCELLED, check
+    return '', check
+
+
+def fast_loop(chip: Processor, memory: list, options: dict,
+              memo: dict) -> str:
+    """
+    Run the fast execution loop (see execute_fast).
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    memory: list, mandatory
+        The memory (ROM/PRAM) containing the program
+
+    options: dict, mandatory
+        Execution options (see module notes)
+
+    memo: dict, mandatory
+        Subroutine memos (None if calls are not memoised)
+
+    Returns
+    -------
+    reason: str
+        Why execution stopped (see execute_fast)
+
+    executed: int
+        The number of instructions executed
+
+    Raises
+    ------
+    Any exception raised by an instruction
+
+    Notes
+    -----
+    N/A
+
+    """
+    from executer.exe_memo import observe, recall, \
+        start_recording  # noqa
+    from hardware.suboperations.bus import wait_for_inputs  # noqa
+
+    idle = options.get('idle', True)
+    breakpoints = set(options.get('breakpoints', []))
+    fuse = options.get('fuse', True)
+    watch = memory is chip.PRAM
+    cache = {}
+    if not watch and options.get('decoded') is not None:
+        cache = options['decoded']
+    loops = {}
+    histories = {}
+    started = False
+    generation = chip.PRAM_GENERATION
+    pages = {}
+    limits = run_limits(chip, options)
+    executed = 0
+    check = 0
+    while chip.PROGRAM_COUNTER < chip.MEMORY_SIZE_RAM:
+        if limits is not None and executed >= check:
+            reason, check = check_limits(chip, limits, executed)
+            if reason:
+                return reason, executed
+        if watch and chip.PRAM_GENERATION != generation:
+            discard_pages(chip, cache, pages, generation)
+            generation = chip.PRAM_GENERATION
+            loops = {}
+            histories = {}
+            if memo is not None:
+                memo['routines'] = {}
+        address = chip.PROGRAM_COUNTER
+        if started and address in breakpoints:
+            return REASON_BREAK, executed
+        started = True
+        entry = cache.get(address)
+        if entry is None:
+            if fuse:
+                entry = decode_fused(chip, memory, address, breakpoints)
+            else:
+                entry = decode_entry(chip, memory, address)
+            cache[address] = entry
+            if watch:
+                for page in {address // chip.PAGE_SIZE,
+                             (address + len(entry[0]) - 1) // chip.PAGE_SIZE}:
+                    pages.setdefault(page, []).append(address)
+        code, name, operation, arguments, _words, cycles, target = entry
+        if name == 'end':
+            return REASON_END, executed
+        if operation is None:
+            return REASON_INVALID, executed
+        if name == 'jms' and memo is not None and \
+                memo['recording'] is None:
+            if recall(chip, memo, address, target):
+                executed = executed + 1
+                continue
+            start_recording(chip, memo, address, target)
+        operation(*arguments)
+        if name == 'jms':
+            chip.PROGRAM_COUNTER = target
+        chip.CYCLES = chip.CYCLES + cycles
+        executed = executed + 1 + name.count('+')
+        if memo is not None:
+            observe(chip, memo, name, arguments)
+            if memo['recording'] is not None:
+                continue
+
+        # A loop branching back (or leaving)
+        if not idle or name not in LOOP_BRANCHES or target > address:
+            continue
+        key = (target, address)
+        if chip.PROGRAM_COUNTER != target:
+            histories.pop(key, None)
+            continue
+        if key not in loops:
+            loops[key] = find_loop(chip, memory, target, address)
+        loop = loops[key]
+        if loop is None:
+            continue
+        state = loop_state(chip, loop['counter'])
+        history = histories.get(key)
+        if history is None or len(history['states']) == MAX_LOOP_STATES:
+            history = {'states': [], 'cycles': [], 'index': {}}
+            histories[key] = history
+        first = history['index'].get(state)
+        if first is None:
+            history['index'][state] = len(history['states'])
+            history['states'].append(state)
+            history['cycles'].append(chip.CYCLES)
+            continue
+        if loop['inputs'] and chip.BUS is not None and wait_for_inputs(
+                chip, loop['kind'], chip.CYCLES - history['cycles'][first]):
+            del histories[key]
+            continue
+        if loop['kind'] != 'isz':
+            return REASON_IDLE, executed
+        skip_loop(chip, loop, history, first, address)
+        del histories[key]
+    return REASON_END, executed
@@ -0,0 +1,251 @@
+"""Memoisation of subroutine calls during fast execution."""
+
+# When a JMS is executed, the index registers, RAM and stack are replaced
+# by lists which record the items read (before being written) and written,
+# until the matching BBL returns to the instruction following the JMS. What
+# was read and written is then kept, for the subroutine, as a memo:
+#
+#   inputs      the processor state on entry (accumulator, carry, command
+#               register, RAM/DRAM banks, ACBR, test signal and stack
+#               pointer) together with the registers and RAM characters
+#               read, and their values
+#   outputs     the same processor state on return, and the registers, RAM
+#               characters and stack entries written, with their values
+#   cycles      the instruction cycles taken by the call
+#
+# The return address pushed by the JMS is the only output which depends
+# upon where the subroutine was called from, and it is replaced by that of
+# the JMS when a memo is applied.
+#
+# A later JMS to the subroutine whose inputs match those of a memo is not
+# executed: the outputs are applied, and the cycles counted, directly. As
+# execution is deterministic, the same inputs must give the same outputs.
+#
+# A subroutine which uses the RAM status characters, ports or program
+# memory, or takes too long to return, is never memoised; nor, while devices
+# may supply the test signal (see hardware.suboperations.bus), is one which
+# tests it with JCN. Each subroutine
+# keeps its most recently used memos, and all memos are forgotten when
+# WPM writes to program memory.
+
+from hardware.processor import Processor
+
+# Number of memos kept for each subroutine
+MEMO_SIZE = 16
+
+# Most instructions executed by a subroutine being memoised
+MAX_MEMO_STEPS = 4096
+
+# Instructions which prevent a subroutine being memoised
+MEMO_EXCLUDED = ('rd0', 'rd1', 'rd2', 'rd3', 'wr0', 'wr1', 'wr2', 'wr3',
+                 'rdr', 'wrr', 'wmp', 'wpm', 'end', '-')
+
+
+class TrackedList(list):
+
+    """A list recording which of its items are read and written."""
+
+    def __init__(self, items: list):
+        """Copy the items, with nothing yet read or written."""
+        super().__init__(items)
+        self.read = set()
+        self.written = set()
+
+    def __getitem__(self, index):
+        """Read an item (or slice), recording which were read."""
+        indices = range(len(self))[index]
+        if isinstance(index, slice):
+            self.read.update(set(indices) - self.written)
+        elif indices not in self.written:
+            self.read.add(indices)
+        return super().__getitem__(index)
+
+    def __setitem__(self, index, value):
+        """Write an item (or slice), recording which were written."""
+        indices = range(len(self))[index]
+        if isinstance(index, slice):
+            self.written.update(indices)
+        else:
+            self.written.add(indices)
+        super().__setitem__(index, value)
+
+
+def new_memo(size: int = MEMO_SIZE) -> dict:
+    """Return an empty set of subroutine memos."""
+    return {'size': size, 'routines': {}, 'excluded': set(),
+            'recording': None}
+
+
+def call_state(chip: Processor) -> tuple:
+    """Return the processor state a subroutine call starts from."""
+    return (chip.ACCUMULATOR, chip.CARRY, chip.COMMAND_REGISTER,
+            chip.CURRENT_DRAM_BANK, chip.CURRENT_RAM_BANK, chip.ACBR,
+            chip.PIN_10_SIGNAL_TEST, chip.STACK_POINTER)
+
+
+def recall(chip: Processor, memo: dict, site: int, routine: int) -> bool:
+    """
+    Apply a memo of a subroutine call, if one matches.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    memo: dict, mandatory
+        The subroutine memos (see new_memo)
+
+    site: int, mandatory
+        The address of the JMS
+
+    routine: int, mandatory
+        The address of the subroutine
+
+    Returns
+    -------
+    True if a memo was applied (the call is complete), False otherwise
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    memos = memo['routines'].get(routine, [])
+    state = call_state(chip)
+    for entry in reversed(memos):
+        if entry['state'] != state or \
+                any(chip.REGISTERS[i] != v for i, v in entry['registers']) \
+                or any(chip.RAM[i] != v for i, v in entry['ram']):
+            continue
+        memos.remove(entry)
+        memos.append(entry)
+        outputs = entry['outputs']
+        for i, value in outputs['registers']:
+            chip.REGISTERS[i] = value
+        for i, value in outputs['ram']:
+            chip.write_ram(i, value)
+        for i, value in outputs['stack']:
+            chip.STACK[i] = value
+        chip.STACK[entry['state'][-1]] = site + 2
+        chip.ACCUMULATOR, chip.CARRY, chip.COMMAND_REGISTER, \
+            chip.CURRENT_DRAM_BANK, chip.CURRENT_RAM_BANK, chip.ACBR, \
+            chip.STACK_POINTER = outputs['state']
+        chip.PROGRAM_COUNTER = site + 2
+        chip.CYCLES = chip.CYCLES + entry['cycles']
+        return True
+    return False
+
+
+def start_recording(chip: Processor, memo: dict, site: int,
+                    routine: int) -> None:
+    """Begin recording a subroutine call (before its JMS executes)."""
+    if routine in memo['excluded']:
+        return
+    memo['recording'] = {'routine': routine, 'state': call_state(chip),
+                         'cycles': chip.CYCLES, 'steps': 0,
+                         'site': site, 'registers': chip.REGISTERS,
+                         'ram': chip.RAM, 'stack': chip.STACK}
+    chip.REGISTERS = TrackedList(chip.REGISTERS)
+    chip.RAM = TrackedList(chip.RAM)
+    chip.STACK = TrackedList(chip.STACK)
+
+
+def stop_recording(chip: Processor, memo: dict) -> tuple:
+    """Stop recording, restoring the registers, RAM and stack."""
+    recording = memo['recording']
+    memo['recording'] = None
+    tracked = (chip.REGISTERS, chip.RAM, chip.STACK)
+    recording['registers'][:] = chip.REGISTERS
+    recording['ram'][:] = chip.RAM
+    recording['stack'][:] = chip.STACK
+    chip.REGISTERS = recording['registers']
+    chip.RAM = recording['ram']
+    chip.STACK = recording['stack']
+    return recording, tracked
+
+
+def finish_recording(chip: Processor, memo: dict) -> None:
+    """Keep a memo of the subroutine call just returned from."""
+    # The registers and RAM replaced by the recording still hold the values
+    # on entry to the subroutine
+    recording = memo['recording']
+    registers = tuple((i, recording['registers'][i])
+                      for i in sorted(chip.REGISTERS.read))
+    ram = tuple((i, recording['ram'][i]) for i in sorted(chip.RAM.read))
+    _recording, (written_registers, written_ram, written_stack) = \
+        stop_recording(chip, memo)
+    outputs = {'registers': tuple((i, chip.REGISTERS[i])
+                                  for i in sorted(written_registers.written)),
+               'ram': tuple((i, chip.RAM[i])
+                            for i in sorted(written_ram.written)),
+               'stack': tuple((i, chip.STACK[i])
+                              for i in sorted(written_stack.written)),
+               'state': (chip.ACCUMULATOR, chip.CARRY, chip.COMMAND_REGISTER,
+                         chip.CURRENT_DRAM_BANK, chip.CURRENT_RAM_BANK,
+                         chip.ACBR, chip.STACK_POINTER)}
+    memos = memo['routines'].setdefault(recording['routine'], [])
+    memos.append({'state': recording['state'], 'registers': registers,
+                  'ram': ram, 'cycles': chip.CYCLES - recording['cycles'],
+                  'outputs': outputs})
+    if len(memos) > memo['size']:
+        del memos[0]
+
+
+def observe(chip: Processor, memo: dict, name: str,
+            arguments: tuple = ()) -> None:
+    """
+    Follow the recording of a subroutine call after each instruction.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    memo: dict, mandatory
+        The subroutine memos (see new_memo)
+
+    name: str, mandatory
+        The name of the instruction (or fused idiom) just executed
+
+    arguments: tuple, optional
+        Its arguments (the conditions of a JCN come first)
+
+    Returns
+    -------
+    N/A
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    names = name.split('+')
+    recording = memo['recording']
+    if recording is not None:
+        recording['steps'] = recording['steps'] + 1
+        if recording['steps'] > MAX_MEMO_STEPS or \
+                any(part in MEMO_EXCLUDED for part in names) or \
+                (name == 'jcn' and arguments[0] & 1 and
+                 chip.BUS is not None):
+            memo['excluded'].add(recording['routine'])
+            stop_recording(chip, memo)
+        elif name == 'bbl' and \
+                chip.STACK_POINTER == recording['state'][-1] and \
+                chip.PROGRAM_COUNTER == recording['site'] + 2:
+            finish_recording(chip, memo)
+    if 'wpm' in names:
+        memo['routines'] = {}
+
+
+def abandon(chip: Processor, memo: dict) -> None:
+    """Abandon any recording in progress (execution has stopped)."""
+    if memo['recording'] is not None:
+        stop_recording(chip, memo)
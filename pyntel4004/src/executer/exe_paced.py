@@ -0,0 +1,290 @@
+"""Real-time (paced) execution of a previously assembled program."""
+
+# A program is executed by the fast loop (see executer.exe_fast) in batches
+# of about PACE_BATCH_USEC simulated microseconds, running ahead of the wall
+# clock, and then sleeps until the wall clock catches up with the simulated
+# time at which the batch ended (CYCLE_TIME per instruction cycle, i.e. the
+# 740 kHz clock of a real 4004). Emulated time so keeps in step with wall
+# time without a core being kept busy.
+#
+# The time due for each batch is reckoned from the start of the run (not
+# from the end of the previous batch), so errors in waking do not build up
+# into drift. A sleep tends to overrun by a roughly constant amount, so the
+# overrun is estimated (as a moving average of those seen) and each sleep is
+# shortened by it.
+#
+# A batch which ends more than late_usec after its due time is late (the
+# host could not keep up); the batches which follow run without sleeping
+# until the program has caught up. Should the program fall more than
+# RESYNC_USEC behind (the process stopped in a debugger, say), it is not
+# made to catch up in one burst: the run is started afresh from the wall
+# time, and the resynchronisation counted.
+#
+# A program waiting in an idle loop (see executer.exe_fast) would spin for
+# as long as it waited, so the batch's simulated time passes (its cycles are
+# counted) while the run sleeps, and the loop is resumed once the time is
+# due, by when another thread may have changed an input.
+#
+# Options
+#
+# The options of the fast loop, and:
+#
+#   batch_usec  the simulated microseconds executed between sleeps (default
+#               PACE_BATCH_USEC)
+#   speed       the rate of emulated time to wall time (default 1.0, for
+#               real time; 2.0 is twice as fast)
+#   late_usec   how far past its due time a batch may end without being
+#               late (default LATE_USEC)
+#   clock       the wall clock, a function returning seconds (default
+#               time.perf_counter)
+#   sleep       the function sleeping for a number of seconds (default
+#               time.sleep)
+#
+# The run limits (max_instructions, max_cycles, max_time and cancel) apply
+# to the whole execution, not to each batch.
+
+from hardware.processor import Processor
+from executer.exe_fast import CYCLE_TIME, REASON_BREAK, REASON_CYCLES, \
+    REASON_IDLE, REASON_INSTRUCTIONS, REASON_TIME, execute_fast  # noqa
+
+# Simulated microseconds executed between sleeps
+PACE_BATCH_USEC = 2000
+
+# Microseconds past its due time a batch may end without being late
+LATE_USEC = 1000
+
+# Microseconds behind at which the run is started afresh from the wall time
+RESYNC_USEC = 100000
+
+# Weight of each sleep's overrun in the moving average of overruns
+OVERRUN_WEIGHT = 0.125
+
+# Options of the fast loop which apply to the whole execution
+RUN_LIMITS = ('max_instructions', 'max_cycles', 'max_time')
+
+
+def new_stats() -> dict:
+    """Return the statistics of a paced run before it starts."""
+    return {'batches': 0, 'late_batches': 0, 'idle_batches': 0,
+            'resyncs': 0, 'max_late_usec': 0.0, 'slept': 0.0,
+            'mean_wake_error_usec': 0.0, 'max_wake_error_usec': 0.0,
+            'emulated_usec': 0.0, 'elapsed_usec': 0.0, 'drift_usec': 0.0}
+
+
+def batch_options(chip: Processor, options: dict, limits: dict,
+                  executed: int, clock) -> dict:
+    """
+    Return the options of the fast loop for the next batch.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    options: dict, mandatory
+        The execution options (see module notes)
+
+    limits: dict, mandatory
+        The run limits of the whole execution: 'instructions', 'cycles'
+        (the CYCLES at which to stop) and 'deadline' (None if not set)
+
+    executed: int, mandatory
+        The number of instructions executed so far
+
+    clock: function, mandatory
+        The wall clock
+
+    Returns
+    -------
+    options: dict
+        The options for the batch
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    Every instruction takes at least one cycle, so a batch is bounded by
+    an instruction limit of its cycles, which the fast loop checks exactly
+    (unlike a cycle limit).
+
+    """
+    batched = {key: value for key, value in options.items()
+               if key not in RUN_LIMITS}
+    cycles = max(1, round(options.get('batch_usec', PACE_BATCH_USEC) /
+                          CYCLE_TIME))
+    if limits['cycles'] is not None:
+        cycles = min(cycles, limits['cycles'] - chip.CYCLES)
+    if limits['instructions'] is not None:
+        cycles = min(cycles, limits['instructions'] - executed)
+    batched['max_instructions'] = cycles
+    if limits['deadline'] is not None:
+        batched['max_time'] = limits['deadline'] - clock()
+    batched['counts'] = {}
+    return batched
+
+
+def pace(stats: dict, timing: dict, due: float, options: dict) -> None:
+    """
+    Sleep until the wall clock reaches the time a batch is due.
+
+    Parameters
+    ----------
+    stats: dict, mandatory
+        The statistics of the run (see run_paced)
+
+    timing: dict, mandatory
+        The pacing state: 'start' (the wall time at which the run's
+        simulated time began), 'overrun' (the estimated overrun of a sleep),
+        'wakes' (the number of sleeps ended) and the 'clock' and 'sleep'
+        functions
+
+    due: float, mandatory
+        The wall time (from the start) at which the batch is due
+
+    options: dict, mandatory
+        The execution options (see module notes)
+
+    Returns
+    -------
+    N/A
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    clock = timing['clock']
+    now = clock() - timing['start']
+    behind = (now - due) * 1e6
+    if behind > RESYNC_USEC:
+        timing['start'] = timing['start'] + now - due
+        stats['resyncs'] = stats['resyncs'] + 1
+    if behind > options.get('late_usec', LATE_USEC):
+        stats['late_batches'] = stats['late_batches'] + 1
+        stats['max_late_usec'] = max(stats['max_late_usec'], behind)
+    if behind >= 0:
+        return
+    wanted = due - now - timing['overrun']
+    if wanted > 0:
+        timing['sleep'](wanted)
+        stats['slept'] = stats['slept'] + wanted
+        overrun = clock() - timing['start'] - now - wanted
+        timing['overrun'] = timing['overrun'] + \
+            OVERRUN_WEIGHT * (overrun - timing['overrun'])
+    error = abs(clock() - timing['start'] - due) * 1e6
+    timing['wakes'] = timing['wakes'] + 1
+    stats['mean_wake_error_usec'] = stats['mean_wake_error_usec'] + \
+        (error - stats['mean_wake_error_usec']) / timing['wakes']
+    stats['max_wake_error_usec'] = max(stats['max_wake_error_usec'], error)
+
+
+def run_paced(chip: Processor, location: str, pc: int,
+              options: dict = None) -> tuple:
+    """
+    Execute a previously assembled program in step with the wall clock.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    location : str, mandatory
+        The location from which the program is executed ('rom' or 'ram')
+
+    pc : int, mandatory
+        The program counter value to commence execution
+
+    options: dict, optional
+        Execution options (see module notes)
+
+    Returns
+    -------
+    reason: str
+        Why execution stopped (see execute_fast; never 'IDLE')
+
+    stats: dict
+        batches             the number of batches executed
+        late_batches        the number which ended late (see module notes)
+        idle_batches        the number spent waiting in an idle loop
+        resyncs             the number of times the run was started afresh
+                            from the wall time
+        max_late_usec       how late the latest batch ended
+        slept               the seconds spent sleeping
+        mean_wake_error_usec, max_wake_error_usec
+                            how far from their due times sleeps ended
+        emulated_usec       the simulated time executed
+        elapsed_usec        the wall time taken
+        drift_usec          how far the wall time ran ahead of the
+                            simulated time (less any resynchronisations)
+                            when execution stopped
+
+    Raises
+    ------
+    Any exception raised by an instruction
+
+    Notes
+    -----
+    A program which waits forever in an idle loop runs until the cycle or
+    time limit is reached, or the cancel token is set.
+
+    """
+    import time  # noqa
+
+    if options is None:
+        options = {}
+    timing = {'clock': options.get('clock', time.perf_counter),
+              'sleep': options.get('sleep', time.sleep), 'overrun': 0.0,
+              'wakes': 0}
+    clock = timing['clock']
+    limits = {'instructions': options.get('max_instructions'),
+              'cycles': None, 'deadline': None}
+    if options.get('max_cycles') is not None:
+        limits['cycles'] = chip.CYCLES + options['max_cycles']
+    if options.get('max_time') is not None:
+        limits['deadline'] = clock() + options['max_time']
+    if location == 'rom' and options.get('decoded') is None:
+        options = dict(options, decoded={})
+    scale = CYCLE_TIME / 1e6 / options.get('speed', 1.0)
+    breakpoints = set(options.get('breakpoints', []))
+    stats = new_stats()
+    first = chip.CYCLES
+    executed = 0
+    timing['start'] = clock()
+    try:
+        while True:
+            batched = batch_options(chip, options, limits, executed, clock)
+            end = chip.CYCLES + batched['max_instructions']
+            reason = execute_fast(chip, location, pc, batched)
+            executed = executed + batched['counts']['instructions']
+            pc = chip.PROGRAM_COUNTER
+            stats['batches'] = stats['batches'] + 1
+            if reason == REASON_IDLE:
+                chip.CYCLES = max(chip.CYCLES, end)
+                stats['idle_batches'] = stats['idle_batches'] + 1
+                reason = REASON_INSTRUCTIONS
+            pace(stats, timing, (chip.CYCLES - first) * scale, options)
+            if reason not in (REASON_INSTRUCTIONS, REASON_CYCLES):
+                return reason, stats
+            if limits['instructions'] is not None and \
+                    executed >= limits['instructions']:
+                return REASON_INSTRUCTIONS, stats
+            if limits['cycles'] is not None and \
+                    chip.CYCLES >= limits['cycles']:
+                return REASON_CYCLES, stats
+            if limits['deadline'] is not None and \
+                    clock() >= limits['deadline']:
+                return REASON_TIME, stats
+            # The next batch would not stop at a breakpoint it starts at
+            if pc in breakpoints:
+                return REASON_BREAK, stats
+    finally:
+        stats['emulated_usec'] = (chip.CYCLES - first) * CYCLE_TIME
+        stats['elapsed_usec'] = (clock() - timing['start']) * 1e6
+        stats['drift_usec'] = stats['elapsed_usec'] - \
+            stats['emulated_usec'] / options.get('speed', 1.0)
@@ -0,0 +1,534 @@
+"""Emulation server holding many independent sessions."""
+
+# The server listens on a Unix socket (if given a path) or a localhost TCP
+# socket (if given a (host, port) pair), and serves any number of
+# connections at once. Each request is a JSON document on a line of its
+# own, and each is answered by a JSON document on a line of its own:
+#
+#   {"op": "assemble", "source": text}
+#       -> {"ok": true, "program": key, "location": ..., "labels": [...]}
+#   {"op": "open"}                              -> {"ok": true, "session": id}
+#   {"op": "load", "session": id, "program": key (or "source": text)}
+#   {"op": "run", "session": id, "options": {...}}
+#       -> {"ok": true, "reason": ..., "state": {...}}
+#   {"op": "step", "session": id, "count": n}
+#   {"op": "inspect", "session": id, "memory": false}
+#   {"op": "close", "session": id}
+#
+# A failed request is answered by {"ok": false, "error": message}.
+#
+# A session holds its own Processor, taken from a pool of processors kept
+# ready (and reset as they are returned to it). Assembled programs are kept
+# in an LRU cache keyed by the hash of their source, so a program loaded by
+# many sessions is assembled once. Sessions which have not been used for
+# IDLE_TIMEOUT seconds, or the least recently used beyond MAX_SESSIONS, are
+# pickled to a snapshot directory and their processors returned to the
+# pool; a session is restored from its snapshot when next used. Only a
+# session this server issued and evicted is ever restored, from the file it
+# wrote: a session id from a request is never made into a file name.
+#
+# A request using a session holds it (counted in its 'users') from finding
+# it until the response is ready, and a session held is never evicted.
+#
+# Programs run in the fast loop (see executer.exe_fast), always bounded by
+# RUN_TIME seconds of wall-clock time, so no request holds a connection for
+# ever.
+#
+# The assembler reports its errors on stdout, which is captured by
+# replacing sys.stdout for the whole process; so only one request at a time
+# assembles (holding ASSEMBLY_LOCK), and each sees only its own errors.
+
+import collections
+import contextlib
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from hardware.processor import Processor
+
+# Number of processors kept ready for new sessions
+POOL_SIZE = 8
+
+# Number of assembled programs cached
+PROGRAM_CACHE_SIZE = 64
+
+# Most sessions held in memory (the rest are kept as snapshots)
+MAX_SESSIONS = 256
+
+# Seconds for which a session may be idle before it is kept as a snapshot
+IDLE_TIMEOUT = 300
+
+# Longest wall-clock time (seconds) for which a request may run a program
+RUN_TIME = 10
+
+# Form of a session id (as issued by op_open)
+SESSION_PATTERN = re.compile(r'[0-9a-f]{16}')
+
+# Held while a program is assembled (see module notes)
+ASSEMBLY_LOCK = threading.Lock()
+
+# Execution options which a request may give
+RUN_OPTIONS = ('max_instructions', 'max_cycles', 'max_time', 'idle', 'fuse',
+               'breakpoints', 'memoise')
+
+
+def new_server(snapshots: str = '', pool_size: int = POOL_SIZE) -> dict:
+    """
+    Create the state of an emulation server.
+
+    Parameters
+    ----------
+    snapshots: str, optional
+        Directory in which idle sessions are kept (default: a new
+        temporary directory)
+
+    pool_size: int, optional
+        Number of processors kept ready for new sessions
+
+    Returns
+    -------
+    server: dict
+        The state of the server
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    import tempfile  # noqa
+
+    if snapshots == '':
+        snapshots = tempfile.mkdtemp(prefix='pyntel4004-')
+    os.makedirs(snapshots, exist_ok=True)
+    return {'snapshots': snapshots, 'pool_size': pool_size,
+            'pool': [Processor() for _ in range(pool_size)],
+            'programs': collections.OrderedDict(),
+            'sessions': collections.OrderedDict(), 'evicted': {},
+            'lock': threading.Lock(),
+            'max_sessions': MAX_SESSIONS, 'idle_timeout': IDLE_TIMEOUT}
+
+
+def take_processor(server: dict) -> Processor:
+    """Take a processor from the pool (or create one if it is empty)."""
+    with server['lock']:
+        if server['pool']:
+            return server['pool'].pop()
+    return Processor()
+
+
+def return_processor(server: dict, chip: Processor) -> None:
+    """Reset a processor and return it to the pool (if not full)."""
+    if len(server['pool']) < server['pool_size']:
+        chip.__init__()
+        with server['lock']:
+            server['pool'].append(chip)
+
+
+def assemble_source(server: dict, source: str) -> tuple:
+    """
+    Assemble a program (or fetch it from the program cache).
+
+    Parameters
+    ----------
+    server: dict, mandatory
+        The state of the server
+
+    source: str, mandatory
+        The assembly language source
+
+    Returns
+    -------
+    key: str
+        The hash of the source, by which the program is known
+
+    program: dict
+        The program, with the keys 'location', 'memory' and 'labels'
+
+    Raises
+    ------
+    ValueError
+        If the program does not assemble (the message holds the errors)
+
+    Notes
+    -----
+    N/A
+
+    """
+    import io  # noqa
+    import tempfile  # noqa
+    from assembler.assemble import assemble  # noqa
+    from assembler.asm_batch import error_lines  # noqa
+    from executer.exe_supporting import load_obj  # noqa
+    from shared.shared import retrieve_program  # noqa
+
+    key = hashlib.sha256(source.encode('utf-8')).hexdigest()
+    with server['lock']:
+        program = server['programs'].get(key)
+        if program is not None:
+            server['programs'].move_to_end(key)
+            return key, program
+    with tempfile.TemporaryDirectory() as folder:
+        filename = os.path.join(folder, 'program')
+        with open(filename + '.asm', 'w', encoding='utf-8') as asm:
+            asm.write(source)
+        chip = Processor()
+        output = io.StringIO()
+        with ASSEMBLY_LOCK, contextlib.redirect_stdout(output):
+            result = assemble(filename + '.asm', filename, chip, False,
+                              'OBJ')
+        if not result:
+            raise ValueError(error_lines(output.getvalue()))
+        loaded = Processor()
+        location, labels = load_obj(filename + '.obj', loaded, True)
+    program = {'location': location, 'labels': labels,
+               'memory': list(retrieve_program(loaded, location))}
+    with server['lock']:
+        server['programs'][key] = program
+        while len(server['programs']) > PROGRAM_CACHE_SIZE:
+            server['programs'].popitem(last=False)
+    return key, program
+
+
+def new_session(chip: Processor, location: str) -> dict:
+    """Return a session of a processor, held by no request."""
+    return {'chip': chip, 'location': location, 'used': time.monotonic(),
+            'lock': threading.Lock(), 'users': 0}
+
+
+def snapshot_file(server: dict, session: str) -> str:
+    """Return the name of the file an (issued) session is kept in."""
+    return os.path.join(server['snapshots'], session + '.pickle')
+
+
+def evict_sessions(server: dict) -> int:
+    """
+    Keep idle (and surplus) sessions as snapshots.
+
+    Parameters
+    ----------
+    server: dict, mandatory
+        The state of the server
+
+    Returns
+    -------
+    evicted: int
+        The number of sessions evicted
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    Sessions held by a request are never evicted.
+
+    """
+    import pickle  # noqa
+
+    now = time.monotonic()
+    evicted = 0
+    with server['lock']:
+        surplus = len(server['sessions']) - server['max_sessions']
+        candidates = [(name, session, session['used'])
+                      for name, session in server['sessions'].items()]
+    for name, session, used in candidates:
+        if now - used < server['idle_timeout'] and surplus <= evicted:
+            break
+        if not session['lock'].acquire(blocking=False):
+            continue
+        try:
+            with server['lock']:
+                # Skip a session taken up by a request since
+                if session['used'] != used or session['users']:
+                    continue
+                filename = snapshot_file(server, name)
+                with open(filename, 'wb') as snapshot:
+                    pickle.dump({'chip': session['chip'],
+                                 'location': session['location']}, snapshot)
+                del server['sessions'][name]
+                server['evicted'][name] = filename
+            return_processor(server, session['chip'])
+            evicted = evicted + 1
+        finally:
+            session['lock'].release()
+    return evicted
+
+
+def find_session(server: dict, name: str) -> dict:
+    """
+    Find (and hold) a session, restoring it from its snapshot if evicted.
+
+    Parameters
+    ----------
+    server: dict, mandatory
+        The state of the server
+
+    name: str, mandatory
+        The session
+
+    Returns
+    -------
+    session: dict
+        The session (its 'chip', 'location', 'used' time, 'lock' and
+        'users')
+
+    Raises
+    ------
+    KeyError
+        If there is no such session
+
+    Notes
+    -----
+    The session is held (so never evicted) until released by
+    release_session; see use_session.
+
+    """
+    import pickle  # noqa
+
+    if not isinstance(name, str) or not SESSION_PATTERN.fullmatch(name):
+        raise KeyError('No such session: ' + str(name))
+    with server['lock']:
+        session = server['sessions'].get(name)
+        if session is None:
+            filename = server['evicted'].pop(name, None)
+            if filename is None:
+                raise KeyError('No such session: ' + name)
+            with open(filename, 'rb') as snapshot:
+                saved = pickle.load(snapshot)
+            os.remove(filename)
+            session = new_session(saved['chip'], saved['location'])
+            server['sessions'][name] = session
+        server['sessions'].move_to_end(name)
+        session['used'] = time.monotonic()
+        session['users'] = session['users'] + 1
+        return session
+
+
+def release_session(server: dict, session: dict) -> None:
+    """Release a session held by find_session."""
+    with server['lock']:
+        session['users'] = session['users'] - 1
+
+
+@contextlib.contextmanager
+def use_session(server: dict, name: str):
+    """Hold a session, and its lock, for the length of a request."""
+    session = find_session(server, name)
+    try:
+        with session['lock']:
+            yield session
+    finally:
+        release_session(server, session)
+
+
+def chip_state(chip: Processor, memory: bool = False) -> dict:
+    """Return the state of a processor (as sent in responses)."""
+    state = {'accumulator': chip.ACCUMULATOR, 'carry': chip.CARRY,
+             'registers': list(chip.REGISTERS),
+             'program_counter': chip.PROGRAM_COUNTER,
+             'stack': list(chip.STACK), 'stack_pointer': chip.STACK_POINTER,
+             'cycles': chip.CYCLES, 'rom_ports': list(chip.ROM_PORT),
+             'ram_ports': [list(ports) for ports in chip.RAM_PORT],
+             'pin10': chip.PIN_10_SIGNAL_TEST}
+    if memory:
+        state['ram'] = list(chip.RAM)
+    return state
+
+
+def run_session(session: dict, options: dict) -> dict:
+    """Run the program of a session, within the server's time limit."""
+    from executer.exe_fast import execute_fast  # noqa
+
+    options = {key: value for key, value in options.items()
+               if key in RUN_OPTIONS}
+    options['max_time'] = min(options.get('max_time', RUN_TIME), RUN_TIME)
+    chip = session['chip']
+    reason = execute_fast(chip, session['location'], chip.PROGRAM_COUNTER,
+                          options)
+    return {'reason': reason, 'state': chip_state(chip)}
+
+
+def op_assemble(server: dict, request: dict) -> dict:
+    """Assemble a program."""
+    key, program = assemble_source(server, request['source'])
+    return {'program': key, 'location': program['location'],
+            'labels': program['labels']}
+
+
+def op_open(server: dict, _request: dict) -> dict:
+    """Open a session."""
+    import secrets  # noqa
+
+    name = secrets.token_hex(8)
+    session = new_session(take_processor(server), 'rom')
+    with server['lock']:
+        server['sessions'][name] = session
+    return {'session': name}
+
+
+def op_load(server: dict, request: dict) -> dict:
+    """Load a program into a session's processor."""
+    if 'source' in request:
+        key, program = assemble_source(server, request['source'])
+    else:
+        key = request['program']
+        with server['lock']:
+            program = server['programs'].get(key)
+        if program is None:
+            raise KeyError('No such program: ' + str(key))
+    with use_session(server, request['session']) as session:
+        chip = session['chip']
+        if program['location'] == 'rom':
+            chip.ROM[:len(program['memory'])] = program['memory']
+        else:
+            chip.PRAM[:len(program['memory'])] = program['memory']
+        chip.PROGRAM_COUNTER = 0
+        session['location'] = program['location']
+    return {'program': key}
+
+
+def op_run(server: dict, request: dict) -> dict:
+    """Run a session's program."""
+    with use_session(server, request['session']) as session:
+        return run_session(session, request.get('options', {}))
+
+
+def op_step(server: dict, request: dict) -> dict:
+    """Execute a number of a session's instructions."""
+    with use_session(server, request['session']) as session:
+        return run_session(session, {'max_instructions':
+                                     request.get('count', 1),
+                                     'idle': False, 'fuse': False})
+
+
+def op_inspect(server: dict, request: dict) -> dict:
+    """Return the state of a session's processor."""
+    with use_session(server, request['session']) as session:
+        return {'location': session['location'],
+                'state': chip_state(session['chip'],
+                                    request.get('memory', False))}
+
+
+def op_close(server: dict, request: dict) -> dict:
+    """Close a session, returning its processor to the pool."""
+    with use_session(server, request['session']) as session:
+        with server['lock']:
+            server['sessions'].pop(request['session'], None)
+        return_processor(server, session['chip'])
+    return {}
+
+
+# Operations which may be requested
+OPERATIONS = {'assemble': op_assemble, 'open': op_open, 'load': op_load,
+              'run': op_run, 'step': op_step, 'inspect': op_inspect,
+              'close': op_close}
+
+
+def handle_request(server: dict, request: dict) -> dict:
+    """
+    Handle a single request.
+
+    Parameters
+    ----------
+    server: dict, mandatory
+        The state of the server
+
+    request: dict, mandatory
+        The request (see module notes)
+
+    Returns
+    -------
+    response: dict
+        The response, with 'ok' set to whether the request succeeded
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    Any error (including one raised by an instruction) is returned in the
+    response's 'error'.
+
+    """
+    try:
+        operation = OPERATIONS.get(request.get('op'))
+        if operation is None:
+            raise ValueError('Unknown operation: ' + str(request.get('op')))
+        response = operation(server, request)
+        response['ok'] = True
+    except Exception as ex:  # noqa
+        response = {'ok': False,
+                    'error': type(ex).__name__ + ': ' + str(ex)}
+    evict_sessions(server)
+    return response
+
+
+def serve(address, server: dict = None):
+    """
+    Create the socket server (call serve_forever to serve requests).
+
+    Parameters
+    ----------
+    address: str or tuple, mandatory
+        The path of a Unix socket, or a (host, port) pair
+
+    server: dict, optional
+        The state of the server (see new_server)
+
+    Returns
+    -------
+    server: socketserver.BaseServer
+        The socket server, whose 'state' is the state of the server
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    import socketserver  # noqa
+
+    if server is None:
+        server = new_server()
+
+    class Handler(socketserver.StreamRequestHandler):
+
+        """Answer each line received with the response to its request."""
+
+        def handle(self):
+            """Handle the requests of a connection."""
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                except ValueError as ex:
+                    response = {'ok': False,
+                                'error': type(ex).__name__ + ': ' + str(ex)}
+                else:
+                    response = handle_request(server, request)
+                self.wfile.write(json.dumps(response).encode('utf-8') +
+                                 b'\n')
+                self.wfile.flush()
+
+    if isinstance(address, str):
+        if os.path.exists(address):
+            os.remove(address)
+        socket_server = socketserver.ThreadingUnixStreamServer(address,
+                                                               Handler)
+    else:
+        socket_server = socketserver.ThreadingTCPServer(address, Handler)
+    socket_server.daemon_threads = True
+    socket_server.state = server
+    return socket_server
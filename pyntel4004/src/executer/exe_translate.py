@@ -0,0 +1,457 @@
+"""Ahead-of-time translation of an assembled image into Python."""
+
+# An image (.obj or .bin) is disassembled into basic blocks (see
+# disassembler.dis_flow), and a Python module is written next to it with a
+# function per block, which executes the block's instructions by calling the
+# methods of a Processor instance directly, and a dict (BLOCKS) of the
+# functions keyed by the address of each block. Being an ordinary module,
+# CPython caches its bytecode, so after the first load it is not compiled
+# again.
+#
+# A block function returns None once its last instruction has set the
+# program counter, or 'END'/'INVALID' upon reaching the "end" pseudo-opcode
+# or an invalid opcode. Execution continues at any address which does not
+# start a block (the destination of a JIN, say) one instruction at a time.
+#
+# The module records a digest of the memory it was translated from. If the
+# memory executed differs, or program RAM is written during execution, the
+# translation no longer applies and execution continues in the fast loop
+# (see executer.exe_fast).
+#
+# A block counts its instruction cycles in CYCLES once, at its end, except
+# before an instruction using a port (see PORT_INSTRUCTIONS) or testing the
+# test signal, when the cycles so far are counted first; so devices on the
+# peripheral bus (see hardware.suboperations.bus) see the same cycle count
+# as in the fast loop.
+#
+# The run limits of the fast loop (max_instructions, max_cycles, max_time
+# and cancel) are checked between blocks, as often as the fast loop checks
+# them; the module records the number of instructions each block executes
+# (LENGTHS), and a block which would pass the instruction limit is
+# executed one instruction at a time, so execution stops at the limit
+# exactly.
+#
+# Blocks do not detect idle loops (see executer.exe_fast) themselves. The
+# module records the blocks which end by jumping back to their own start
+# (LOOPS); should such a block leave the processor's registers as they were
+# (a busy-wait on the test signal or a port, say), execution goes on in the
+# fast loop, which stops it with 'IDLE' (unless the idle option is off), or
+# passes over it, as it would have had the program not been translated.
+# The iteration which showed the block unchanged is not counted (in cycles
+# or instructions), as the fast loop repeats it, unless the peripheral bus
+# is in use (a device may have seen it).
+
+import os
+
+from hardware.processor import Processor
+from executer.exe_fast import REASON_END, REASON_INVALID, check_limits, \
+    decode_entry, execute_fast, loop_state, run_limits  # noqa
+
+# Suffix of the file a translation is written to (next to the image)
+TRANSLATION_SUFFIX = '_aot.py'
+
+# Version of the layout of a translation
+TRANSLATION_FORMAT = 4
+
+# Instructions using a port, before which the cycles of a block so far are
+# counted
+PORT_INSTRUCTIONS = ('rdr', 'wrr', 'wmp')
+
+
+def memory_digest(memory: list) -> str:
+    """Return a digest of the content of a memory image."""
+    import hashlib  # noqa
+    return hashlib.sha256(','.join(str(word) for word in memory).
+                          encode('utf-8')).hexdigest()
+
+
+def translation_file(inputfile: str) -> str:
+    """Return the name of the file a translation of an image is saved to."""
+    return os.path.splitext(inputfile)[0] + TRANSLATION_SUFFIX
+
+
+def block_source(chip: Processor, memory: list, block: dict) -> list:
+    """
+    Generate the source of the function executing a basic block.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the instruction table
+
+    memory: list, mandatory
+        The memory (ROM/PRAM) containing the program
+
+    block: dict, mandatory
+        The basic block (see build_flow_graph)
+
+    Returns
+    -------
+    lines: list
+        The lines of the function
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    lines = ['def block_' + str(block['start']) + '(chip):',
+             '    """Block ' + str(block['start']) + ' - ' +
+             str(block['end'] - 1) + '."""']
+    cycles = 0
+    reason = ''
+    for instruction in block['instructions']:
+        _code, name, _operation, arguments, _words, instruction_cycles, \
+            target = decode_entry(chip, memory, instruction['address'])
+        if name == 'end':
+            reason = REASON_END
+            break
+        if name == '-':
+            reason = REASON_INVALID
+            break
+        if cycles and (name in PORT_INSTRUCTIONS or
+                       (name == 'jcn' and arguments[0] & 1)):
+            lines.append('    chip.CYCLES = chip.CYCLES + ' + str(cycles))
+            cycles = 0
+        lines.append('    chip.' + name + '(' +
+                     ', '.join(str(argument) for argument in arguments) +
+                     ')  # ' + str(instruction['address']))
+        if name == 'jms':
+            lines.append('    chip.PROGRAM_COUNTER = ' + str(target))
+        cycles = cycles + instruction_cycles
+    if cycles:
+        lines.append('    chip.CYCLES = chip.CYCLES + ' + str(cycles))
+    if reason:
+        lines.append("    return '" + reason + "'")
+    return lines
+
+
+def block_length(chip: Processor, memory: list, block: dict) -> int:
+    """Return the number of instructions a basic block executes."""
+    length = 0
+    for instruction in block['instructions']:
+        name = decode_entry(chip, memory, instruction['address'])[1]
+        if name in ('end', '-'):
+            break
+        length = length + 1
+    return length
+
+
+def block_loops(chip: Processor, memory: list, block: dict) -> bool:
+    """Determine whether a basic block may jump back to its own start."""
+    if not block['instructions']:
+        return False
+    _code, name, _operation, _arguments, _words, _cycles, target = \
+        decode_entry(chip, memory, block['instructions'][-1]['address'])
+    return name in ('jcn', 'isz', 'jun') and target == block['start']
+
+
+def translation_source(chip: Processor, memory: list, graph: dict,
+                       image: str, location: str) -> str:
+    """
+    Generate the source of the module translating an image.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the instruction table
+
+    memory: list, mandatory
+        The memory (ROM/PRAM) containing the program
+
+    graph: dict, mandatory
+        The basic block graph of the program (see build_flow_graph)
+
+    image: str, mandatory
+        The name of the image translated
+
+    location: str, mandatory
+        'rom' or 'ram'
+
+    Returns
+    -------
+    source: str
+        The source of the module
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    lines = ['"""Translation of ' + os.path.basename(image) +
+             ' (generated - do not edit)."""', '',
+             'FORMAT = ' + str(TRANSLATION_FORMAT),
+             'LOCATION = ' + repr(location),
+             'DIGEST = ' + repr(memory_digest(memory))]
+    for start in sorted(graph['blocks']):
+        lines = lines + ['', ''] + \
+            block_source(chip, memory, graph['blocks'][start])
+    lines = lines + ['', '', 'BLOCKS = {']
+    lines = lines + ['    ' + str(start) + ': block_' + str(start) + ','
+                     for start in sorted(graph['blocks'])]
+    lines = lines + ['}', '', 'LENGTHS = {']
+    lines = lines + ['    ' + str(start) + ': ' +
+                     str(block_length(chip, memory, graph['blocks'][start])) +
+                     ',' for start in sorted(graph['blocks'])]
+    lines = lines + ['}', '', 'LOOPS = {']
+    lines = lines + ['    ' + str(start) + ','
+                     for start in sorted(graph['blocks'])
+                     if block_loops(chip, memory, graph['blocks'][start])]
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+def translate(inputfile: str, outputfile: str = '') -> str:
+    """
+    Translate an assembled image into a Python module.
+
+    Parameters
+    ----------
+    inputfile: str, mandatory
+        The image (.obj or .bin)
+
+    outputfile: str, optional
+        The module to write (default: the image's name, with the suffix
+        TRANSLATION_SUFFIX)
+
+    Returns
+    -------
+    outputfile: str
+        The module written
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    Translation starts from address 0 (where execution of a reloaded image
+    starts); code reached only through a JIN is left untranslated.
+
+    """
+    from disassembler.dis_flow import build_flow_graph  # noqa
+    from executer.exe_supporting import reload  # noqa
+    from shared.shared import retrieve_program  # noqa
+
+    chip = Processor()
+    location, pc, lbls = reload(inputfile, chip, True)
+    memory = retrieve_program(chip, location)
+    used = max([address + 1 for address, value in enumerate(memory)
+                if value != 0] + [pc + 1])
+    graph = build_flow_graph(chip, memory[:used], [pc], lbls)
+    if outputfile == '':
+        outputfile = translation_file(inputfile)
+    with open(outputfile, 'w', encoding='utf-8') as output:
+        output.write(translation_source(chip, memory, graph, inputfile,
+                                        location))
+    return outputfile
+
+
+def load_translation(filename: str):
+    """
+    Load a translated image.
+
+    Parameters
+    ----------
+    filename: str, mandatory
+        The module written by translate
+
+    Returns
+    -------
+    module: module
+        The translation (None if of another format)
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    import importlib.util  # noqa
+
+    name = os.path.splitext(os.path.basename(filename))[0]
+    spec = importlib.util.spec_from_file_location(name, filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if getattr(module, 'FORMAT', None) != TRANSLATION_FORMAT:
+        return None
+    return module
+
+
+def execute_translated(chip: Processor, location: str, pc: int, module,
+                       options: dict = None) -> str:
+    """
+    Execute a previously assembled program using its translation.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    location : str, mandatory
+        The location from which the program is executed ('rom' or 'ram')
+
+    pc : int, mandatory
+        The program counter value to commence execution
+
+    module: module, mandatory
+        The translation (see load_translation)
+
+    options: dict, optional
+        Options for the fast loop, should the translation not apply (see
+        executer.exe_fast); its run limits, and counts, apply to the
+        translation too
+
+    Returns
+    -------
+    reason: str
+        Why execution stopped (see execute_fast)
+
+    Raises
+    ------
+    Any exception raised by an instruction
+
+    Notes
+    -----
+    A WPM writing program RAM within a block is seen only as the block
+    ends, when execution goes on in the fast loop; the rest of the block
+    is executed as translated.
+
+    """
+    from shared.shared import retrieve_program  # noqa
+
+    if options is None:
+        options = {}
+    memory = retrieve_program(chip, location)
+    if module is None or module.LOCATION != location or \
+            module.DIGEST != memory_digest(memory):
+        return execute_fast(chip, location, pc, options)
+    chip.PROGRAM_COUNTER = pc
+    limits = run_limits(chip, options)
+    reason, executed = translated_loop(chip, location, memory, module, limits,
+                                       options.get('idle', True))
+    counts = options.get('counts')
+    if counts is not None:
+        counts['instructions'] = counts.get('instructions', 0) + executed
+    if reason is None:
+        reason = execute_fast(chip, location, chip.PROGRAM_COUNTER,
+                              remaining_options(chip, options, limits,
+                                                executed))
+    return reason
+
+
+def remaining_options(chip: Processor, options: dict, limits: dict,
+                      executed: int) -> dict:
+    """Return the options of the fast loop, less the limits already used."""
+    if limits is None:
+        return options
+    options = dict(options)
+    if limits['instructions'] is not None:
+        options['max_instructions'] = limits['instructions'] - executed
+    if limits['cycles'] is not None:
+        options['max_cycles'] = limits['cycles'] - chip.CYCLES
+    if limits['deadline'] is not None:
+        options['max_time'] = limits['deadline'] - limits['clock']()
+    return options
+
+
+def translated_loop(chip: Processor, location: str, memory: list, module,
+                    limits: dict, idle: bool) -> tuple:
+    """
+    Execute the blocks of a translation until execution stops.
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    location : str, mandatory
+        The location from which the program is executed ('rom' or 'ram')
+
+    memory: list, mandatory
+        The memory (ROM/PRAM) containing the program
+
+    module: module, mandatory
+        The translation (see load_translation)
+
+    limits: dict, mandatory
+        The run limits (see executer.exe_fast.run_limits), or None
+
+    idle: bool, mandatory
+        Whether idle loops are detected (see module notes)
+
+    Returns
+    -------
+    reason: str
+        Why execution stopped (see execute_fast; never 'IDLE'), or None if
+        program RAM was written, or a block looped back to itself unchanged,
+        and execution must go on in the fast loop
+
+    executed: int
+        The number of instructions executed
+
+    Raises
+    ------
+    Any exception raised by an instruction
+
+    Notes
+    -----
+    N/A
+
+    """
+    blocks = module.BLOCKS
+    lengths = module.LENGTHS
+    loops = module.LOOPS if idle else ()
+    generation = chip.PRAM_GENERATION
+    executed = 0
+    check = 0 if limits is not None else -1
+    while chip.PROGRAM_COUNTER < chip.MEMORY_SIZE_RAM:
+        if location == 'ram' and chip.PRAM_GENERATION != generation:
+            return None, executed
+        if executed >= check >= 0:
+            reason, check = check_limits(chip, limits, executed)
+            if reason:
+                return reason, executed
+        block = blocks.get(chip.PROGRAM_COUNTER)
+        if block is not None and (check < 0 or
+                                  limits['instructions'] is None or
+                                  executed + lengths[chip.PROGRAM_COUNTER] <=
+                                  limits['instructions']):
+            start = chip.PROGRAM_COUNTER
+            executed = executed + lengths[start]
+            if start in loops:
+                state = loop_state(chip, -1)
+                cycles = chip.CYCLES
+            reason = block(chip)
+            if reason is not None:
+                return reason, executed
+            if start in loops and chip.PROGRAM_COUNTER == start and \
+                    loop_state(chip, -1) == state:
+                if chip.BUS is None:
+                    chip.CYCLES = cycles
+                    executed = executed - lengths[start]
+                return None, executed
+            continue
+        _code, name, operation, arguments, _words, cycles, target = \
+            decode_entry(chip, memory, chip.PROGRAM_COUNTER)
+        if name == 'end':
+            return REASON_END, executed
+        if operation is None:
+            return REASON_INVALID, executed
+        operation(*arguments)
+        if name == 'jms':
+            chip.PROGRAM_COUNTER = target
+        chip.CYCLES = chip.CYCLES + cycles
+        executed = executed + 1
+    return REASON_END, executed
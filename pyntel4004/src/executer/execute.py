@@ -231,7 +231,7 @@ def prep_single_instruction(exe: str, const_chip: str) -> \
 
 
 def execute(chip: Processor, location: str, pc: int, monitor: bool,
-            quiet: bool, operations: list) -> bool:
+            quiet: bool, operations: list, options: dict = None) -> bool:
     """
     Control the execution of a previously assembled program.
 
@@ -255,6 +255,14 @@ def execute(chip: Processor, location: str, pc: int, monitor: bool,
     operations: list, mandatory
         List of functions i.e. instructions that are contained within the i4004
 
+    options: dict, optional
+        Options for fast execution (see executer.exe_fast); if supplied, and
+        the monitor is off, the program is executed without tracing, and
+        why execution stopped is returned in options['reason']; if
+        options['paced'] is set, emulated time is kept in step with wall time
+        (see executer.exe_paced), and the pacing statistics are returned in
+        options['pacing']
+
     Returns
     -------
     True        in all instances
@@ -273,6 +281,22 @@ def execute(chip: Processor, location: str, pc: int, monitor: bool,
 #    mccabe: MC0001 / execute is too complex (11)
 #    mccabe: MC0001 / execute is too complex (5)
 
+    if options is not None and not monitor:
+        from executer.exe_fast import execute_fast  # noqa
+        from executer.exe_paced import run_paced  # noqa
+        try:
+            if options.get('paced', False):
+                options['reason'], options['pacing'] = \
+                    run_paced(chip, location, pc, options)
+            else:
+                options['reason'] = execute_fast(chip, location, pc, options)
+        except Exception as ex:
+            process_coredump(chip, ex)
+            return False
+        return True
+
+    from executer.exe_fast import opcode_cycles  # noqa
+
     breakpoints = []  # noqa
     chip.PROGRAM_COUNTER = pc
     opcode = 0
@@ -299,6 +323,8 @@ def execute(chip: Processor, location: str, pc: int, monitor: bool,
                 _ = dispatch1(operations, command, int(p1))
             elif p2 is not None:
                 _ = dispatch2(operations, command, int(p1), int(p2))
+            # Count the cycles (after the instruction, as the fast loop does)
+            chip.CYCLES = chip.CYCLES + opcode_cycles(chip, opcode)
     except Exception as ex:
         process_coredump(chip, ex)
         return False
@@ -42,6 +42,11 @@ class InvalidPin10Value(Exception):
     """Raised when the value of PIN 10 is attempted to be set to NOT 0 or 1."""
 
 
+class InvalidPort(Exception):
+
+    """Raised when a device is connected to a port which does not exist."""
+
+
 class InvalidRamBank(Exception):
 
     """Raised when the attempting to select a RAM bank > 7."""
@@ -57,6 +62,11 @@ class InvalidRegisterPair(Exception):
     """Raised when an invalid register pair is supplied."""
 
 
+class InvalidSnapshot(Exception):
+
+    """Raised when a snapshot is not that of a processor."""
+
+
 class InvalidToken(Exception):
 
     """Raised when an invalid token in a configuration file."""
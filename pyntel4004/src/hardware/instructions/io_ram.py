@@ -64,8 +64,10 @@ from hardware.suboperations.utility import convert_to_absolute_address, \
     decimal_to_binary, ones_complement  # noqa
 from hardware.suboperations.other import decode_command_register  # noqa
 from hardware.suboperations.accumulator import check_overflow  # noqa
-from hardware.suboperations.ram import rdx  # noqa
-from hardware.suboperations.wpm import flip_wpm_counter, read_wpm_counter  # noqa
+from hardware.suboperations.bus import notify_write, read_input  # noqa
+from hardware.suboperations.ram import rdx, write_ram  # noqa
+from hardware.suboperations.wpm import flip_wpm_counter, read_wpm_counter, \
+    write_pram  # noqa
 
 
 def rdm(self) -> int:
@@ -233,6 +235,8 @@ def rdr(self) -> int:
     """
     rom, _unused1, _unused2 = \
         decode_command_register(self.COMMAND_REGISTER, 'ROM_PORT')
+    if self.BUS is not None:
+        read_input(self, ('rom', rom))
     self.ACCUMULATOR = self.ROM_PORT[rom]
     self.increment_pc(1)
     return self.ACCUMULATOR
@@ -257,7 +261,7 @@ def wrm(self) -> int:
         decode_command_register(self.COMMAND_REGISTER, 'DATA_RAM_CHAR')
     absolute_address = convert_to_absolute_address(
         self, crb, chip, register, address)
-    self.RAM[absolute_address] = value
+    write_ram(self, absolute_address, value)
     self.increment_pc(1)
     return self.PROGRAM_COUNTER
 
@@ -409,6 +413,8 @@ def wmp(self) -> int:
     chip, _unused1, _unused2 = \
         decode_command_register(self.COMMAND_REGISTER, 'RAM_PORT')
     self.RAM_PORT[crb][chip] = self.ACCUMULATOR
+    if self.BUS is not None:
+        notify_write(self, ('ram', crb, chip), self.ACCUMULATOR)
     self.increment_pc(1)
     return self.ACCUMULATOR
 
@@ -442,6 +448,8 @@ def wrr(self) -> int:
     rom, _unused1, _unused2 = \
         decode_command_register(self.COMMAND_REGISTER, 'ROM_PORT')
     self.ROM_PORT[rom] = self.ACCUMULATOR
+    if self.BUS is not None:
+        notify_write(self, ('rom', rom), self.ACCUMULATOR)
     self.increment_pc(1)
     return self.ACCUMULATOR
 
@@ -578,12 +586,12 @@ def wpm(self) -> Tuple[int, int]:
         # Write enabled, so store
         if wpm_counter == 'LEFT':
             value = self.ACCUMULATOR << 4
-            self.PRAM[address] = value
-            self.RAM[address] = value
+            write_pram(self, address, value)
+            write_ram(self, address, value)
         if wpm_counter == 'RIGHT':
             value = self.ACCUMULATOR
-            self.RAM[address] = self.RAM[address] + value
-            self.PRAM[address] = self.PRAM[address] + value
+            write_ram(self, address, self.RAM[address] + value)
+            write_pram(self, address, self.PRAM[address] + value)
 
     # Reading
     if self.ROM_PORT[14] != 1:
@@ -31,21 +31,29 @@ class Processor:
     # Import suboperations
     from hardware.suboperations.accumulator import check_overflow, \
         read_acbr, read_accumulator, set_accumulator
+    from hardware.suboperations.bus import apply_inputs, connect_device, \
+        disconnect_device, schedule_input
     from hardware.suboperations.carry import read_carry, \
         read_complement_carry, reset_carry, set_carry
+    from hardware.suboperations.checkpoint import checkpoint, \
+        restore_checkpoint
+    from hardware.suboperations.digest import component_digests, diff, \
+        digest
     from hardware.suboperations.pc import inc_pc_by_page, increment_pc, \
         is_end_of_page, read_program_counter
     from hardware.suboperations.pin10 import read_pin10, write_pin10
     from hardware.suboperations.ram import rdx, read_all_pram, read_all_ram, \
         read_all_ram_ports, read_all_status_characters, \
-        read_current_ram_bank, write_ram_status
+        read_current_ram_bank, write_ram, write_ram_status
     from hardware.suboperations.registers import increment_register, \
         insert_register, insert_registerpair, read_all_registers, \
         read_register, read_registerpair
     from hardware.suboperations.rom import read_all_rom, read_all_rom_ports
+    from hardware.suboperations.snapshot import clone, restore, snapshot
     from hardware.suboperations.stack import read_all_stack, read_from_stack, \
         read_stack_pointer, write_to_stack
-    from hardware.suboperations.wpm import flip_wpm_counter, read_wpm_counter
+    from hardware.suboperations.wpm import flip_wpm_counter, \
+        read_wpm_counter, write_pram
     #  pylint: enable=import-outside-toplevel
 
     # Operations to read the processor components
@@ -87,6 +95,10 @@ class Processor:
         # Set up RAM
         # Initialise the RAM with zeroes in all locations.
         self.RAM = [0] * self.MEMORY_SIZE_RAM
+        # Writes to RAM: the number made, and the generation at which each
+        # page (RAM chip, with its status characters) was last written
+        self.RAM_GENERATION = 0
+        self.RAM_PAGES = [0] * (self.MEMORY_SIZE_RAM // self.RAM_CHIP_SIZE)
         self.RAM_PORT = [[0 for _ in range(4)]   # RAM Ports
                          for _ in range(8)]
         # Set up ROM
@@ -97,6 +109,10 @@ class Processor:
         # Set up Program RAM
         # Initialise the Program RAM with zeroes in all locations.
         self.PRAM = [0] * self.MEMORY_SIZE_PRAM  # PRAM
+        # Writes to PRAM: the number made, and the generation (number of
+        # writes) at which each page was last written
+        self.PRAM_GENERATION = 0
+        self.PRAM_PAGES = [0] * (self.MEMORY_SIZE_PRAM // self.PAGE_SIZE)
 
         # Registers (4-bit)
         self.REGISTERS = [0] * self.NO_REGISTERS
@@ -112,6 +128,10 @@ class Processor:
                                    for _ in range(4)]
                                   for _ in range(self.NO_DRB)]
 
+        # Peripheral bus connecting devices to the ports (None until a
+        # device is connected or an input scheduled)
+        self.BUS = None
+
         # Creation of processor simulated hardware
         # Pin 10 on the physical chip is the "test" pin
         # and can be read by the JCN instruction
@@ -126,6 +146,7 @@ class Processor:
         self.CURRENT_DRAM_BANK = 0   # Current Data RAM Bank
         self.CURRENT_RAM_BANK = 0    # Current Program RAM Bank
         self.reset_carry()           # Reset the carry bit
+        self.CYCLES = 0              # Instruction cycles executed
 
         # The WPM counter is required to allow WPM instructions to track which
         # 4-bit portion of an 8-bit byte is being transferred.
@@ -0,0 +1,243 @@
+"""Peripheral bus methods."""
+
+# Devices (emulated keyboards, displays, printers etc) are connected to the
+# processor's ports through a bus, held in BUS as a dict:
+#
+#   writers         {port: [callback]} the devices notified when a port is
+#                   written (by WRR or WMP)
+#   readers         {port: callback} the device supplying the input of a
+#                   port (read by RDR, or the test signal read by JCN)
+#   events          a heap of inputs scheduled for a cycle count, each
+#                   (cycles, sequence, port, value)
+#   sequence        the number of inputs scheduled (so inputs scheduled for
+#                   the same cycle are applied in order)
+#
+# A port is named by a tuple:
+#
+#   ('rom', port)               a ROM port (0-15)
+#   ('ram', bank, chip)         a RAM port (bank 0-7, chip 0-3)
+#   ('pin10',)                  the test signal (PIN 10)
+#
+# A writer is called as callback(port, value, cycles) after the port is
+# written, and a reader as callback(port, cycles), returning the input;
+# cycles is the processor's CYCLES count as the instruction starts (kept
+# alike by the traced, fast and translated execution of executer). The
+# input returned is kept in ROM_PORT or PIN_10_SIGNAL_TEST, as though it
+# had been set there.
+#
+# An input scheduled for a cycle count is applied (to ROM_PORT or
+# PIN_10_SIGNAL_TEST) once CYCLES reaches it - not as each instruction is
+# executed, but as a port is next read or written, and by apply_inputs, so
+# scheduled inputs cost nothing until the program looks at them.
+#
+# BUS is None until a device is connected or an input scheduled, and the
+# instructions using the ports then only test that it is None; a port with
+# no device costs a single dictionary lookup.
+
+# Import system modules
+import heapq
+
+from hardware.exceptions import InvalidPort  # noqa
+
+# Kinds of port, and the ranges of their indices
+PORT_KINDS = {'rom': (16,), 'ram': (8, 4), 'pin10': ()}
+
+# Ports which take an input
+INPUT_KINDS = ('rom', 'pin10')
+
+
+def new_bus() -> dict:
+    """Return a bus with no devices connected."""
+    return {'writers': {}, 'readers': {}, 'events': [], 'sequence': 0}
+
+
+def check_port(port: tuple, kinds: tuple = tuple(PORT_KINDS)) -> tuple:
+    """Return a port, raising InvalidPort if it does not exist."""
+    port = tuple(port)
+    if not port or port[0] not in kinds or \
+            len(port) - 1 != len(PORT_KINDS[port[0]]) or \
+            not all(isinstance(index, int) and 0 <= index < size
+                    for index, size in zip(port[1:], PORT_KINDS[port[0]])):
+        raise InvalidPort('No such port: ' + str(port))
+    return port
+
+
+def connect_device(self, port: tuple, write=None, read=None) -> None:
+    """
+    Connect a device to a port.
+
+    Parameters
+    ----------
+    self : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    port: tuple, mandatory
+        The port (see module notes)
+
+    write: function, optional
+        Called as write(port, value, cycles) after the port is written
+
+    read: function, optional
+        Called as read(port, cycles) when the port is read, returning the
+        input (replacing any reader already connected)
+
+    Returns
+    -------
+    N/A
+
+    Raises
+    ------
+    InvalidPort
+        if the port does not exist, or a reader is connected to a port
+        which takes no input
+
+    Notes
+    -----
+    N/A
+
+    """
+    port = check_port(port)
+    if read is not None:
+        check_port(port, INPUT_KINDS)
+    if self.BUS is None:
+        self.BUS = new_bus()
+    if write is not None:
+        self.BUS['writers'].setdefault(port, []).append(write)
+    if read is not None:
+        self.BUS['readers'][port] = read
+
+
+def disconnect_device(self, port: tuple, write=None, read=None) -> None:
+    """Disconnect a device's callbacks (or, if none given, all) from a port."""
+    port = check_port(port)
+    if self.BUS is None:
+        return
+    writers = self.BUS['writers'].get(port, [])
+    if write is not None and write in writers:
+        writers.remove(write)
+    if read is not None and self.BUS['readers'].get(port) == read:
+        del self.BUS['readers'][port]
+    if write is None and read is None:
+        writers.clear()
+        self.BUS['readers'].pop(port, None)
+    if not writers:
+        self.BUS['writers'].pop(port, None)
+
+
+def schedule_input(self, cycles: int, port: tuple, value: int) -> None:
+    """
+    Schedule an input to a port for a cycle count.
+
+    Parameters
+    ----------
+    self : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    cycles: int, mandatory
+        The CYCLES count from which the input applies
+
+    port: tuple, mandatory
+        The port, a ROM port or PIN 10 (see module notes)
+
+    value: int, mandatory
+        The input
+
+    Returns
+    -------
+    N/A
+
+    Raises
+    ------
+    InvalidPort
+        if the port does not exist, or takes no input
+
+    Notes
+    -----
+    N/A
+
+    """
+    port = check_port(port, INPUT_KINDS)
+    if self.BUS is None:
+        self.BUS = new_bus()
+    heapq.heappush(self.BUS['events'],
+                   (cycles, self.BUS['sequence'], port, value))
+    self.BUS['sequence'] = self.BUS['sequence'] + 1
+
+
+def set_input(self, port: tuple, value: int) -> None:
+    """Set the input of a ROM port or PIN 10."""
+    if port[0] == 'pin10':
+        self.write_pin10(value)
+    else:
+        self.ROM_PORT[port[1]] = value
+
+
+def apply_inputs(self) -> None:
+    """Apply the scheduled inputs whose cycle count has been reached."""
+    if self.BUS is None:
+        return
+    events = self.BUS['events']
+    while events and events[0][0] <= self.CYCLES:
+        _cycles, _sequence, port, value = heapq.heappop(events)
+        set_input(self, port, value)
+
+
+def read_input(self, port: tuple) -> None:
+    """Bring the input of a port up to date (see module notes)."""
+    apply_inputs(self)
+    reader = self.BUS['readers'].get(port)
+    if reader is not None:
+        set_input(self, port, reader(port, self.CYCLES))
+
+
+def notify_write(self, port: tuple, value: int) -> None:
+    """Notify the devices connected to a port of a write to it."""
+    apply_inputs(self)
+    for writer in self.BUS['writers'].get(port, ()):
+        writer(port, value, self.CYCLES)
+
+
+def wait_for_inputs(self, kind: str, period: int) -> bool:
+    """
+    Determine whether a loop reading inputs may yet see them change.
+
+    Parameters
+    ----------
+    self : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    kind: str, mandatory
+        The instruction ending the loop ('jcn', 'jun' or 'isz')
+
+    period: int, mandatory
+        The cycles taken by the loop between two occurrences of the same
+        state
+
+    Returns
+    -------
+    True        if an input may change (the loop must go on being executed)
+    False       if not (the loop may be accelerated as usual)
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    An idle loop (JCN/JUN) waiting for a scheduled input is passed over:
+    CYCLES is advanced by whole periods of the loop (leaving it in the same
+    state) to the first at or after the input's cycle count.
+
+    """
+    if self.BUS is None:
+        return False
+    if self.BUS['readers']:
+        return True
+    events = self.BUS['events']
+    if not events:
+        return False
+    if kind != 'isz':
+        wait = events[0][0] - self.CYCLES
+        if wait > 0:
+            self.CYCLES = self.CYCLES + -(-wait // period) * period
+    return True
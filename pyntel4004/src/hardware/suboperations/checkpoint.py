@@ -0,0 +1,160 @@
+"""Checkpoint methods."""
+
+# A checkpoint is an incremental snapshot (see snapshot), held as a dict:
+#
+#   previous        the checkpoint it follows (None for the first)
+#   generations     RAM_GENERATION and PRAM_GENERATION when it was taken
+#   state           the registers, stack, accumulator, ports etc as bytes
+#                   (everything but the memories, which are small)
+#   ram             {page: bytes} the RAM characters and status characters
+#                   of each RAM chip written since the previous checkpoint
+#   pram            {page: bytes} each page of program RAM written since
+#                   the previous checkpoint
+#   rom             the ROM (first checkpoint only; ROM is never written by
+#                   an instruction)
+#
+# The pages written are those marked (in RAM_PAGES and PRAM_PAGES) with a
+# later generation than that at the previous checkpoint, so a checkpoint
+# costs the small state and the pages actually written. Restoring a
+# checkpoint takes each page from the latest checkpoint (of it and those it
+# follows) holding it, and writes only the pages whose content differs.
+#
+# A checkpoint must follow the checkpoint last taken (or restored) on the
+# same processor.
+
+# Import system modules
+import itertools
+
+from hardware.suboperations.snapshot import pack_state, pack_values, \
+    unpack_state, unpack_values  # noqa
+
+
+def ram_page(self, page: int) -> bytes:
+    """Return the RAM and status characters of a RAM chip."""
+    start = page * self.RAM_CHIP_SIZE
+    status = self.STATUS_CHARACTERS[page // self.NO_CHIPS_PER_BANK][
+        page % self.NO_CHIPS_PER_BANK]
+    return bytes(self.RAM[start:start + self.RAM_CHIP_SIZE]) + \
+        bytes(itertools.chain.from_iterable(status))
+
+
+def checkpoint(self, previous: dict = None) -> dict:
+    """
+    Take a checkpoint of the state of the processor.
+
+    Parameters
+    ----------
+    self : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    previous: dict, optional
+        The checkpoint last taken (or restored) on the processor (None to
+        take a full checkpoint)
+
+    Returns
+    -------
+    checkpoint: dict
+        The checkpoint (see module notes)
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    ram_since = pram_since = -1
+    rom = None
+    if previous is None:
+        rom = pack_values(self.ROM, 'H')
+    else:
+        ram_since, pram_since = previous['generations']
+    ram = {page: ram_page(self, page)
+           for page, written in enumerate(self.RAM_PAGES)
+           if written > ram_since}
+    pram = {page: pack_values(self.PRAM[page * self.PAGE_SIZE:
+                                        (page + 1) * self.PAGE_SIZE], 'H')
+            for page, written in enumerate(self.PRAM_PAGES)
+            if written > pram_since}
+    return {'previous': previous,
+            'generations': (self.RAM_GENERATION, self.PRAM_GENERATION),
+            'state': pack_state(self), 'ram': ram, 'pram': pram,
+            'rom': rom}
+
+
+def checkpoint_size(checkpoint: dict) -> int:
+    """Return the number of bytes of state held by a single checkpoint."""
+    return len(checkpoint['state']) + len(checkpoint['rom'] or b'') + \
+        sum(len(page) for page in checkpoint['ram'].values()) + \
+        sum(len(page) for page in checkpoint['pram'].values())
+
+
+def restore_checkpoint(self, checkpoint: dict) -> bool:
+    """
+    Restore the state of the processor from a checkpoint.
+
+    Parameters
+    ----------
+    self : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    checkpoint: dict, mandatory
+        The checkpoint (see checkpoint)
+
+    Returns
+    -------
+    True
+        if the state is restored successfully
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    The pages restored are counted as written (see write_ram and
+    write_pram), after the generations of the checkpoint, so that a
+    checkpoint following it holds every page written since.
+
+    """
+    ram = {}
+    pram = {}
+    rom = None
+    entry = checkpoint
+    while entry is not None:
+        for page, content in entry['ram'].items():
+            ram.setdefault(page, content)
+        for page, content in entry['pram'].items():
+            pram.setdefault(page, content)
+        rom = entry['rom']
+        entry = entry['previous']
+
+    ram_generation, pram_generation = checkpoint['generations']
+    self.RAM_GENERATION = max(self.RAM_GENERATION, ram_generation) + 1
+    self.PRAM_GENERATION = max(self.PRAM_GENERATION, pram_generation) + 1
+    for page, content in ram.items():
+        if ram_page(self, page) == content:
+            continue
+        start = page * self.RAM_CHIP_SIZE
+        self.RAM[start:start + self.RAM_CHIP_SIZE] = \
+            content[:self.RAM_CHIP_SIZE]
+        status = content[self.RAM_CHIP_SIZE:]
+        for register, characters in enumerate(
+                self.STATUS_CHARACTERS[page // self.NO_CHIPS_PER_BANK][
+                    page % self.NO_CHIPS_PER_BANK]):
+            characters[:] = status[register * len(characters):
+                                   (register + 1) * len(characters)]
+        self.RAM_PAGES[page] = self.RAM_GENERATION
+    for page, content in pram.items():
+        start = page * self.PAGE_SIZE
+        if pack_values(self.PRAM[start:start + self.PAGE_SIZE],
+                       'H') == content:
+            continue
+        self.PRAM[start:start + self.PAGE_SIZE] = \
+            unpack_values(content, 'H')
+        self.PRAM_PAGES[page] = self.PRAM_GENERATION
+    self.ROM[:] = unpack_values(rom, 'H')
+    unpack_state(self, checkpoint['state'])
+    return True
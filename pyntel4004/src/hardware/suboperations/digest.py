@@ -0,0 +1,241 @@
+"""Digest methods."""
+
+# A digest is a BLAKE2b hash of the state of a processor, packed into a
+# canonical byte layout (little-endian, whatever the platform), so that the
+# digests of two processors are equal exactly when their states are, and a
+# digest may be kept as a golden value and compared in later runs.
+#
+# The state is divided into components, any of which may be digested on its
+# own (or with others):
+#
+#   control         program counter
+#   stack           stack and stack pointer
+#   accumulator     accumulator, carry and ACBR
+#   registers       index registers
+#   ram             RAM and status characters, command register(s) and
+#                   RAM banks
+#   ports           ROM and RAM ports, and the test signal (PIN 10)
+#   rom             ROM
+#   pram            program RAM and WPM counter
+#
+# The cycle counter (CYCLES) is not architectural state - the program cannot
+# read it, and it depends upon how the program was executed - so it is
+# digested only when asked for, as the component:
+#
+#   cycles          cycle counter
+#
+# When two digests differ, diff lists the items of state which differ
+# (R2, RAM[0][1][2][3], STACK[1] etc), expanding only the components whose
+# digests differ.
+
+# Import system modules
+import hashlib
+import itertools
+import struct
+
+from hardware.suboperations.snapshot import pack_values  # noqa
+
+# Components of the state of a processor
+DIGEST_COMPONENTS = ('control', 'stack', 'accumulator', 'registers', 'ram',
+                     'ports', 'rom', 'pram')
+
+# Components digested only when asked for
+OPTIONAL_COMPONENTS = ('cycles',)
+
+# Size (in bytes) of a digest
+DIGEST_SIZE = 16
+
+# Personalisation of the hash, changed whenever the layout changes
+DIGEST_PERSON = b'i4004 state 2'
+
+# Program counter
+CONTROL_SCALARS = struct.Struct('<H')
+
+# Cycle counter
+CYCLES_SCALARS = struct.Struct('<Q')
+
+# Command register (set/value), data RAM bank and RAM bank
+RAM_SCALARS = struct.Struct('<BHBB')
+
+
+def pack_selection(self) -> bytes:
+    """Return the command register(s) and RAM banks as bytes."""
+    command_register = self.COMMAND_REGISTER
+    command_set = isinstance(command_register, str)
+    if command_set:
+        command_register = int(command_register, 2)
+    return RAM_SCALARS.pack(command_set, command_register,
+                            self.CURRENT_DRAM_BANK, self.CURRENT_RAM_BANK) + \
+        pack_values(self.COMMAND_REGISTERS, 'H')
+
+
+def pack_component(self, component: str) -> bytes:
+    """Return a component of the state of the processor as bytes."""
+    if component == 'control':
+        return CONTROL_SCALARS.pack(self.PROGRAM_COUNTER)
+    if component == 'cycles':
+        return CYCLES_SCALARS.pack(self.CYCLES)
+    if component == 'stack':
+        return bytes([self.STACK_POINTER]) + pack_values(self.STACK, 'H')
+    if component == 'accumulator':
+        return bytes([self.ACCUMULATOR, self.CARRY, self.ACBR])
+    if component == 'registers':
+        return bytes(self.REGISTERS)
+    if component == 'ram':
+        return pack_selection(self) + bytes(self.RAM) + \
+            bytes(itertools.chain.from_iterable(
+                characters for bank in self.STATUS_CHARACTERS
+                for chip in bank for characters in chip))
+    if component == 'ports':
+        return bytes(self.ROM_PORT + [self.PIN_10_SIGNAL_TEST]) + \
+            bytes(itertools.chain.from_iterable(self.RAM_PORT))
+    if component == 'rom':
+        return pack_values(self.ROM, 'H')
+    if component == 'pram':
+        return bytes([self.WPM_COUNTER == 'RIGHT']) + \
+            pack_values(self.PRAM, 'H')
+    raise ValueError('Unknown component: ' + str(component))
+
+
+def digest(self, components: tuple = DIGEST_COMPONENTS) -> bytes:
+    """
+    Return a digest of the state of the processor.
+
+    Parameters
+    ----------
+    self : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    components: tuple, optional
+        The components of the state digested (see DIGEST_COMPONENTS and
+        OPTIONAL_COMPONENTS)
+
+    Returns
+    -------
+    digest: bytes
+        DIGEST_SIZE bytes
+
+    Raises
+    ------
+    ValueError
+        if a component is unknown
+
+    Notes
+    -----
+    The components are digested in the order given.
+
+    """
+    state = hashlib.blake2b(digest_size=DIGEST_SIZE, person=DIGEST_PERSON)
+    for component in components:
+        state.update(pack_component(self, component))
+    return state.digest()
+
+
+def component_digests(self, components: tuple = DIGEST_COMPONENTS) -> dict:
+    """Return the digest of each component of the state of the processor."""
+    return {component: digest(self, (component,))
+            for component in components}
+
+
+def component_items(self, component: str) -> dict:
+    """Return the items of a component of the state of the processor."""
+    items = {}
+    if component == 'control':
+        items['PC'] = self.PROGRAM_COUNTER
+    elif component == 'cycles':
+        items['CYCLES'] = self.CYCLES
+    elif component == 'stack':
+        items['SP'] = self.STACK_POINTER
+        for level, address in enumerate(self.STACK):
+            items['STACK[' + str(level) + ']'] = address
+    elif component == 'accumulator':
+        items.update({'ACC': self.ACCUMULATOR, 'CARRY': self.CARRY,
+                      'ACBR': self.ACBR})
+    elif component == 'registers':
+        for register, value in enumerate(self.REGISTERS):
+            items['R' + str(register)] = value
+    elif component == 'ram':
+        items.update({'COMMAND_REGISTER': self.COMMAND_REGISTER,
+                      'DRAM_BANK': self.CURRENT_DRAM_BANK,
+                      'RAM_BANK': self.CURRENT_RAM_BANK})
+        for register, value in enumerate(self.COMMAND_REGISTERS):
+            items['COMMAND_REGISTERS[' + str(register) + ']'] = value
+        for address, value in enumerate(self.RAM):
+            bank, rest = divmod(address, self.RAM_BANK_SIZE)
+            chip, rest = divmod(rest, self.RAM_CHIP_SIZE)
+            register, character = divmod(rest, self.RAM_REGISTER_SIZE)
+            items['RAM[' + ']['.join(str(index) for index in
+                                     (bank, chip, register, character)) +
+                  ']'] = value
+        for bank, chips in enumerate(self.STATUS_CHARACTERS):
+            for chip, registers in enumerate(chips):
+                for register, characters in enumerate(registers):
+                    for character, value in enumerate(characters):
+                        items['STATUS[' + ']['.join(
+                            str(index) for index in
+                            (bank, chip, register, character)) + ']'] = value
+    elif component == 'ports':
+        items['PIN10'] = self.PIN_10_SIGNAL_TEST
+        for port, value in enumerate(self.ROM_PORT):
+            items['ROM_PORT[' + str(port) + ']'] = value
+        for bank, ports in enumerate(self.RAM_PORT):
+            for port, value in enumerate(ports):
+                items['RAM_PORT[' + str(bank) + '][' + str(port) + ']'] = \
+                    value
+    elif component == 'rom':
+        for address, value in enumerate(self.ROM):
+            items['ROM[' + str(address) + ']'] = value
+    elif component == 'pram':
+        items['WPM_COUNTER'] = self.WPM_COUNTER
+        for address, value in enumerate(self.PRAM):
+            items['PRAM[' + str(address) + ']'] = value
+    else:
+        raise ValueError('Unknown component: ' + str(component))
+    return items
+
+
+def diff(self, other, components: tuple = DIGEST_COMPONENTS) -> list:
+    """
+    List the items of state which differ between two processors.
+
+    Parameters
+    ----------
+    self : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    other : Processor, mandatory
+        The processor compared with it
+
+    components: tuple, optional
+        The components of the state compared (see DIGEST_COMPONENTS)
+
+    Returns
+    -------
+    differences: list
+        A dict for each item which differs: 'component', 'item' (e.g. 'R2'
+        or 'RAM[0][1][2][3]'), 'first' and 'second' (its values in the
+        processor and in the other processor)
+
+    Raises
+    ------
+    ValueError
+        if a component is unknown
+
+    Notes
+    -----
+    Only the components whose packed states differ are compared item by
+    item.
+
+    """
+    found = []
+    for component in components:
+        if pack_component(self, component) == \
+                pack_component(other, component):
+            continue
+        first = component_items(self, component)
+        second = component_items(other, component)
+        for item, value in first.items():
+            if second[item] != value:
+                found.append({'component': component, 'item': item,
+                              'first': value, 'second': second[item]})
+    return found
@@ -7,6 +7,7 @@ sys.path.insert(1, '..' + os.sep + 'src')
 
 
 from hardware.exceptions import InvalidPin10Value  # noqa
+from hardware.suboperations.bus import read_input  # noqa
 
 
 def read_pin10(self) -> int:
@@ -21,9 +22,12 @@ def read_pin10(self) -> int:
     Returns
     -------
     PIN_10_SIGNAL_TEST
-        The value of the simulated test pin
+        The value of the simulated test pin (brought up to date by any
+        device connected to it, see hardware.suboperations.bus)
 
     """
+    if self.BUS is not None:
+        read_input(self, ('pin10',))
     return self.PIN_10_SIGNAL_TEST
 
 
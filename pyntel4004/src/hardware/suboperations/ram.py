@@ -160,4 +160,44 @@ def write_ram_status(self, char: int) -> bool:
         decode_command_register(self.COMMAND_REGISTER,
                                 'DATA_RAM_STATUS_CHAR')
     self.STATUS_CHARACTERS[crb][chip][register][char] = value
+    self.RAM_GENERATION = self.RAM_GENERATION + 1
+    self.RAM_PAGES[crb * self.NO_CHIPS_PER_BANK + chip] = self.RAM_GENERATION
     return True
+
+
+def write_ram(self, address: int, value: int) -> int:
+    """
+    Write a RAM character, recording that its page (RAM chip) has changed.
+
+    Parameters
+    ----------
+    self: Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    address: int, mandatory
+        The absolute address of the RAM character
+
+    value: int, mandatory
+        The value to write
+
+    Returns
+    -------
+    value
+        The value written
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    As for program RAM (see write_pram), each write increments
+    RAM_GENERATION, and the RAM chip written is marked with the new
+    generation (in RAM_PAGES); the status characters of a RAM chip belong to
+    its page.
+
+    """
+    self.RAM[address] = value
+    self.RAM_GENERATION = self.RAM_GENERATION + 1
+    self.RAM_PAGES[address // self.RAM_CHIP_SIZE] = self.RAM_GENERATION
+    return value
@@ -0,0 +1,246 @@
+"""Snapshot methods."""
+
+# A snapshot is a compact binary blob holding the whole state of a
+# processor: memory (RAM, ROM and program RAM), index registers, stack and
+# stack pointer, accumulator, ACBR, carry, command register(s), RAM status
+# characters, ROM and RAM ports, WPM counter, test signal (PIN 10), RAM
+# banks, program counter and cycle counter.
+#
+# The blob is SNAPSHOT_MAGIC and SNAPSHOT_FORMAT, followed by the
+# compressed payload: the scalar values (SNAPSHOT_SCALARS), each list in
+# SNAPSHOT_SECTIONS and the RAM ports (flattened), then each memory in
+# SNAPSHOT_MEMORIES and the status characters (flattened), as little-endian
+# arrays. The lists are converted to and from
+# arrays in bulk, and restored by slice assignment, so that the lists of
+# the processor keep their identity.
+#
+# A clone is a new processor holding a copy of the state, taken by slicing
+# each list rather than by deep copying.
+
+# Import system modules
+import array
+import itertools
+import struct
+import sys
+import zlib
+
+from hardware.exceptions import InvalidSnapshot  # noqa
+
+# Start of every snapshot
+SNAPSHOT_MAGIC = b'i4004'
+
+# Version of the layout of a snapshot
+SNAPSHOT_FORMAT = 1
+
+# Program counter, stack pointer, accumulator, carry, ACBR, PIN 10, current
+# data RAM bank, current program RAM bank, WPM counter, command register
+# (set/value) and cycle counter
+SNAPSHOT_SCALARS = struct.Struct('<HBBBBBBBBBHQ')
+
+# Lists held in a snapshot (other than the memories), with the array type
+# of their values
+SNAPSHOT_SECTIONS = (('REGISTERS', 'B'), ('STACK', 'H'),
+                     ('COMMAND_REGISTERS', 'H'), ('ROM_PORT', 'B'))
+
+# Memories held in a snapshot, with the array type of their values
+SNAPSHOT_MEMORIES = (('RAM', 'B'), ('ROM', 'H'), ('PRAM', 'H'))
+
+
+def pack_values(values, typecode: str) -> bytes:
+    """Return a list of values as a little-endian array."""
+    items = array.array(typecode, values)
+    if sys.byteorder == 'big':
+        items.byteswap()
+    return items.tobytes()
+
+
+def unpack_values(data: bytes, typecode: str) -> array.array:
+    """Return the values of a little-endian array."""
+    items = array.array(typecode)
+    items.frombytes(data)
+    if sys.byteorder == 'big':
+        items.byteswap()
+    return items
+
+
+def status_lists(self) -> list:
+    """Return the innermost lists of the RAM status characters."""
+    return [characters for bank in self.STATUS_CHARACTERS
+            for chip in bank for characters in chip]
+
+
+def pack_state(self) -> bytes:
+    """Return the state of the processor, less its memories, as bytes."""
+    command_register = self.COMMAND_REGISTER
+    command_set = isinstance(command_register, str)
+    if command_set:
+        command_register = int(command_register, 2)
+    state = [SNAPSHOT_SCALARS.pack(
+        self.PROGRAM_COUNTER, self.STACK_POINTER, self.ACCUMULATOR,
+        self.CARRY, self.ACBR, self.PIN_10_SIGNAL_TEST,
+        self.CURRENT_DRAM_BANK, self.CURRENT_RAM_BANK,
+        self.WPM_COUNTER == 'RIGHT', command_set, command_register,
+        self.CYCLES)]
+    for name, typecode in SNAPSHOT_SECTIONS:
+        state.append(pack_values(getattr(self, name), typecode))
+    state.append(bytes(itertools.chain.from_iterable(self.RAM_PORT)))
+    return b''.join(state)
+
+
+def state_size(self) -> int:
+    """Return the number of bytes of the state packed by pack_state."""
+    return SNAPSHOT_SCALARS.size + \
+        sum(len(getattr(self, name)) * array.array(typecode).itemsize
+            for name, typecode in SNAPSHOT_SECTIONS) + \
+        sum(len(ports) for ports in self.RAM_PORT)
+
+
+def unpack_state(self, state: bytes) -> None:
+    """Restore the state of the processor, less its memories."""
+    self.PROGRAM_COUNTER, self.STACK_POINTER, self.ACCUMULATOR, \
+        self.CARRY, self.ACBR, self.PIN_10_SIGNAL_TEST, \
+        self.CURRENT_DRAM_BANK, self.CURRENT_RAM_BANK, wpm_right, \
+        command_set, command_register, self.CYCLES = \
+        SNAPSHOT_SCALARS.unpack_from(state)
+    self.WPM_COUNTER = 'RIGHT' if wpm_right else 'LEFT'
+    self.COMMAND_REGISTER = command_register
+    if command_set:
+        self.COMMAND_REGISTER = format(command_register, '08b')
+    offset = SNAPSHOT_SCALARS.size
+    for name, typecode in SNAPSHOT_SECTIONS:
+        values = getattr(self, name)
+        size = len(values) * array.array(typecode).itemsize
+        values[:] = unpack_values(state[offset:offset + size], typecode)
+        offset = offset + size
+    for bank in self.RAM_PORT:
+        bank[:] = state[offset:offset + len(bank)]
+        offset = offset + len(bank)
+
+
+def snapshot(self) -> bytes:
+    """
+    Take a snapshot of the state of the processor.
+
+    Parameters
+    ----------
+    self : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    Returns
+    -------
+    blob: bytes
+        The snapshot
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    N/A
+
+    """
+    payload = [pack_state(self)]
+    for name, typecode in SNAPSHOT_MEMORIES:
+        payload.append(pack_values(getattr(self, name), typecode))
+    payload.append(bytes(itertools.chain.from_iterable(status_lists(self))))
+    return SNAPSHOT_MAGIC + bytes([SNAPSHOT_FORMAT]) + \
+        zlib.compress(b''.join(payload), 1)
+
+
+def restore(self, blob: bytes) -> bool:
+    """
+    Restore the state of the processor from a snapshot.
+
+    Parameters
+    ----------
+    self : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    blob: bytes, mandatory
+        The snapshot (see snapshot)
+
+    Returns
+    -------
+    True
+        if the state is restored successfully
+
+    Raises
+    ------
+    InvalidSnapshot
+
+    Notes
+    -----
+    RAM and program RAM are counted as written (see write_ram and
+    write_pram), so that any copy of them is known to be out of date.
+
+    """
+    header = len(SNAPSHOT_MAGIC) + 1
+    if blob[:header] != SNAPSHOT_MAGIC + bytes([SNAPSHOT_FORMAT]):
+        raise InvalidSnapshot('Not a processor snapshot (format ' +
+                              str(SNAPSHOT_FORMAT) + ')')
+    try:
+        payload = zlib.decompress(blob[header:])
+    except zlib.error as ex:
+        raise InvalidSnapshot('Corrupt snapshot: ' + str(ex)) from ex
+    state = state_size(self)
+    sizes = [len(getattr(self, name)) * array.array(typecode).itemsize
+             for name, typecode in SNAPSHOT_MEMORIES]
+    characters = status_lists(self)
+    status = sum(len(chars) for chars in characters)
+    if len(payload) != state + sum(sizes) + status:
+        raise InvalidSnapshot('Snapshot of a different processor')
+
+    unpack_state(self, payload[:state])
+    offset = state
+    for (name, typecode), size in zip(SNAPSHOT_MEMORIES, sizes):
+        getattr(self, name)[:] = \
+            unpack_values(payload[offset:offset + size], typecode)
+        offset = offset + size
+    for chars in characters:
+        chars[:] = payload[offset:offset + len(chars)]
+        offset = offset + len(chars)
+    self.RAM_GENERATION = self.RAM_GENERATION + 1
+    self.RAM_PAGES[:] = [self.RAM_GENERATION] * len(self.RAM_PAGES)
+    self.PRAM_GENERATION = self.PRAM_GENERATION + 1
+    self.PRAM_PAGES[:] = [self.PRAM_GENERATION] * len(self.PRAM_PAGES)
+    return True
+
+
+def clone(self):
+    """
+    Return a new processor with a copy of the state of the processor.
+
+    Parameters
+    ----------
+    self : Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    Returns
+    -------
+    chip: Processor
+        The clone
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    The clone's operations are its own methods, even if those of the
+    processor have been replaced, and no devices are connected to it.
+
+    """
+    chip = self.__class__.__new__(self.__class__)
+    chip.__dict__.update(self.__dict__)
+    for name, _typecode in SNAPSHOT_SECTIONS + SNAPSHOT_MEMORIES:
+        setattr(chip, name, getattr(self, name)[:])
+    chip.RAM_PAGES = self.RAM_PAGES[:]
+    chip.PRAM_PAGES = self.PRAM_PAGES[:]
+    chip.RAM_PORT = [ports[:] for ports in self.RAM_PORT]
+    chip.STATUS_CHARACTERS = [[[characters[:] for characters in ram]
+                               for ram in bank]
+                              for bank in self.STATUS_CHARACTERS]
+    chip.OPERATIONS = {name: getattr(chip, name) for name in self.OPERATIONS}
+    chip.BUS = None
+    return chip
@@ -58,3 +58,40 @@ def flip_wpm_counter(self) -> str:
     else:
         self.WPM_COUNTER = 'LEFT'
     return self.WPM_COUNTER
+
+
+def write_pram(self, address: int, value: int) -> int:
+    """
+    Write a word of program RAM, recording that its page has changed.
+
+    Parameters
+    ----------
+    self: Processor, mandatory
+        The instance of the processor containing the registers, accumulator etc
+
+    address: int, mandatory
+        The address in program RAM
+
+    value: int, mandatory
+        The value to write
+
+    Returns
+    -------
+    value
+        The value written
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    Each write increments PRAM_GENERATION, and the page written is marked
+    with the new generation (in PRAM_PAGES), so anything derived from the
+    content of program RAM can tell cheaply whether it is still valid.
+
+    """
+    self.PRAM[address] = value
+    self.PRAM_GENERATION = self.PRAM_GENERATION + 1
+    self.PRAM_PAGES[address // self.PAGE_SIZE] = self.PRAM_GENERATION
+    return value
@@ -319,6 +319,20 @@ def msg_labels(param0: str) -> None:
             print('{:>5}     {}'.format(param0[_i]['address'], param0[_i]['label']))  # noqa
 
 
+def msg_batch(param0: list) -> None:
+    print()
+    print('Result  Program')
+    for result in param0:
+        status = 'OK' if result['result'] else 'FAILED'
+        print('{:<7} {}'.format(status, result['program']))
+        if result['error'] != '':
+            print('        ' + result['error'].replace('\n', '\n        '))
+    failed = len([result for result in param0 if not result['result']])
+    print()
+    print('Assembled: ' + str(len(param0) - failed) + '  Failed: ' +
+          str(failed))
+
+
 def print_messages(quiet: bool, msgtype: str, chip: Processor,
                    param0: Any) -> None:
     if not quiet:
@@ -336,6 +350,8 @@ def print_messages(quiet: bool, msgtype: str, chip: Processor,
             msg_prog(param0)
         if msgtype == 'LABELS':
             msg_labels(param0)
+        if msgtype == 'BATCH':
+            msg_batch(param0)
     return None
 
 
@@ -480,6 +496,68 @@ def get_opcodeinfobyopcode(self: Processor, opcode: int) -> dict:
     return opcodeinfo
 
 
+def decode_instruction(chip: Processor, memory: list, address: int) -> dict:
+    """
+    Decode the instruction at a given address (without side effects).
+
+    Parameters
+    ----------
+    chip : Processor, mandatory
+        The instance of the processor containing the instruction table
+
+    memory: list, mandatory
+        The memory (ROM/PRAM) containing the program
+
+    address: int, mandatory
+        The address of the instruction
+
+    Returns
+    -------
+    instruction: dict
+        address     address of the instruction
+        opcode      opcode (first word) of the instruction
+        words       number of words the instruction occupies
+        name        short mnemonic (e.g. 'jcn', 'ld', 'end', '-' if invalid)
+        text        instruction with its operands, e.g. 'jcn(4,20)'
+        code        the word(s) of the instruction
+        target      destination address of a JUN/JMS/JCN/ISZ, -1 otherwise
+
+    Raises
+    ------
+    N/A
+
+    Notes
+    -----
+    The destination of a JCN/ISZ is on the same page as the word following
+    the instruction (so a JCN/ISZ at the end of a page jumps into the next).
+
+    """
+    opcode = memory[address]
+    opcodeinfo = chip.INSTRUCTIONS[opcode]
+    words = opcodeinfo['words']
+    mnemonic = opcodeinfo['mnemonic']
+    name = mnemonic[:3].strip()
+    second = 0
+    if words == 2 and address + 1 < len(memory):
+        second = memory[address + 1]
+    target = -1
+    text = mnemonic
+    if name in ('jun', 'jms'):
+        target = ((opcode & 15) << 8) + second
+        text = name + '(' + str(target) + ')'
+    elif name in ('jcn', 'isz'):
+        target = ((address + 2) // chip.PAGE_SIZE) * chip.PAGE_SIZE + second
+        text = mnemonic.replace('address8', str(second))
+    elif name == 'fim':
+        text = mnemonic.replace('p', '').replace('data8', str(second))
+    elif name == 'ld':
+        text = 'ld' + mnemonic[3:]
+    return {'address': address, 'opcode': opcode, 'words': words,
+            'name': name, 'text': text.replace('()', ''),
+            'code': memory[address:address + max(words, 1)],
+            'target': target}
+
+
 def retrieve_program(chip: Processor, location: str) -> list:
     """
     Retrieve the assembled program from the specified location.
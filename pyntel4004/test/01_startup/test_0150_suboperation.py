@@ -1071,6 +1071,8 @@ def test_suboperation_test_insert_ram_status_scenario1(
                                       'DATA_RAM_STATUS_CHAR')
     chip_base.COMMAND_REGISTER = address
     chip_base.STATUS_CHARACTERS[rambank][chip][register][value[1]] = value[0]
+    chip_base.RAM_GENERATION = 1
+    chip_base.RAM_PAGES[rambank * chip_base.NO_CHIPS_PER_BANK + chip] = 1
 
     chip_test.set_accumulator(value[0])
     chip_test.CURRENT_RAM_BANK = rambank
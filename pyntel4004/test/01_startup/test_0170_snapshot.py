@@ -0,0 +1,91 @@
+# Using pytest
+# Test the snapshot, restoration and cloning of an i4004 (processor)
+
+# Import system modules
+import os
+import sys
+sys.path.insert(1, '..' + os.sep + 'src')
+
+import pytest  # noqa
+
+from hardware.exceptions import InvalidSnapshot  # noqa
+from hardware.processor import Processor  # noqa
+
+# Attributes which are not part of the state of the machine
+BOOKKEEPING = ('OPERATIONS', 'RAM_GENERATION', 'RAM_PAGES',
+               'PRAM_GENERATION', 'PRAM_PAGES', 'BUS')
+
+
+def machine_state(chip: Processor) -> dict:
+    """Return the state of a processor (without its bookkeeping)."""
+    return {name: value for name, value in vars(chip).items()
+            if name not in BOOKKEEPING}
+
+
+def busy_chip() -> Processor:
+    """Return a processor with some of everything set."""
+    chip = Processor()
+    chip.ROM[:5] = [32, 42, 33, 213, 256]
+    chip.PRAM[100] = 255
+    chip.RAM[42] = 9
+    chip.RAM[2047] = 15
+    chip.REGISTERS[:3] = [1, 2, 3]
+    chip.STACK[:] = [4095, 17, 0]
+    chip.STACK_POINTER = 1
+    chip.ACCUMULATOR = 11
+    chip.ACBR = 4
+    chip.CARRY = 1
+    chip.COMMAND_REGISTER = '00101010'
+    chip.STATUS_CHARACTERS[7][3][2][1] = 6
+    chip.ROM_PORT[15] = 12
+    chip.RAM_PORT[5][2] = 8
+    chip.WPM_COUNTER = 'RIGHT'
+    chip.PIN_10_SIGNAL_TEST = 1
+    chip.CURRENT_DRAM_BANK = 3
+    chip.CURRENT_RAM_BANK = 2
+    chip.PROGRAM_COUNTER = 3
+    chip.CYCLES = 2 ** 40
+    return chip
+
+
+@pytest.mark.parametrize("chip", [Processor(), busy_chip()])
+def test_snapshot_and_restore(chip):
+    """A snapshot restores every part of the state."""
+    blob = chip.snapshot()
+    assert isinstance(blob, bytes)
+    assert len(blob) < 1024
+    other = Processor()
+    ram = other.RAM
+    generation = other.PRAM_GENERATION
+    assert other.restore(blob)
+    assert machine_state(other) == machine_state(chip)
+    assert other.RAM is ram
+    assert other.PRAM_GENERATION > generation
+
+
+def test_clone():
+    """A clone has a copy of the state, sharing no lists."""
+    chip = busy_chip()
+    copy = chip.clone()
+    assert machine_state(copy) == machine_state(chip)
+    copy.RAM[42] = 1
+    copy.STATUS_CHARACTERS[7][3][2][1] = 0
+    copy.RAM_PORT[5][2] = 0
+    copy.ldm(7)
+    assert chip.RAM[42] == 9
+    assert chip.STATUS_CHARACTERS[7][3][2][1] == 6
+    assert chip.RAM_PORT[5][2] == 8
+    assert chip.ACCUMULATOR == 11
+    assert copy.ACCUMULATOR == 7
+    assert copy.OPERATIONS['ldm'].__self__ is copy
+
+
+def test_invalid_snapshot():
+    """Anything but a snapshot of a processor is refused."""
+    chip = Processor()
+    blob = busy_chip().snapshot()
+    for bad in (b'', b'junk', blob[:5] + bytes([99]) + blob[6:],
+                blob[:-4]):
+        with pytest.raises(InvalidSnapshot):
+            chip.restore(bad)
+    assert machine_state(chip) == machine_state(Processor())
@@ -0,0 +1,81 @@
+# Using pytest
+# Test the incremental checkpoints of an i4004 (processor)
+
+# Import system modules
+import os
+import sys
+sys.path.insert(1, '..' + os.sep + 'src')
+
+import pytest  # noqa
+
+from hardware.processor import Processor  # noqa
+from hardware.suboperations.checkpoint import checkpoint_size  # noqa
+
+
+def test_pages_written_are_tracked():
+    """Instructions writing memory mark the page written."""
+    chip = Processor()
+    chip.COMMAND_REGISTER = '01100000'
+    chip.ACCUMULATOR = 5
+    chip.wrm()
+    chip.CURRENT_RAM_BANK = 2
+    chip.wr1()
+    assert chip.RAM_GENERATION == 2
+    assert [page for page, written in enumerate(chip.RAM_PAGES)
+            if written] == [1, 9]
+
+
+def test_checkpoints_hold_pages_written():
+    """A checkpoint holds only what was written since the previous one."""
+    chip = Processor()
+    chip.ROM[:3] = [1, 2, 256]
+    first = chip.checkpoint()
+    assert len(first['ram']) == 32
+    assert len(first['pram']) == 16
+    assert first['rom'] is not None
+
+    chip.write_ram(100, 7)
+    chip.write_pram(300, 200)
+    chip.ACCUMULATOR = 9
+    second = chip.checkpoint(first)
+    assert list(second['ram']) == [1]
+    assert list(second['pram']) == [1]
+    assert second['rom'] is None
+    assert checkpoint_size(second) < 1024
+
+    third = chip.checkpoint(second)
+    assert third['ram'] == third['pram'] == {}
+
+    chip.write_ram(100, 1)
+    chip.STATUS_CHARACTERS[0][1][2][3] = 4
+    chip.write_pram(300, 0)
+    chip.ACCUMULATOR = 0
+    assert chip.restore_checkpoint(third)
+    assert chip.RAM[100] == 7
+    assert chip.STATUS_CHARACTERS[0][1][2][3] == 0
+    assert chip.PRAM[300] == 200
+    assert chip.ACCUMULATOR == 9
+
+
+@pytest.mark.parametrize("same", [True, False])
+def test_restore_then_continue(same):
+    """After a restore, the next checkpoint holds every change since."""
+    chip = Processor()
+    first = chip.checkpoint()
+    chip.write_ram(5, 1)
+    chip.write_ram(1000, 2)
+    second = chip.checkpoint(first)
+
+    other = chip if same else Processor()
+    other.restore_checkpoint(first)
+    assert other.RAM[5] == other.RAM[1000] == 0
+    other.write_ram(70, 3)
+    third = other.checkpoint(first)
+    assert 1 in third['ram']
+
+    fresh = Processor()
+    fresh.restore_checkpoint(third)
+    assert fresh.RAM[70] == 3
+    assert fresh.RAM[5] == 0
+    fresh.restore_checkpoint(second)
+    assert (fresh.RAM[5], fresh.RAM[70], fresh.RAM[1000]) == (1, 0, 2)
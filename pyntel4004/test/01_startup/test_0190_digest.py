@@ -0,0 +1,102 @@
+# Using pytest
+# Test the digest of the state of an i4004 (processor)
+
+# Import system modules
+import os
+import sys
+sys.path.insert(1, '..' + os.sep + 'src')
+
+import pytest  # noqa
+
+from hardware.processor import Processor  # noqa
+from hardware.suboperations.digest import DIGEST_COMPONENTS, \
+    OPTIONAL_COMPONENTS  # noqa
+
+# Digest of the state of a new processor (changes only with the layout)
+NEW_DIGEST = '2c451b61f7015ff190c721b672b868be'
+
+
+def set_item(chip: Processor, component: str) -> None:
+    """Change an item of a component of the state of a processor."""
+    if component == 'control':
+        chip.PROGRAM_COUNTER = 8
+    elif component == 'cycles':
+        chip.CYCLES = 8
+    elif component == 'stack':
+        chip.STACK[2] = 4095
+    elif component == 'accumulator':
+        chip.CARRY = 1
+    elif component == 'registers':
+        chip.REGISTERS[15] = 15
+    elif component == 'ram':
+        chip.STATUS_CHARACTERS[7][3][2][1] = 6
+    elif component == 'ports':
+        chip.RAM_PORT[5][2] = 8
+    elif component == 'rom':
+        chip.ROM[4095] = 256
+    elif component == 'pram':
+        chip.WPM_COUNTER = 'RIGHT'
+
+
+def test_new_processor_digest():
+    """The digest of a new processor is fixed."""
+    assert Processor().digest().hex() == NEW_DIGEST
+    assert Processor().digest() == Processor().digest()
+
+
+@pytest.mark.parametrize("component", DIGEST_COMPONENTS)
+def test_component_digests(component):
+    """A change to a component changes its digest, and no other."""
+    chip = Processor()
+    before = chip.component_digests()
+    set_item(chip, component)
+    after = chip.component_digests()
+    assert [name for name in DIGEST_COMPONENTS
+            if before[name] != after[name]] == [component]
+    assert chip.digest() != Processor().digest()
+    others = tuple(name for name in DIGEST_COMPONENTS if name != component)
+    assert chip.digest(others) == Processor().digest(others)
+
+
+def test_cycles_opt_in():
+    """The cycle counter is digested, and compared, only if asked for."""
+    chip = Processor()
+    set_item(chip, 'cycles')
+    assert chip.digest() == Processor().digest()
+    assert chip.diff(Processor()) == []
+    components = DIGEST_COMPONENTS + OPTIONAL_COMPONENTS
+    assert chip.digest(components) != Processor().digest(components)
+    assert chip.diff(Processor(), components) == [
+        {'component': 'cycles', 'item': 'CYCLES', 'first': 8, 'second': 0}]
+
+
+def test_command_register_set():
+    """A command register set to zero differs from one never set."""
+    chip = Processor()
+    chip.COMMAND_REGISTER = '00000000'
+    assert chip.digest(('ram',)) != Processor().digest(('ram',))
+
+
+def test_diff():
+    """The items which differ are listed, by component."""
+    chip = Processor()
+    other = Processor()
+    assert chip.diff(other) == []
+    other.RAM[300] = 9
+    other.REGISTERS[2] = 1
+    other.STACK[1] = 17
+    assert chip.diff(other) == [
+        {'component': 'stack', 'item': 'STACK[1]', 'first': 0, 'second': 17},
+        {'component': 'registers', 'item': 'R2', 'first': 0, 'second': 1},
+        {'component': 'ram', 'item': 'RAM[1][0][2][12]', 'first': 0,
+         'second': 9}]
+    assert chip.diff(other, ('registers',)) == [
+        {'component': 'registers', 'item': 'R2', 'first': 0, 'second': 1}]
+
+
+def test_unknown_component():
+    """Only the components of the state may be digested."""
+    with pytest.raises(ValueError):
+        Processor().digest(('cache',))
+    with pytest.raises(ValueError):
+        Processor().diff(Processor(), ('cache',))
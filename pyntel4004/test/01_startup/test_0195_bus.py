@@ -0,0 +1,219 @@
+# Using pytest
+# Test the peripheral bus
+
+# Import system modules
+import os
+import sys
+sys.path.insert(1, '..' + os.sep + 'src')
+
+import pytest  # noqa
+
+from hardware.exceptions import InvalidPort  # noqa
+from hardware.processor import Processor  # noqa
+from assembler.asm_supporting import write_program_to_file  # noqa
+from executer.execute import execute  # noqa
+from executer.exe_fast import execute_fast  # noqa
+from executer.exe_supporting import reload  # noqa
+from executer.exe_translate import execute_translated, load_translation, \
+    translate  # noqa
+
+# fim 0p 2/0 / src 0p / ldm 5 / wrr / ldm 1 / dcl / fim 0p 3/0 (RAM chip 3)
+# / src 0p / ldm 9 / wmp / end
+WRITES = [32, 32, 33, 213, 226, 209, 253, 32, 192, 33, 217, 225, 256]
+# fim 0p 4/0 / src 0p / rdr / xch 2 / rdr / end
+READS = [32, 64, 33, 234, 178, 234, 256]
+# ldm 2 / jcn (test = 0) self / ldm 9 / end
+WAIT = [210, 17, 1, 217, 256]
+# fim 0p 4/0 / src 0p / rdr / isz 3 back to the rdr / end
+POLL = [32, 64, 33, 234, 115, 3, 256]
+
+
+def load(program: list) -> Processor:
+    """Return a processor with a program loaded into ROM."""
+    chip = Processor()
+    chip.ROM[:len(program)] = program
+    return chip
+
+
+def test_no_bus():
+    """An unpopulated bus is None, and the ports behave as before."""
+    chip = load(WRITES)
+    assert chip.BUS is None
+    assert execute_fast(chip, 'rom', 0) == 'END'
+    assert chip.ROM_PORT[2] == 5
+    assert chip.RAM_PORT[1][3] == 9
+    assert chip.BUS is None
+
+
+def test_writers_notified():
+    """Devices are notified of writes to the ports they are connected to."""
+    chip = load(WRITES)
+    seen = []
+
+    def device(port, value, cycles):
+        seen.append((port, value, cycles))
+
+    chip.connect_device(('rom', 2), write=device)
+    chip.connect_device(('ram', 1, 3), write=device)
+    chip.connect_device(('rom', 5), write=device)
+    assert execute_fast(chip, 'rom', 0) == 'END'
+    assert seen == [(('rom', 2), 5, 5), (('ram', 1, 3), 9, 13)]
+
+    chip.disconnect_device(('rom', 2), write=device)
+    chip.disconnect_device(('ram', 1, 3))
+    seen.clear()
+    assert execute_fast(chip, 'rom', 0) == 'END'
+    assert seen == []
+
+
+def test_reader_supplies_input():
+    """A device connected to a ROM port supplies its input."""
+    chip = load(READS)
+    inputs = iter([6, 11])
+    chip.connect_device(('rom', 4), read=lambda port, cycles: next(inputs))
+    assert execute_fast(chip, 'rom', 0) == 'END'
+    assert (chip.REGISTERS[2], chip.ACCUMULATOR) == (6, 11)
+    assert chip.ROM_PORT[4] == 11
+
+
+def test_scheduled_inputs():
+    """Inputs are applied once the cycle count reaches them."""
+    chip = load(READS)
+    chip.schedule_input(0, ('rom', 4), 3)
+    chip.schedule_input(5, ('rom', 4), 7)
+    chip.schedule_input(5, ('rom', 4), 8)
+    chip.schedule_input(100, ('rom', 4), 15)
+    assert execute_fast(chip, 'rom', 0) == 'END'
+    assert (chip.REGISTERS[2], chip.ACCUMULATOR) == (3, 8)
+    assert chip.ROM_PORT[4] == 8
+    chip.CYCLES = 100
+    chip.apply_inputs()
+    assert chip.ROM_PORT[4] == 15
+
+
+def test_idle_loop_waits_for_scheduled_input():
+    """A wait on the test signal passes over the cycles to its input."""
+    chip = load(WAIT)
+    chip.schedule_input(1001, ('pin10',), 1)
+    assert execute_fast(chip, 'rom', 0) == 'END'
+    assert chip.ACCUMULATOR == 9
+
+    slow = load(WAIT)
+    slow.schedule_input(1001, ('pin10',), 1)
+    assert execute_fast(slow, 'rom', 0, {'idle': False}) == 'END'
+    assert chip.CYCLES == slow.CYCLES
+    assert 1001 <= chip.CYCLES < 1010
+
+    # With nothing scheduled, the wait is idle as ever
+    chip = load(WAIT)
+    chip.connect_device(('rom', 0), write=print)
+    assert execute_fast(chip, 'rom', 0) == 'IDLE'
+
+
+def test_test_signal_reader():
+    """A device may supply the test signal, read as JCN executes."""
+    chip = load(WAIT)
+    reads = []
+
+    def signal(port, cycles):
+        reads.append(cycles)
+        return int(cycles >= 50)
+
+    chip.connect_device(('pin10',), read=signal)
+    assert execute_fast(chip, 'rom', 0) == 'END'
+    assert chip.ACCUMULATOR == 9
+    assert reads[0] == 1 and reads[-1] >= 50
+    assert chip.PIN_10_SIGNAL_TEST == 1
+
+
+def test_polling_loop_not_skipped():
+    """A counting loop reading a port is run in full while inputs change."""
+    chip = load(POLL)
+    seen = []
+    chip.connect_device(('rom', 4),
+                        read=lambda port, cycles: seen.append(cycles) or 1)
+    assert execute_fast(chip, 'rom', 0) == 'END'
+    assert len(seen) == 16
+
+
+def test_clone_disconnected():
+    """A clone has no devices connected."""
+    chip = load(WRITES)
+    chip.connect_device(('rom', 2), write=print)
+    assert chip.clone().BUS is None
+
+
+@pytest.mark.parametrize("port", [('rom', 16), ('ram', 8, 0), ('ram', 0),
+                                  ('pin11',), ('pin10', 0), ()])
+def test_invalid_ports(port):
+    """Ports which do not exist are rejected."""
+    chip = Processor()
+    with pytest.raises(InvalidPort):
+        chip.connect_device(port, write=print)
+
+
+def test_inputs_only_to_input_ports():
+    """RAM ports take no input."""
+    chip = Processor()
+    with pytest.raises(InvalidPort):
+        chip.connect_device(('ram', 0, 0), read=lambda port, cycles: 0)
+    with pytest.raises(InvalidPort):
+        chip.schedule_input(10, ('ram', 0, 0), 1)
+
+
+def test_test_signal_routine_not_memoised():
+    """A subroutine testing a test signal supplied by a device is run."""
+    # jms sub / jms sub / end / sub: ldm 0 / jcn (test = 0) L / ldm 1 /
+    # L: xch 5 / bbl 0
+    program = [80, 5, 80, 5, 256, 208, 17, 9, 209, 181, 192]
+    for memoise in (False, True):
+        chip = load(program)
+        signal = iter([0, 1])
+        reads = []
+
+        def read(port, cycles):
+            reads.append(cycles)
+            return next(signal)
+
+        chip.connect_device(('pin10',), read=read)
+        assert execute_fast(chip, 'rom', 0, {'memoise': memoise}) == 'END'
+        assert chip.REGISTERS[5] == 1
+        assert len(reads) == 2
+
+
+def test_traced_execution_counts_cycles():
+    """Scheduled inputs apply, and writers are told the cycles, traced."""
+    seen = []
+    for traced in (True, False):
+        chip = load(READS + [0] * 10)
+        chip.ROM[6:10] = [226, 32, 0, 256]   # wrr / fim 0p 0 / end
+        chip.schedule_input(5, ('rom', 4), 7)
+        chip.connect_device(('rom', 4), write=lambda port, value, cycles:
+                            seen.append((value, cycles)))
+        if traced:
+            assert execute(chip, 'rom', 0, False, True, chip.OPERATIONS)
+        else:
+            assert execute_fast(chip, 'rom', 0, {'fuse': False}) == 'END'
+        assert (chip.REGISTERS[2], chip.ACCUMULATOR) == (0, 7)
+    assert seen == [(7, 7), (7, 7)]
+
+
+def test_translated_blocks_count_cycles_at_ports(tmp_path):
+    """Writers see the same cycles in a translated block as in the loop."""
+    memory = WRITES + [0] * (4096 - len(WRITES))
+    filename = str(tmp_path / 'program')
+    write_program_to_file(memory, filename, 'rom', [], 'OBJ')
+    module = load_translation(translate(filename + '.obj'))
+    seen = []
+    for translated in (True, False):
+        chip = Processor()
+        location, pc, _ = reload(filename + '.obj', chip, True)
+        chip.connect_device(('rom', 2), write=lambda port, value, cycles:
+                            seen.append(cycles))
+        chip.connect_device(('ram', 1, 3), write=lambda port, value, cycles:
+                            seen.append(cycles))
+        if translated:
+            assert execute_translated(chip, location, pc, module) == 'END'
+        else:
+            assert execute_fast(chip, location, pc) == 'END'
+    assert seen == [5, 13, 5, 13]
@@ -50,7 +50,7 @@ def test_wrm_scenario1(rambank, chip, register, address):
 
     # Simulate conditions at end of instruction in base chip
     chip_base.PROGRAM_COUNTER = 0
-    chip_base.RAM[absolute_address] = value
+    chip_base.write_ram(absolute_address, value)
     chip_base.set_accumulator(value)
     chip_base.COMMAND_REGISTER = \
         encode_command_register(chip, register, address, 'DATA_RAM_CHAR')
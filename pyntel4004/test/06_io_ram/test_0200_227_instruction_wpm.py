@@ -152,18 +152,18 @@ def test_wpm_scenario1_write(rambank, chip, register, address):
 
     # Lines 19 - 20
     chip_base.set_accumulator(binary_to_decimal(str(chunks[0])))
-    chip_base.PRAM[address_to_write_to] = chip_base.ACCUMULATOR << 4
-    chip_base.RAM[address_to_write_to] = chip_base.ACCUMULATOR << 4
+    chip_base.write_pram(address_to_write_to, chip_base.ACCUMULATOR << 4)
+    chip_base.write_ram(address_to_write_to, chip_base.ACCUMULATOR << 4)
     Processor.flip_wpm_counter(chip_base)
     chip_base.increment_pc(1)
 
     # Lines 21 - 22
     chip_base.set_accumulator(binary_to_decimal(str(chunks[2])))
     value = chip_base.ACCUMULATOR
-    chip_base.PRAM[address_to_write_to] = \
-        chip_base.PRAM[address_to_write_to] + value
-    chip_base.RAM[address_to_write_to] = \
-        chip_base.RAM[address_to_write_to] + value
+    chip_base.write_pram(address_to_write_to,
+                         chip_base.PRAM[address_to_write_to] + value)
+    chip_base.write_ram(address_to_write_to,
+                        chip_base.RAM[address_to_write_to] + value)
     Processor.flip_wpm_counter(chip_base)
     chip_base.increment_pc(1)
 
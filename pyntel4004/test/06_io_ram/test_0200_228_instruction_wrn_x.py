@@ -71,6 +71,8 @@ def test_wrn_scenario1(rambank, chip, register, char):
     chip_base.increment_pc(1)
     chip_base.set_accumulator(value)
     chip_base.STATUS_CHARACTERS[rambank][chip][register][char] = value
+    chip_base.RAM_GENERATION = 1
+    chip_base.RAM_PAGES[rambank * chip_base.NO_CHIPS_PER_BANK + chip] = 1
 
     # Make assertions that the base chip is now at the same state as
     # the test chip which has been operated on by the instruction under test.
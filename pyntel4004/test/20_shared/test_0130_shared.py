@@ -51,3 +51,34 @@ def test_suboperation_get_opcodeinfo_scenario2(mnemonic):
 
     chip_opcode = str(get_opcodeinfo(chip, '',  mnemonic)).replace('\'', '"')
     assert chip_opcode == opcode
+
+
+##############################################################################
+#                      Test decode_instruction                               #
+##############################################################################
+
+
+@pytest.mark.parametrize("values", [[0, [0], 'nop', 1, -1],
+                                    [0, [20, 7], 'jcn(4,7)', 2, 7],
+                                    [254, [115, 3], 'isz(3,3)', 2, 259],
+                                    [0, [69, 18], 'jun(1298)', 2, 1298],
+                                    [0, [83, 0], 'jms(768)', 2, 768],
+                                    [0, [36, 200], 'fim(2,200)', 2, -1],
+                                    [0, [163], 'ld(3)', 1, -1],
+                                    [0, [1], '-', 1, -1],
+                                    [0, [256], 'end', 0, -1]])
+def test_shared_decode_instruction(values):
+    """Tests for decode_instruction function."""
+    from shared.shared import decode_instruction  # noqa
+    chip = Processor()
+    address, code, text, words, target = values
+    memory = [0] * 512
+    memory[address:address + len(code)] = code
+
+    instruction = decode_instruction(chip, memory, address)
+
+    assert instruction['text'] == text
+    assert instruction['words'] == words
+    assert instruction['target'] == target
+    assert instruction['code'] == code
+    assert memory[address:address + len(code)] == code
@@ -0,0 +1,127 @@
+# Using pytest
+# Test the content-addressed assembly cache
+
+# Import system modules
+import os
+import sys
+sys.path.insert(1, '..' + os.sep + 'src')
+
+from hardware.processor import Processor  # noqa
+from assembler.assemble import assemble  # noqa
+from assembler.asm_cache import cache_key, entry_size, evict  # noqa
+
+SOURCE = """/ Cached program
+        org     rom
+start,  ldm     5
+        xch     2
+        jun     start
+        end
+"""
+
+
+def write_source(path, text):
+    with open(path, 'w', encoding='utf-8') as source:
+        source.write(text)
+    return str(path)
+
+
+def test_assembly_cache_hit(tmp_path):
+    """A second assembly of the same source is served from the cache."""
+    import assembler.assemble as assemble_module
+    source = write_source(tmp_path / 'prog.asm', SOURCE)
+    cache = str(tmp_path / 'cache')
+    obj = str(tmp_path / 'prog')
+
+    chip_first = Processor()
+    assert assemble(source, obj, chip_first, True, 'ALL', cache)
+    with open(obj + '.obj', 'r', encoding='utf-8') as first:
+        first_obj = first.read()
+    os.remove(obj + '.obj')
+
+    # Passes must not be run when the cache is hit
+    pass1 = assemble_module.pass1
+    assemble_module.pass1 = None
+    try:
+        chip_second = Processor()
+        assert assemble(source, obj, chip_second, True, 'ALL', cache)
+    finally:
+        assemble_module.pass1 = pass1
+
+    assert chip_second.ROM == chip_first.ROM
+    with open(obj + '.obj', 'r', encoding='utf-8') as second:
+        assert second.read() == first_obj
+
+
+def test_assembly_cache_key_changes(tmp_path):
+    """The key depends on the source, output type and object file."""
+    source = write_source(tmp_path / 'a.asm', SOURCE)
+    key = cache_key(source, 'out', 'ALL')
+    assert key == cache_key(source, 'out', 'all')
+    assert key != cache_key(source, 'out', 'BIN')
+    assert key != cache_key(source, 'other', 'ALL')
+    write_source(source, SOURCE.replace('5', '6'))
+    assert key != cache_key(source, 'out', 'ALL')
+    assert cache_key(str(tmp_path / 'missing.asm'), 'out', 'ALL') == ''
+
+
+def test_assembly_cache_eviction(tmp_path):
+    """The least recently used entries are evicted first."""
+    cache = str(tmp_path / 'cache')
+    obj = str(tmp_path / 'prog')
+    keys = []
+    for value in range(3):
+        source = write_source(tmp_path / 'prog.asm',
+                              SOURCE.replace('5', str(value)))
+        keys.append(cache_key(source, obj, 'BIN'))
+        assert assemble(source, obj, Processor(), True, 'BIN', cache)
+        # Make sure that each entry has a distinct age
+        for name in os.listdir(cache):
+            meta = os.path.join(cache, name, 'meta.json')
+            age = os.path.getmtime(meta) - 10
+            os.utime(meta, (age, age))
+
+    assert sorted(os.listdir(cache)) == sorted(keys)
+    size = entry_size(os.path.join(cache, keys[0]))
+    assert evict(cache, 2 * size) == 1
+    assert sorted(os.listdir(cache)) == sorted(keys[1:])
+    assert evict(cache, 0) == 2
+    assert os.listdir(cache) == []
+
+
+def test_assembly_cache_stores_requested_artifacts(tmp_path):
+    """Only the artifacts of the requested output type are cached."""
+    import json  # noqa
+    source = write_source(tmp_path / 'prog.asm', SOURCE)
+    cache = str(tmp_path / 'cache')
+    obj = str(tmp_path / 'prog')
+    # A stale object file left by an earlier assembly
+    write_source(tmp_path / 'prog.obj', 'stale')
+    assert assemble(source, obj, Processor(), True, 'BIN', cache)
+    entry = os.path.join(cache, cache_key(source, obj, 'BIN'))
+    with open(os.path.join(entry, 'meta.json'), 'r',
+              encoding='utf-8') as meta:
+        assert json.load(meta)['artifacts'] == ['.bin']
+    assert sorted(os.listdir(entry)) == ['meta.json', 'program.bin']
+
+
+def test_assembler_version_covers_assembler():
+    """The cache version covers every module the output depends on."""
+    import assembler.asm_cache as asm_cache  # noqa
+    from assembler import assemble as assemble_module  # noqa
+    from shared import shared  # noqa
+    version = asm_cache.assembler_version()
+    opened = []
+    real_open = open
+
+    def spy(name, *args, **kwargs):
+        opened.append(os.path.abspath(name))
+        return real_open(name, *args, **kwargs)
+
+    asm_cache._VERSION = ''
+    asm_cache.open = spy
+    try:
+        assert asm_cache.assembler_version() == version
+    finally:
+        del asm_cache.open
+    assert os.path.abspath(assemble_module.__file__) in opened
+    assert os.path.abspath(shared.__file__) in opened
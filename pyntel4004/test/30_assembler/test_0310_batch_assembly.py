@@ -0,0 +1,58 @@
+# Using pytest
+# Test the batch assembly of many source files
+
+# Import system modules
+import os
+import sys
+sys.path.insert(1, '..' + os.sep + 'src')
+
+import pytest  # noqa
+
+from assembler.asm_batch import assemble_batch, find_sources  # noqa
+
+GOOD = """        org     rom
+        ldm     {0}
+        xch     {0}
+        end
+"""
+
+BAD = """        org     rom
+        zzz     5
+        end
+"""
+
+
+def make_sources(folder):
+    for value in range(3):
+        with open(os.path.join(folder, 'good' + str(value) + '.asm'), 'w',
+                  encoding='utf-8') as source:
+            source.write(GOOD.format(value))
+    with open(os.path.join(folder, 'bad.asm'), 'w',
+              encoding='utf-8') as source:
+        source.write(BAD)
+
+
+def test_batch_find_sources(tmp_path):
+    """Directories and glob patterns are both accepted."""
+    make_sources(str(tmp_path))
+    assert len(find_sources(str(tmp_path))) == 4
+    assert len(find_sources(str(tmp_path / 'good*.asm'))) == 3
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_batch_assembly(tmp_path, processes):
+    """Each file is assembled and errors are collected in the summary."""
+    make_sources(str(tmp_path))
+    output = str(tmp_path / 'out')
+    results = assemble_batch(str(tmp_path), output, 'BIN', True, processes)
+
+    assert [os.path.basename(r['program']) for r in results] == \
+        ['bad.asm', 'good0.asm', 'good1.asm', 'good2.asm']
+    assert [r['result'] for r in results] == [False, True, True, True]
+    assert "Invalid mnemonic 'zzz'" in results[0]['error']
+    for value in range(3):
+        assert results[value + 1]['error'] == ''
+        assert 'xch' in results[value + 1]['listing']
+        with open(os.path.join(output, 'good' + str(value) + '.bin'),
+                  'rb') as binary:
+            assert binary.read(2) == bytes([208 + value, 176 + value])
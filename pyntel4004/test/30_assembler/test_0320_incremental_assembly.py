@@ -0,0 +1,124 @@
+# Using pytest
+# Test incremental reassembly
+
+# Import system modules
+import os
+import sys
+sys.path.insert(1, '..' + os.sep + 'src')
+
+from hardware.processor import Processor  # noqa
+from assembler.assemble import assemble  # noqa
+from assembler.asm_incremental import assemble_incremental  # noqa
+
+PROGRAM = ['/ Incremental program',
+           'org     rom',
+           'start,  ldm     5',
+           '        xch     2',
+           'loop,   isz     2       loop',
+           '        jcn     2       start',
+           '        jms     sub',
+           '        jun     start',
+           'sub,    ldm     1',
+           '        bbl     0',
+           'end']
+
+
+def full_assembly(tmp_path, lines):
+    source = str(tmp_path / 'prog.asm')
+    with open(source, 'w', encoding='utf-8') as program:
+        program.write('\n'.join(lines) + '\n')
+    assemble(source, str(tmp_path / 'prog'), Processor(), True, 'BIN')
+    with open(str(tmp_path / 'prog.bin'), 'rb') as binary:
+        return list(binary.read())
+
+
+def image(state):
+    # Remove the "end" pseudo-opcode, as the full assembler does
+    return [0 if value > 255 else value for value in state['memory']]
+
+
+def test_incremental_full_assembly(tmp_path):
+    """An initial assembly produces the same image as the assembler."""
+    chip = Processor()
+    err, state = assemble_incremental(chip, PROGRAM)
+    assert err is False
+    assert image(state) == full_assembly(tmp_path, PROGRAM)
+    assert chip.ROM is state['memory']
+    assert state['labels'] == {'start,': 0, 'loop,': 2, 'sub,': 10}
+
+
+def test_incremental_edit_same_size(tmp_path):
+    """Changing an instruction without moving any code re-encodes one line."""
+    chip = Processor()
+    _, state = assemble_incremental(chip, PROGRAM)
+    lines = list(PROGRAM)
+    lines[3] = '        xch     3'
+    err, state = assemble_incremental(chip, lines, state)
+    assert err is False
+    assert state['encoded'] == 1
+    assert state['moved'] == 0
+    assert image(state) == full_assembly(tmp_path, lines)
+
+
+def test_incremental_insert_moves_labels(tmp_path):
+    """Inserting code moves the following lines and relinks references."""
+    chip = Processor()
+    _, state = assemble_incremental(chip, PROGRAM)
+    lines = list(PROGRAM)
+    lines.insert(4, '        nop')
+    err, state = assemble_incremental(chip, lines, state)
+    assert err is False
+    # The new line, plus isz (loop moved) and jms (sub moved)
+    assert state['encoded'] == 3
+    assert state['labels']['sub,'] == 11
+    assert image(state) == full_assembly(tmp_path, lines)
+
+    # ... and back again
+    err, state = assemble_incremental(chip, PROGRAM, state)
+    assert err is False
+    assert image(state) == full_assembly(tmp_path, PROGRAM)
+
+
+def test_incremental_same_page_error():
+    """A JCN/ISZ destination moved to another page is reported."""
+    chip = Processor()
+    _, state = assemble_incremental(chip, PROGRAM)
+    memory = list(state['memory'])
+    lines = list(PROGRAM)
+    lines.insert(2, 'org 250')
+    err, new_state = assemble_incremental(chip, lines, state)
+    assert "Label 'start' is not on the same page" in err
+    assert new_state is state
+    assert state['memory'] == memory
+
+
+def test_incremental_invalid_mnemonic():
+    """Errors in a changed line are reported and nothing is changed."""
+    chip = Processor()
+    _, state = assemble_incremental(chip, PROGRAM)
+    lines = list(PROGRAM)
+    lines[3] = '        zzz     3'
+    err, new_state = assemble_incremental(chip, lines, state)
+    assert err == "FATAL: Pass 1:  Invalid mnemonic 'zzz' at line: 4"
+    assert new_state is state
+
+
+def test_incremental_pass2_error_leaves_state():
+    """An error raised in pass 2 leaves the previous state as it was."""
+    chip = Processor()
+    lines = ['org rom', 'pin 0', 'start, ldm 1', 'ldm 2', 'end']
+    err, state = assemble_incremental(chip, lines)
+    assert not err
+    memory = list(state['memory'])
+    edited = list(lines)
+    edited[1] = 'pin 7'
+    edited.insert(2, 'jun start')
+    err, new_state = assemble_incremental(chip, edited, state)
+    assert err.startswith('FATAL: Pass 2: InvalidPin10Value')
+    assert new_state is state
+    assert state['memory'] == memory
+    assert state['lines'] == lines
+
+    err, again = assemble_incremental(chip, lines, state)
+    assert not err
+    assert again['memory'] == memory
@@ -0,0 +1,101 @@
+# Using pytest
+# Test relocatable object modules and the linker
+
+# Import system modules
+import os
+import sys
+sys.path.insert(1, '..' + os.sep + 'src')
+
+from hardware.processor import Processor  # noqa
+from assembler.asm_link import assemble_module, link  # noqa
+
+MAIN = """/ Main module
+start,  ldm     5
+        xch     2
+        jms     double
+        jun     done
+done,   nop
+        end
+"""
+
+LIBRARY = """/ Library module
+double, ld      2
+        add     2
+        xch     2
+loop,   isz     3       loop
+        jcn     4       double
+        bbl     0
+"""
+
+UNUSED = """other,  ldm     1
+        bbl     0
+"""
+
+
+def make_module(chip, tmp_path, name, text):
+    source = tmp_path / (name + '.asm')
+    source.write_text(text, encoding='utf-8')
+    err, module = assemble_module(chip, str(source), str(tmp_path / name))
+    assert err is False
+    return module
+
+
+def test_relocatable_module(tmp_path):
+    """A module records its symbols, externals and relocations."""
+    module = make_module(Processor(), tmp_path, 'main', MAIN)
+    assert os.path.exists(str(tmp_path / 'main.rel'))
+    assert module['code'] == [213, 178, 80, 0, 64, 6, 0, 256]
+    assert module['symbols'] == {'start': 0, 'done': 6}
+    assert module['externals'] == ['double']
+    assert module['relocations'] == [
+        {'offset': 2, 'type': 'abs12', 'symbol': 'double', 'local': False},
+        {'offset': 4, 'type': 'abs12', 'symbol': 'done', 'local': True}]
+
+
+def test_relocatable_link_library(tmp_path):
+    """Only the library modules which are needed are linked in."""
+    chip = Processor()
+    make_module(chip, tmp_path, 'main', MAIN)
+    make_module(chip, tmp_path, 'lib', LIBRARY)
+    make_module(chip, tmp_path, 'unused', UNUSED)
+    err, _labels = link(chip, [str(tmp_path / 'main.rel')],
+                        str(tmp_path / 'linked'), True, 'BIN',
+                        [str(tmp_path / 'unused.rel'),
+                         str(tmp_path / 'lib.rel')])
+    assert err is False
+    assert {'label': 'double,', 'address': 8} in _labels
+    assert {'label': 'other,', 'address': 0} not in _labels
+    with open(str(tmp_path / 'linked.bin'), 'rb') as binary:
+        assert list(binary.read(16)) == [213, 178, 80, 8, 64, 6, 0, 0,
+                                         162, 130, 178, 115, 11, 20, 8, 192]
+
+
+def test_relocatable_link_page_alignment(tmp_path):
+    """A module with same-page references does not straddle a page."""
+    chip = Processor()
+    main = make_module(chip, tmp_path, 'main',
+                       MAIN.replace('done,   nop',
+                                    'done,   nop\n' + '        nop\n' * 245))
+    lib = make_module(chip, tmp_path, 'lib', LIBRARY)
+    assert len(main['code']) == 253
+    err, _labels = link(chip, [main, lib], '', True, 'BIN')
+    assert err is False
+    assert {'label': 'loop,', 'address': 259} in _labels
+    assert chip.ROM[2:4] == [81, 0]
+    assert chip.ROM[259:263] == [115, 3, 20, 0]
+
+
+def test_relocatable_link_errors(tmp_path):
+    """Undefined and ambiguous symbols are reported."""
+    chip = Processor()
+    main = make_module(chip, tmp_path, 'main', MAIN)
+    lib = make_module(chip, tmp_path, 'lib', LIBRARY)
+    err, _ = link(chip, [main], '', True, 'BIN')
+    assert err == "FATAL: Link: Undefined symbol 'double' in module 'main'"
+    err, _ = link(chip, [main, lib, dict(lib, module='copy')], '', True, 'BIN')
+    assert "Symbol 'double' is defined in more than one module" in err
+
+    source = tmp_path / 'org.asm'
+    source.write_text('        org     rom\n', encoding='utf-8')
+    err, _ = assemble_module(chip, str(source))
+    assert "'org' is not permitted in a relocatable module" in err
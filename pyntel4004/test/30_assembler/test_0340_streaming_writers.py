@@ -0,0 +1,101 @@
+# Using pytest
+# Test the streaming object/binary/header writers
+
+# Import system modules
+import io
+import json
+import os
+import sys
+sys.path.insert(1, '..' + os.sep + 'src')
+
+from assembler.asm_supporting import format_program, header_lines, \
+    write_program_to_file  # noqa
+
+PROGRAM = [(value * 7) % 256 for value in range(4096)]
+PROGRAM[20] = 256
+LABELS = [{'label': 'start,', 'address': 0}]
+
+
+def test_streaming_writers_streams(tmp_path):
+    """Streams receive exactly what would be written to the files."""
+    filename = str(tmp_path / 'prog')
+    obj = io.StringIO()
+    binary = io.BytesIO()
+    header = io.StringIO()
+    write_program_to_file(list(PROGRAM), filename, 'rom', LABELS, 'ALL',
+                          {'OBJ': obj, 'BIN': binary, 'H': header})
+    assert os.listdir(str(tmp_path)) == []
+    write_program_to_file(list(PROGRAM), filename, 'rom', LABELS, 'ALL')
+
+    with open(filename + '.obj', 'r', encoding='utf-8') as file:
+        assert file.read() == obj.getvalue()
+    with open(filename + '.bin', 'rb') as file:
+        assert file.read() == binary.getvalue()
+    with open(filename + '.h', 'r', encoding='utf-8') as file:
+        # Only the assembly date may differ
+        assert file.read().splitlines()[3:] == \
+            header.getvalue().splitlines()[3:]
+
+    document = json.loads(obj.getvalue())
+    assert document['memory'][20] == '100'
+    assert [int(value, 16) for value in document['memory']] == PROGRAM
+    assert document['labels'] == LABELS
+    assert binary.getvalue()[20] == 0
+
+
+def test_streaming_writers_format():
+    """The object document and the header layout are unchanged."""
+    program = [0, 9, 10, 255, 256]
+    json_doc = format_program(program, '"program":"p"', '"assemble_date":"d"',
+                              '"location":"rom"', '"labels":[]')
+    assert json_doc == '{"program":"p","assemble_date":"d","location":"rom",' \
+        '"memory":["0", "9", "a", "ff", "100"],"labels":[]}'
+    assert program[4] == 0
+
+    lines = list(header_lines(list(range(20))))
+    assert lines[0] == 'const unsigned char rom_bin[] = {  \n'
+    assert lines[1].startswith('0x00, 0x01, ')
+    assert lines[1].endswith('0x09, 0xA, 0xB, 0xC, 0xD, 0xE, 0xF, \n')
+    assert lines[2] == '0x10, 0x11, 0x12, 0x13};\n'
+
+
+def test_header_partial_last_line(tmp_path):
+    """The last line of the header keeps every digit of its last value."""
+    # Before streaming, a program whose length was not a multiple of 16
+    # lost the last hex digit of its last value ('0x1};')
+    filename = str(tmp_path / 'prog')
+    write_program_to_file(list(range(20)), filename, 'rom', [], 'H')
+    with open(filename + '.h', 'r', encoding='utf-8') as file:
+        lines = file.read().splitlines()
+    assert lines[-4:] == [
+        'const unsigned char rom_bin[] = {  ',
+        '0x00, 0x01, 0x02, 0x03, 0x04, 0x05, 0x06, 0x07, 0x08, 0x09, '
+        '0xA, 0xB, 0xC, 0xD, 0xE, 0xF, ',
+        '0x10, 0x11, 0x12, 0x13};', '']
+
+
+def test_listing_written_in_one_go(tmp_path, monkeypatch):
+    """The listing of pass 2 is held, and written to stdout at its end."""
+    from hardware.processor import Processor  # noqa
+    from assembler.assemble import assemble  # noqa
+
+    class Output(io.StringIO):
+        """A stream counting its writes."""
+
+        writes = 0
+
+        def write(self, text):
+            self.writes = self.writes + 1
+            return super().write(text)
+
+    source = tmp_path / 'prog.asm'
+    source.write_text('/ Listed\n        org     rom\n' +
+                      '        nop\n' * 50 + '        end\n')
+    output = Output()
+    monkeypatch.setattr(sys, 'stdout', output)
+    assert assemble(str(source), str(tmp_path / 'prog'), Processor(), False,
+                    'BIN')
+    monkeypatch.undo()
+    listing = output.getvalue()
+    assert listing.count(' nop ') == 50
+    assert output.writes < 50
@@ -0,0 +1,56 @@
+# Using pytest
+# Test the superoptimiser
+
+# Import system modules
+import os
+import sys
+import pytest
+sys.path.insert(1, '..' + os.sep + 'src')
+
+from assembler.asm_superopt import superoptimise  # noqa
+
+ADD = ['clc', 'ldm 0', 'add 1', 'xch 2']
+
+
+def test_superopt_finds_shorter_sequence():
+    """Adding zero without carry is found to be a copy."""
+    report = superoptimise(ADD, ['R1', 'CARRY'], ['R2'], processes=1)
+    assert report['lines'] == ['ld 1', 'xch 2']
+    assert (report['words'], report['cycles']) == (2, 2)
+    assert report['original'] == {'words': 4, 'cycles': 4}
+    assert report['improved'] and report['exhaustive']
+    assert report['complete']
+
+
+def test_superopt_removes_identity():
+    """Negating twice is no sequence at all."""
+    report = superoptimise(['cma', 'iac', 'cma', 'iac'], ['ACC'], ['ACC'],
+                           processes=1)
+    assert report['lines'] == []
+    assert report['cycles'] == 0
+    assert report['improved']
+
+
+def test_superopt_no_improvement():
+    """An optimal sequence is reported unchanged."""
+    lines = ['ldm 3', 'xch 2', 'ldm 3']
+    report = superoptimise(lines, [], ['R2', 'ACC'], processes=1)
+    assert report['lines'] == lines
+    assert not report['improved']
+    assert report['complete']
+
+
+def test_superopt_processes():
+    """Worker processes find the same sequence."""
+    assert superoptimise(ADD, ['R1', 'CARRY'], ['R2'], processes=2) == \
+        superoptimise(ADD, ['R1', 'CARRY'], ['R2'], processes=1)
+
+
+@pytest.mark.parametrize("lines, live_in, live_out",
+                         [(['wrm'], ['ACC'], ['ACC']),
+                          (['jun 0'], [], ['ACC']),
+                          (['ldm 1'], [], ['RAM'])])
+def test_superopt_errors(lines, live_in, live_out):
+    """Side effects and unknown items are rejected."""
+    with pytest.raises(ValueError):
+        superoptimise(lines, live_in, live_out, processes=1)
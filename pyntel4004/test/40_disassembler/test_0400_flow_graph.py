@@ -0,0 +1,77 @@
+# Using pytest
+# Test the control flow recovering disassembler
+
+# Import system modules
+import os
+import sys
+sys.path.insert(1, '..' + os.sep + 'src')
+
+from hardware.processor import Processor  # noqa
+from disassembler.dis_flow import block_at, build_flow_graph  # noqa
+from disassembler.disassemble import disassemble_flow  # noqa
+
+# start,  ldm 5 / xch 2 / jms sub / loop, isz 3 loop / jcn 4 start /
+#         jun done / (data 217 216) / done, fim 0p 12 / fin 2 / jin 0 /
+# sub,    iac / add 2 / xch 2 / bbl 0 / (data 17 255 at 40)
+PROGRAM = [213, 178, 80, 16, 115, 4, 20, 0, 64, 12, 217, 216, 32, 12, 52,
+           49, 242, 130, 178, 192]
+
+
+def make_memory():
+    memory = [0] * 4096
+    memory[:len(PROGRAM)] = PROGRAM
+    memory[40] = 17
+    memory[41] = 255
+    return memory
+
+
+def test_flow_graph_blocks():
+    """Blocks, edges and the address index are recovered."""
+    graph = build_flow_graph(Processor(), make_memory())
+
+    blocks = dict((start, (block['end'], block['exit']))
+                  for start, block in graph['blocks'].items())
+    assert blocks == {0: (4, 'call'), 4: (6, 'branch'), 6: (8, 'branch'),
+                      8: (10, 'jump'), 12: (16, 'indirect'),
+                      16: (20, 'return')}
+    assert sorted(graph['edges']) == [
+        (0, 4, 'fall'), (0, 16, 'call'), (4, 4, 'branch'), (4, 6, 'fall'),
+        (6, 0, 'branch'), (6, 8, 'fall'), (8, 12, 'jump')]
+    assert graph['index'][12] == 12
+    assert graph['index'][18] == 16
+    assert 10 not in graph['index']
+    assert block_at(graph, 14)['start'] == 12
+    assert block_at(graph, 11) is None
+
+
+def test_flow_graph_data_and_labels():
+    """Unreached memory is data; destinations are labelled."""
+    graph = build_flow_graph(Processor(), make_memory(),
+                             lbls=[{'label': 'start,', 'address': 0}])
+    assert graph['data'] == [(10, 12), (20, 42)]
+    assert graph['labels'] == {0: 'start', 4: 'lbl4', 12: 'lbl12',
+                               16: 'sub16'}
+
+
+def test_flow_graph_entries_and_pages():
+    """Extra entry points are followed; JCN/ISZ stay in the next page."""
+    memory = make_memory()
+    # At 254: jcn 1 to 16 (i.e. 256 + 16), at 272: bbl 0
+    memory[254:256] = [17, 16]
+    memory[272] = 192
+    graph = build_flow_graph(Processor(), memory, [0, 254])
+    assert (254, 272, 'branch') in graph['edges']
+    assert (254, 256, 'fall') in graph['edges']
+    assert graph['blocks'][256]['exit'] == 'fall'
+
+
+def test_flow_graph_listing(capsys):
+    """The listing shows code, labels and data in address order."""
+    chip = Processor()
+    chip.ROM = make_memory()
+    disassemble_flow(chip, 'rom', [0], False, [])
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 42 - 5
+    assert lines[2].split() == ['2', '80,', '16', 'jms(sub16)']
+    assert lines[3].split() == ['4', 'lbl4', '115,', '4', 'isz(3,lbl4)']
+    assert lines[7].split() == ['11', '216', 'data']
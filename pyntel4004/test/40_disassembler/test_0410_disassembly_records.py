@@ -0,0 +1,68 @@
+# Using pytest
+# Test the disassembly record generators and writer
+
+# Import system modules
+import io
+import os
+import sys
+sys.path.insert(1, '..' + os.sep + 'src')
+
+from hardware.processor import Processor  # noqa
+from disassembler.dis_flow import build_flow_graph  # noqa
+from disassembler.dis_generator import flow_records, linear_records, \
+    write_disassembly  # noqa
+
+# ldm 5 / jcn 4 0 / fim 1p 200 / jms 768 / ld 3 / nop...
+MEMORY = bytes([213, 20, 0, 34, 200, 83, 0, 163]) + bytes([0]) * 8
+
+
+def test_linear_records():
+    """Records are decoded from a byte buffer."""
+    records = list(linear_records(MEMORY, labels={0: 'start'}))
+    assert [record['address'] for record in records] == \
+        [0, 1, 3, 5, 7] + list(range(8, 16))
+    assert records[0] == {'address': 0, 'code': [213], 'mnemonic': 'ldm',
+                          'operands': [5], 'text': 'ldm(5)',
+                          'label': 'start', 'target': -1}
+    assert records[1]['text'] == 'jcn(4,start)'
+    assert records[1]['operands'] == [4, 0]
+    assert records[2]['code'] == [34, 200]
+    assert records[2]['operands'] == [1, 200]
+    assert records[3]['target'] == 768
+    assert records[4]['mnemonic'] == 'ld'
+
+    records = list(linear_records(MEMORY, 3, 7))
+    assert [record['mnemonic'] for record in records] == ['fim', 'jms']
+
+
+def test_linear_records_stop_at_end():
+    """The "end" pseudo-opcode ends a linear disassembly."""
+    memory = [213, 256, 213]
+    assert len(list(linear_records(memory))) == 2
+    assert len(list(linear_records(memory, stop_at_end=False))) == 3
+
+
+def test_records_leave_processor_alone():
+    """No processor state is used or changed."""
+    chip = Processor()
+    chip.PROGRAM_COUNTER = 17
+    graph = build_flow_graph(chip, list(MEMORY))
+    records = list(flow_records(MEMORY, graph))
+    assert chip.PROGRAM_COUNTER == 17
+    assert [record['mnemonic'] for record in records][:3] == \
+        ['ldm', 'jcn', 'fim']
+    assert records[4]['mnemonic'] == 'ld'
+    assert records[-1]['address'] == 15
+
+
+def test_write_disassembly(tmp_path):
+    """Records are written in chunks to a file or a stream."""
+    filename = str(tmp_path / 'listing.txt')
+    assert write_disassembly(linear_records(MEMORY), filename, 4) == 13
+    stream = io.StringIO()
+    assert write_disassembly(linear_records(MEMORY), stream) == 13
+    with open(filename, 'r', encoding='utf-8') as listing:
+        assert listing.read() == stream.getvalue()
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 13
+    assert lines[1].split() == ['1', '20,', '0', 'jcn(4,0)']
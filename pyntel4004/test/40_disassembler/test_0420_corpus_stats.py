@@ -0,0 +1,86 @@
+# Using pytest
+# Test the corpus disassembly statistics
+
+# Import system modules
+import csv
+import json
+import os
+import sys
+sys.path.insert(1, '..' + os.sep + 'src')
+
+import pytest  # noqa
+
+from assembler.asm_supporting import write_program_to_file  # noqa
+from disassembler.dis_stats import corpus_stats, find_images, \
+    memory_stats  # noqa
+
+# ldm 5 / jms 6 / jun 9 / (data 17) / iac / bbl 0 / (data 0) / nop / end
+PROGRAM = [213, 80, 6, 64, 9, 17, 242, 192, 0, 0, 256]
+
+
+def make_images(folder):
+    for name, output in (('one', 'BIN'), ('two', 'OBJ')):
+        memory = PROGRAM + [0] * (4096 - len(PROGRAM))
+        write_program_to_file(memory, os.path.join(folder, name), 'rom', [],
+                              output)
+    with open(os.path.join(folder, 'bad.obj'), 'w',
+              encoding='utf-8') as bad:
+        bad.write('{"program":')
+
+
+def test_memory_stats():
+    """Instructions reached are counted; the rest is data."""
+    stats = memory_stats(PROGRAM + [0] * 100)
+    assert stats['instructions'] == 6
+    assert stats['one_word'] == 4
+    assert stats['two_word'] == 2
+    assert stats['data'] == 2
+    assert stats['mnemonics'] == {'ldm': 1, 'jms': 1, 'jun': 1, 'iac': 1,
+                                  'bbl': 1, 'nop': 1}
+    assert stats['opcodes'][80] == 1
+    assert stats['call_targets'] == {6: 1}
+
+    stats = memory_stats(PROGRAM, mode='linear')
+    assert stats['instructions'] == 7
+    assert stats['data'] == 0
+    assert stats['mnemonics']['jcn'] == 1
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_corpus_stats(tmp_path, processes):
+    """Each image is disassembled and the statistics aggregated."""
+    make_images(str(tmp_path))
+    assert [os.path.basename(image)
+            for image in find_images(str(tmp_path))] == \
+        ['bad.obj', 'one.bin', 'two.obj']
+    output = str(tmp_path / 'stats.jsonl')
+    results = corpus_stats(str(tmp_path), output, processes)
+
+    assert [os.path.basename(stats['image']) for stats in results] == \
+        ['bad.obj', 'one.bin', 'two.obj', '*']
+    assert results[0]['error'].startswith('JSONDecodeError')
+    assert results[1]['instructions'] == 5
+    assert results[2]['instructions'] == 6
+    assert results[3]['instructions'] == 11
+    assert results[3]['call_targets'] == {6: 2}
+    assert results[3]['error'] == '1'
+
+    with open(output, 'r', encoding='utf-8') as jsonl:
+        documents = [json.loads(line) for line in jsonl]
+    assert len(documents) == 4
+    assert documents[3]['mnemonics']['jms'] == 2
+
+
+def test_corpus_stats_csv(tmp_path):
+    """Statistics are written as CSV, one row per image."""
+    make_images(str(tmp_path))
+    output = str(tmp_path / 'stats.csv')
+    corpus_stats(str(tmp_path / '*.bin'), output, 1)
+    with open(output, 'r', encoding='utf-8') as stats:
+        rows = list(csv.DictReader(stats))
+    assert [row['image'] for row in rows] == \
+        [str(tmp_path / 'one.bin'), '*']
+    assert rows[1]['two_word'] == '2'
+    assert rows[1]['calls'] == '1'
+    assert rows[1]['jms'] == '1'
+    assert rows[1]['wrm'] == '0'
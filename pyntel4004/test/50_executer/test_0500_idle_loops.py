@@ -0,0 +1,103 @@
+# Using pytest
+# Test the fast execution loop and idle-loop detection
+
+# Import system modules
+import os
+import sys
+sys.path.insert(1, '..' + os.sep + 'src')
+
+import pytest  # noqa
+
+from hardware.processor import Processor  # noqa
+from executer.execute import execute  # noqa
+from executer.exe_fast import execute_fast, find_loop  # noqa
+
+
+def run(program: list, idle: bool = True, chip: Processor = None) -> tuple:
+    """Load a program into ROM and execute it from address 0."""
+    if chip is None:
+        chip = Processor()
+    chip.ROM[:len(program)] = program
+    reason = execute_fast(chip, 'rom', 0, {'idle': idle})
+    return chip, reason
+
+
+def state(chip: Processor) -> tuple:
+    """Return the processor state compared by the tests."""
+    return (chip.ACCUMULATOR, chip.CARRY, list(chip.REGISTERS),
+            chip.PROGRAM_COUNTER, chip.CYCLES)
+
+
+# ldm 3 / isz 4 self / nop / end
+DELAY = [211, 116, 1, 0, 256]
+# fim 1p 0 / isz 2 self / isz 3 back to the inner loop / end
+NESTED = [34, 0, 114, 2, 115, 2, 256]
+# ldm 7 / isz 5 back to the ldm / end
+BODY = [215, 117, 0, 256]
+# ldm 7 / ld 5 / isz 5 back to the ldm / end (the body uses the counter)
+COUNTER = [215, 165, 117, 0, 256]
+
+
+@pytest.mark.parametrize("program, cycles", [(DELAY, 34), (NESTED, 546),
+                                             (BODY, 48), (COUNTER, 64)])
+def test_delay_loops_skipped(program, cycles):
+    """Skipping a delay loop leaves the same state as running it."""
+    fast, reason = run(program)
+    slow, slow_reason = run(program, False)
+    assert reason == slow_reason == 'END'
+    assert state(fast) == state(slow)
+    assert fast.CYCLES == cycles
+    assert fast.PROGRAM_COUNTER == len(program) - 1
+
+
+def test_loop_analysis():
+    """Only loops without side effects (or use of the counter) qualify."""
+    chip = Processor()
+    assert find_loop(chip, DELAY, 1, 1) == {'kind': 'isz', 'counter': 4,
+                                            'inputs': False}
+    assert find_loop(chip, BODY, 0, 1) == {'kind': 'isz', 'counter': 5,
+                                           'inputs': False}
+    # jcn (test = 0) self
+    assert find_loop(chip, [17, 0], 0, 0) == {'kind': 'jcn', 'counter': -1,
+                                              'inputs': True}
+    assert find_loop(chip, COUNTER, 0, 2) is None
+    # wrm / jun back to the wrm
+    assert find_loop(chip, [224, 64, 0], 0, 1) is None
+
+
+def test_wait_on_test_signal():
+    """A wait on the test signal stops as idle, and may be resumed."""
+    # ldm 2 / jcn (test = 0) self / ldm 9 / end
+    chip, reason = run([210, 17, 1, 217, 256])
+    assert reason == 'IDLE'
+    assert chip.PROGRAM_COUNTER == 1
+    assert chip.ACCUMULATOR == 2
+
+    chip.write_pin10(1)
+    assert execute_fast(chip, 'rom', chip.PROGRAM_COUNTER) == 'END'
+    assert chip.ACCUMULATOR == 9
+
+
+def test_invalid_opcode():
+    """An invalid opcode stops execution."""
+    chip, reason = run([211, 1])
+    assert reason == 'INVALID'
+    assert chip.PROGRAM_COUNTER == 1
+
+
+def test_execute_with_options(tmp_path, monkeypatch):
+    """Execution with options uses the fast loop."""
+    monkeypatch.chdir(tmp_path)
+    # jms 4 / end / (data) / ldm 6 / xch 1 / bbl 3
+    chip = Processor()
+    chip.ROM[:7] = [80, 4, 256, 0, 214, 177, 195]
+    assert execute(chip, 'rom', 0, False, True, chip.OPERATIONS, {})
+    assert chip.REGISTERS[1] == 6
+    assert chip.ACCUMULATOR == 3
+    assert chip.PROGRAM_COUNTER == 2
+    assert chip.CYCLES == 5
+
+    # jun 3000 (beyond memory)
+    chip = Processor()
+    chip.ROM[:2] = [75, 184]
+    assert not execute(chip, 'rom', 0, False, True, chip.OPERATIONS, {})
@@ -0,0 +1,73 @@
+# Using pytest
+# Test the bulk update of ISZ counting loops
+
+# Import system modules
+import os
+import sys
+sys.path.insert(1, '..' + os.sep + 'src')
+
+import pytest  # noqa
+
+from hardware.processor import Processor  # noqa
+from executer.exe_fast import execute_fast, find_loop  # noqa
+
+# cmc / isz 6 back to the cmc / end (the carry alternates)
+ALTERNATE = [243, 118, 0, 256]
+# iac / isz 5 back to the iac / end (the accumulator counts)
+ACCUMULATE = [242, 117, 0, 256]
+# fim 1p 0 / cma / isz 2 self / isz 3 back to the cma / end
+NESTED = [34, 0, 244, 114, 3, 115, 2, 256]
+# jcn (carry) to the isz / stc / nop / isz 7 back to the jcn / end
+SKIP = [18, 4, 250, 0, 119, 0, 256]
+# fim 1p 0 / fim 2p 0 / isz 2 self / isz 3 / isz 4 / isz 5 / end
+DEEP = [34, 0, 36, 0, 114, 4, 115, 4, 116, 4, 117, 4, 256]
+
+
+def run(program: list, idle: bool) -> tuple:
+    """Execute a program, counting the ISZ instructions dispatched."""
+    chip = Processor()
+    chip.ROM[:len(program)] = program
+    counted = []
+    isz = chip.OPERATIONS['isz']
+
+    def counting_isz(register, address):
+        counted.append(register)
+        return isz(register, address)
+
+    chip.OPERATIONS['isz'] = counting_isz
+    assert execute_fast(chip, 'rom', 0, {'idle': idle}) == 'END'
+    return chip, len(counted)
+
+
+@pytest.mark.parametrize("program", [ALTERNATE, ACCUMULATE, NESTED, SKIP,
+                                     DEEP])
+def test_bulk_update_is_exact(program):
+    """The final state and cycle count are those of running every loop."""
+    fast, _ = run(program, True)
+    slow, _ = run(program, False)
+    assert (fast.ACCUMULATOR, fast.CARRY, fast.REGISTERS,
+            fast.PROGRAM_COUNTER, fast.CYCLES) == \
+        (slow.ACCUMULATOR, slow.CARRY, slow.REGISTERS,
+         slow.PROGRAM_COUNTER, slow.CYCLES)
+
+
+def test_nested_loops_collapse():
+    """Nested delay loops need only a few dispatched instructions."""
+    chip, dispatched = run(DEEP, True)
+    _, every = run(DEEP, False)
+    assert every == 16 ** 4 + 16 ** 3 + 16 ** 2 + 16
+    assert dispatched < 100
+    assert chip.CYCLES == 2 + 2 + 2 * every
+
+
+def test_loops_within_loops():
+    """Jumps within the body of a loop are allowed."""
+    chip = Processor()
+    assert find_loop(chip, NESTED, 2, 5) == {'kind': 'isz', 'counter': 3,
+                                             'inputs': False}
+    assert find_loop(chip, SKIP, 0, 4) == {'kind': 'isz', 'counter': 7,
+                                           'inputs': False}
+    # jcn out of the loop
+    assert find_loop(chip, [18, 6, 119, 0], 0, 2) is None
+    # jcn into the middle of an instruction
+    assert find_loop(chip, [18, 3, 34, 0, 119, 0], 0, 4) is None
@@ -0,0 +1,70 @@
+# Using pytest
+# Test the fusion of common instruction idioms
+
+# Import system modules
+import os
+import sys
+sys.path.insert(1, '..' + os.sep + 'src')
+
+from hardware.processor import Processor  # noqa
+from executer.exe_fast import decode_fused, execute_fast  # noqa
+
+# fim 0p 18 / src 0p / ldm 6 / wrm / fim 1p 18 / src 1p / rdm /
+# src 0p / adm / daa / wrm / ldm 3 / xch 5 / clb / add 5 / end
+PROGRAM = [32, 18, 33, 214, 224, 34, 18, 35, 233, 33, 235, 251, 224, 211,
+           181, 240, 133, 256]
+
+
+def run(options: dict, chip: Processor = None) -> tuple:
+    """Execute the program from address 0."""
+    if chip is None:
+        chip = Processor()
+        chip.ROM[:len(PROGRAM)] = PROGRAM
+    reason = execute_fast(chip, 'rom', chip.PROGRAM_COUNTER, options)
+    return chip, reason
+
+
+def state(chip: Processor) -> tuple:
+    """Return the processor state compared by the tests."""
+    return (chip.ACCUMULATOR, chip.CARRY, chip.REGISTERS, chip.RAM,
+            chip.COMMAND_REGISTER, chip.PROGRAM_COUNTER, chip.CYCLES)
+
+
+def test_idioms_decoded():
+    """Idioms are decoded as a single entry."""
+    chip = Processor()
+    entry = decode_fused(chip, PROGRAM, 5, set())
+    assert entry[1] == 'fim+src+rdm'
+    assert entry[0] == (34, 18, 35, 233)
+    assert entry[4:] == (4, 5, -1)
+    assert decode_fused(chip, PROGRAM, 9, set())[1] == 'src+adm+daa+wrm'
+    assert decode_fused(chip, PROGRAM, 13, set())[1] == 'ldm+xch'
+    assert decode_fused(chip, PROGRAM, 15, set())[1] == 'clb+add'
+    assert decode_fused(chip, PROGRAM, 3, set())[1] == 'ldm'
+
+
+def test_breakpoint_prevents_fusion():
+    """A sequence with a breakpoint inside it is not fused."""
+    chip = Processor()
+    assert decode_fused(chip, PROGRAM, 5, {7})[1] == 'fim'
+    assert decode_fused(chip, PROGRAM, 7, {7})[1] == 'src+rdm'
+
+
+def test_fused_results_identical():
+    """Fused and unfused execution leave the same state."""
+    fused, reason = run({})
+    unfused, unfused_reason = run({'fuse': False})
+    assert reason == unfused_reason == 'END'
+    assert state(fused) == state(unfused)
+    assert fused.RAM[18] == 2
+    assert fused.REGISTERS[5] == 3
+
+
+def test_breakpoint_within_idiom():
+    """Execution stops at a breakpoint within an idiom, and resumes."""
+    chip, reason = run({'breakpoints': [8]})
+    assert reason == 'BREAK'
+    assert chip.PROGRAM_COUNTER == 8
+    chip, reason = run({'breakpoints': [8]}, chip)
+    assert reason == 'END'
+    assert state(chip) == state(run({})[0])
@@ -0,0 +1,87 @@
+# Using pytest
+# Test the memoisation of subroutine calls
+
+# Import system modules
+import os
+import sys
+sys.path.insert(1, '..' + os.sep + 'src')
+
+import pytest  # noqa
+
+from hardware.processor import Processor  # noqa
+from executer.exe_fast import execute_fast  # noqa
+from executer.exe_memo import TrackedList, new_memo, observe  # noqa
+
+# fim 0p 37 / jms 20 / isz 4 back to the jms / end
+# 20: ld 1 / add 0 / xch 2 / bbl 0
+LOOP = {0: [32, 37, 80, 20, 116, 2, 256], 20: [161, 128, 178, 192]}
+# fim 0p 18 / src 0p / jms 30 / jms 30 / ldm 9 / wrm / jms 30 / end
+# 30: src 0p / rdm / xch 3 / bbl 0
+RAM = {0: [32, 18, 33, 80, 30, 80, 30, 217, 224, 80, 30, 256],
+       30: [33, 233, 179, 192]}
+# fim 0p 16 / src 0p / jms 30 / jms 30 / end
+# 30: wr0 / bbl 0
+STATUS = {0: [32, 16, 33, 80, 30, 80, 30, 256], 30: [228, 192]}
+
+
+def run(program: dict, counted: str, options: dict) -> tuple:
+    """Execute a program, counting the dispatches of an instruction."""
+    chip = Processor()
+    for address, code in program.items():
+        chip.ROM[address:address + len(code)] = code
+    dispatched = []
+    operation = chip.OPERATIONS[counted]
+
+    def counting(*arguments):
+        dispatched.append(arguments)
+        return operation(*arguments)
+
+    chip.OPERATIONS[counted] = counting
+    assert execute_fast(chip, 'rom', 0, options) == 'END'
+    return chip, len(dispatched)
+
+
+def state(chip: Processor) -> tuple:
+    """Return the processor state compared by the tests."""
+    return (chip.ACCUMULATOR, chip.CARRY, chip.REGISTERS, chip.RAM,
+            chip.STATUS_CHARACTERS, chip.STACK, chip.STACK_POINTER,
+            chip.COMMAND_REGISTER, chip.PROGRAM_COUNTER, chip.CYCLES)
+
+
+@pytest.mark.parametrize("program, counted, plain, memoised",
+                         [(LOOP, 'ld', 16, 2), (RAM, 'rdm', 3, 2),
+                          (STATUS, 'wr0', 2, 2)])
+def test_memoised_calls(program, counted, plain, memoised):
+    """Memoised calls leave the same state as executing them."""
+    chip, count = run(program, counted, {})
+    memo_chip, memo_count = run(program, counted, {'memoise': True})
+    assert state(memo_chip) == state(chip)
+    assert (count, memo_count) == (plain, memoised)
+    assert type(memo_chip.REGISTERS) is list
+
+
+def test_memo_size():
+    """Only the most recently used memos are kept."""
+    chip, _ = run(LOOP, 'ld', {})
+    memo_chip, count = run(LOOP, 'ld', {'memoise': True, 'memo_size': 1})
+    assert state(memo_chip) == state(chip)
+    assert count == 2
+
+
+def test_tracked_list():
+    """Items read before being written are the inputs."""
+    items = TrackedList([1, 2, 3, 4])
+    items[1] = items[0] + items[1]
+    assert items[1] == 3
+    assert items[2:] == [3, 4]
+    assert (items.read, items.written) == ({0, 1, 2, 3}, {1})
+
+
+def test_wpm_forgets_memos():
+    """Writing program memory forgets every memo."""
+    memo = new_memo()
+    memo['routines'][20] = [{}]
+    observe(Processor(), memo, 'ldm')
+    assert 20 in memo['routines']
+    observe(Processor(), memo, 'wpm')
+    assert memo['routines'] == {}
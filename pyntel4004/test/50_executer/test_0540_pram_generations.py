@@ -0,0 +1,60 @@
+# Using pytest
+# Test the invalidation of decoded instructions when program RAM changes
+
+# Import system modules
+import os
+import sys
+sys.path.insert(1, '..' + os.sep + 'src')
+
+from hardware.processor import Processor  # noqa
+from executer.exe_fast import discard_pages, execute_fast  # noqa
+
+# nop / ldm 3 / isz 5 back to the nop / end
+PROGRAM = [0, 211, 117, 0, 256]
+
+
+def test_write_pram():
+    """Writes to program RAM are counted, by page."""
+    chip = Processor()
+    assert chip.write_pram(300, 7) == 7
+    chip.write_pram(20, 1)
+    assert chip.PRAM[300] == 7
+    assert chip.PRAM_GENERATION == 2
+    assert chip.PRAM_PAGES[:3] == [2, 1, 0]
+
+
+def test_discard_pages():
+    """Only entries decoded from the pages written are discarded."""
+    chip = Processor()
+    cache = {0: 'a', 255: 'b', 300: 'c'}
+    pages = {0: [0, 255], 1: [255, 300]}
+    chip.write_pram(260, 1)
+    discard_pages(chip, cache, pages, 0)
+    assert cache == {0: 'a'}
+    assert pages == {0: [0, 255]}
+
+
+def run(write: int) -> Processor:
+    """Run the program from program RAM, changing the "ldm" part way."""
+    chip = Processor()
+    chip.PRAM[:len(PROGRAM)] = PROGRAM
+    nop = chip.OPERATIONS['nop']
+    executed = []
+
+    def writing_nop():
+        executed.append(1)
+        if len(executed) == write:
+            # ldm 3 --> ldm 7
+            chip.write_pram(1, 215)
+        return nop()
+
+    chip.OPERATIONS['nop'] = writing_nop
+    assert execute_fast(chip, 'ram', 0, {'idle': False}) == 'END'
+    return chip
+
+
+def test_modified_code_executed():
+    """An instruction changed after being decoded is decoded again."""
+    assert run(0).ACCUMULATOR == 3
+    assert run(8).ACCUMULATOR == 7
+    assert run(16).ACCUMULATOR == 7
@@ -0,0 +1,163 @@
+# Using pytest
+# Test the ahead-of-time translation of an image into Python
+
+# Import system modules
+import os
+import sys
+sys.path.insert(1, '..' + os.sep + 'src')
+
+import pytest  # noqa
+
+from hardware.processor import Processor  # noqa
+from assembler.asm_supporting import write_program_to_file  # noqa
+from executer.exe_fast import execute_fast  # noqa
+from executer.exe_supporting import reload  # noqa
+from executer.exe_translate import execute_translated, load_translation, \
+    translate  # noqa
+
+# fim 0p 37 / jms 10 / isz 4 back to the jms / ldm 9 / fim 1p 12 / jin 1p
+# 10: ld 1 / add 0 / xch 2 / bbl 0 / end (reached only through the jin)
+PROGRAM = [32, 37, 80, 10, 116, 2, 217, 34, 14, 51, 161, 128, 178, 192, 256]
+# src 0p / iac / wrm / jun back to the iac (forever, writing to RAM)
+FOREVER = [33, 242, 224, 64, 1]
+# ldm 2 / jcn (test = 0) self, waiting for PIN 10 / fim 1p 0 / isz 2 self /
+# ldm 9 / end
+WAIT = [210, 17, 1, 34, 0, 114, 5, 217, 256]
+
+
+def make_image(folder, output: str = 'OBJ', program: list = None) -> str:
+    """Write the program as an image."""
+    if program is None:
+        program = PROGRAM
+    memory = program + [0] * (4096 - len(program))
+    filename = os.path.join(str(folder), 'program')
+    write_program_to_file(memory, filename, 'rom', [], output)
+    return filename + '.' + output.lower()
+
+
+def run(image: str, translation=None) -> Processor:
+    """Load and execute an image."""
+    chip = Processor()
+    location, pc, _ = reload(image, chip, True)
+    if translation is None:
+        assert execute_fast(chip, location, pc, {'idle': False}) == 'END'
+    else:
+        assert execute_translated(chip, location, pc, translation) == 'END'
+    return chip
+
+
+def state(chip: Processor) -> tuple:
+    """Return the processor state compared by the tests."""
+    return (chip.ACCUMULATOR, chip.CARRY, chip.REGISTERS, chip.STACK,
+            chip.STACK_POINTER, chip.PROGRAM_COUNTER, chip.CYCLES)
+
+
+@pytest.mark.parametrize("output", ['OBJ', 'BIN'])
+def test_translation(tmp_path, output):
+    """A translated image executes exactly as the image itself."""
+    image = make_image(tmp_path, output)
+    filename = translate(image)
+    assert filename == str(tmp_path / 'program_aot.py')
+    module = load_translation(filename)
+    assert sorted(module.BLOCKS) == [0, 2, 4, 6, 10]
+    chip = run(image, module)
+    assert state(chip) == state(run(image))
+    # The "end" is not kept in a binary image
+    assert chip.PROGRAM_COUNTER == (14 if output == 'OBJ' else 2048)
+
+
+def test_translation_source(tmp_path):
+    """Each block is a function calling the processor's methods."""
+    with open(translate(make_image(tmp_path)), 'r',
+              encoding='utf-8') as module:
+        source = module.read()
+    assert "LOCATION = 'rom'" in source
+    assert '    chip.jms(10)  # 2\n    chip.PROGRAM_COUNTER = 10\n' in source
+    assert '    chip.isz(4, 2)  # 4\n    chip.CYCLES = chip.CYCLES + 2\n' \
+        in source
+
+
+def test_changed_image_not_translated(tmp_path):
+    """The fast loop is used if the memory is not what was translated."""
+    image = make_image(tmp_path)
+    module = load_translation(translate(image))
+    chip = Processor()
+    reload(image, chip, True)
+    chip.ROM[6] = 212
+    fast = Processor()
+    reload(image, fast, True)
+    fast.ROM[6] = 212
+    assert execute_translated(chip, 'rom', 0, module, {'idle': False}) == \
+        execute_fast(fast, 'rom', 0, {'idle': False})
+    assert state(chip) == state(fast)
+    assert chip.ACCUMULATOR == 4
+
+
+@pytest.mark.parametrize("limit", [{'max_instructions': 1000},
+                                   {'max_cycles': 1001},
+                                   {'max_time': 0.01}])
+def test_translation_run_limits(tmp_path, limit):
+    """A translation looping forever stops at the run limits."""
+    image = make_image(tmp_path, program=FOREVER)
+    module = load_translation(translate(image))
+    chip = Processor()
+    location, pc, _ = reload(image, chip, True)
+    counts = {}
+    reason = execute_translated(chip, location, pc, module,
+                                dict(limit, counts=counts))
+    assert reason == list(limit)[0].upper().replace('MAX_', '')
+    if 'max_instructions' not in limit:
+        # Only the instruction limit stops execution exactly
+        assert chip.CYCLES >= limit.get('max_cycles', 0)
+        return
+    fast = Processor()
+    reload(image, fast, True)
+    fast_counts = {}
+    assert execute_fast(fast, location, pc, dict(limit, counts=fast_counts)) \
+        == reason
+    assert state(chip) == state(fast)
+    assert counts == fast_counts
+
+
+def test_translation_cancelled(tmp_path):
+    """A translation looping forever stops once cancelled."""
+    import threading  # noqa
+    image = make_image(tmp_path, program=FOREVER)
+    module = load_translation(translate(image))
+    chip = Processor()
+    location, pc, _ = reload(image, chip, True)
+    cancel = threading.Event()
+    timer = threading.Timer(0.01, cancel.set)
+    timer.start()
+    assert execute_translated(chip, location, pc, module,
+                              {'cancel': cancel}) == 'CANCELLED'
+    timer.join()
+
+
+def test_translation_idle(tmp_path):
+    """A translated busy-wait stops as idle, as in the fast loop."""
+    image = make_image(tmp_path, program=WAIT)
+    module = load_translation(translate(image))
+    assert module.LOOPS == {1, 5}
+    chip = Processor()
+    location, pc, _ = reload(image, chip, True)
+    assert execute_translated(chip, location, pc, module) == 'IDLE'
+    assert chip.PROGRAM_COUNTER == 1
+    chip.write_pin10(1)
+    assert execute_translated(chip, location, chip.PROGRAM_COUNTER,
+                              module) == 'END'
+    assert chip.ACCUMULATOR == 9
+
+    fast = Processor()
+    reload(image, fast, True)
+    assert execute_fast(fast, location, pc) == 'IDLE'
+    fast.write_pin10(1)
+    assert execute_fast(fast, location, fast.PROGRAM_COUNTER) == 'END'
+    assert state(chip) == state(fast)
+
+    # Without idle loop detection, the wait runs to a limit
+    chip = Processor()
+    reload(image, chip, True)
+    assert execute_translated(chip, location, pc, module,
+                              {'idle': False, 'max_instructions': 500}) == \
+        'INSTRUCTIONS'
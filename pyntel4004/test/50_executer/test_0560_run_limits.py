@@ -0,0 +1,93 @@
+# Using pytest
+# Test the run limits and cancellation of the fast execution loop
+
+# Import system modules
+import os
+import sys
+import threading
+import time
+sys.path.insert(1, '..' + os.sep + 'src')
+
+import pytest  # noqa
+
+from hardware.processor import Processor  # noqa
+from executer.execute import execute  # noqa
+from executer.exe_fast import LIMIT_BATCH, execute_fast  # noqa
+
+# src 0p / iac / wrm / jun back to the iac (forever, writing to RAM)
+FOREVER = [33, 242, 224, 64, 1]
+
+
+def run(options: dict) -> tuple:
+    """Load the endless program into ROM and execute it from address 0."""
+    chip = Processor()
+    chip.ROM[:len(FOREVER)] = FOREVER
+    reason = execute_fast(chip, 'rom', 0, options)
+    return chip, reason
+
+
+@pytest.mark.parametrize("fuse", [True, False])
+def test_instruction_limit(fuse):
+    """Execution stops exactly at the instruction limit."""
+    # src, then 333 times round the loop
+    chip, reason = run({'max_instructions': 1000, 'fuse': fuse})
+    assert reason == 'INSTRUCTIONS'
+    assert chip.PROGRAM_COUNTER == 1
+    assert chip.CYCLES == 2 + 333 * 4
+    assert chip.RAM[0] == 333 % 16
+
+    assert run({'max_instructions': 0})[0].CYCLES == 0
+
+
+def test_resume_after_limit():
+    """Execution stopped by a limit may be resumed."""
+    chip, reason = run({'max_instructions': 100})
+    assert reason == 'INSTRUCTIONS'
+    assert execute_fast(chip, 'rom', chip.PROGRAM_COUNTER,
+                        {'max_instructions': 900}) == 'INSTRUCTIONS'
+    assert chip.CYCLES == run({'max_instructions': 1000})[0].CYCLES
+
+
+def test_cycle_limit():
+    """Execution stops within a batch of the cycle limit."""
+    chip, reason = run({'max_cycles': 5000})
+    assert reason == 'CYCLES'
+    assert 5000 <= chip.CYCLES < 5000 + LIMIT_BATCH * 2
+    assert chip.PROGRAM_COUNTER in (1, 2, 3)
+
+
+def test_time_limit():
+    """Execution stops once the wall-clock limit has passed."""
+    started = time.monotonic()
+    chip, reason = run({'max_time': 0.05})
+    assert reason == 'TIME'
+    assert 0.05 <= time.monotonic() - started < 5
+    assert chip.CYCLES > 0
+
+
+def test_cancel():
+    """Setting the cancel token from another thread stops execution."""
+    cancel = threading.Event()
+    timer = threading.Timer(0.05, cancel.set)
+    timer.start()
+    chip, reason = run({'cancel': cancel})
+    timer.join()
+    assert reason == 'CANCELLED'
+    assert chip.CYCLES > 0
+
+    # Already cancelled: nothing is executed
+    chip, reason = run({'cancel': cancel})
+    assert reason == 'CANCELLED'
+    assert chip.PROGRAM_COUNTER == 0
+    assert chip.CYCLES == 0
+
+
+def test_execute_with_limit(tmp_path, monkeypatch):
+    """A limit reached by execute gives a reason, not a coredump."""
+    monkeypatch.chdir(tmp_path)
+    chip = Processor()
+    chip.ROM[:len(FOREVER)] = FOREVER
+    options = {'max_instructions': 50}
+    assert execute(chip, 'rom', 0, False, True, chip.OPERATIONS, options)
+    assert options['reason'] == 'INSTRUCTIONS'
+    assert not os.path.exists(str(tmp_path / 'core.core'))
@@ -0,0 +1,174 @@
+# Using pytest
+# Test cooperative execution under asyncio
+
+# Import system modules
+import asyncio
+import os
+import sys
+sys.path.insert(1, '..' + os.sep + 'src')
+
+import pytest  # noqa
+
+from hardware.processor import Processor  # noqa
+from executer.exe_async import new_queues, run  # noqa
+from executer.exe_fast import execute_fast  # noqa
+
+# src 0p / iac / wrm / jun back to the iac (forever, writing to RAM)
+FOREVER = [33, 242, 224, 64, 1]
+# fim 0p 2/0 / src 0p / jcn (test = 0) self / rdr / iac / wrr / end
+PORTS = [32, 32, 33, 17, 3, 234, 242, 226, 256]
+# fim 0p 1/0 (RAM chip 1) / src 0p / ldm 5 / wmp / end
+RAM_PORT = [32, 64, 33, 213, 225, 256]
+# fim 1p 0 / isz 2 self / isz 3 back to the inner loop / ldm 9 / end
+NESTED = [34, 0, 114, 2, 115, 2, 217, 256]
+# fim 1p 0 / jms 7 / isz 2 back to the jms / end / 7: ldm 1 / bbl 0
+CALLS = [34, 0, 80, 7, 114, 2, 256, 209, 192]
+
+
+def load(program: list) -> Processor:
+    """Return a processor with a program loaded into ROM."""
+    chip = Processor()
+    chip.ROM[:len(program)] = program
+    return chip
+
+
+@pytest.mark.parametrize("program", [NESTED, RAM_PORT])
+def test_same_as_fast_loop(program):
+    """Executing in slices leaves the same state as the fast loop."""
+    sliced = load(program)
+    reason = asyncio.run(run(sliced, 'rom', 0, {'slice_instructions': 2}))
+    fast = load(program)
+    assert reason == execute_fast(fast, 'rom', 0) == 'END'
+    assert (sliced.ACCUMULATOR, sliced.REGISTERS, sliced.PROGRAM_COUNTER,
+            sliced.CYCLES) == (fast.ACCUMULATOR, fast.REGISTERS,
+                               fast.PROGRAM_COUNTER, fast.CYCLES)
+
+
+@pytest.mark.parametrize("slicing", [{'slice_instructions': 64},
+                                     {'slice_usec': 500}])
+def test_limits_apply_to_the_whole_run(slicing):
+    """The run limits count every slice."""
+    chip = load(FOREVER)
+    options = dict(slicing, max_instructions=1000)
+    assert asyncio.run(run(chip, 'rom', 0, options)) == 'INSTRUCTIONS'
+    assert chip.CYCLES == 2 + 333 * 4
+
+    chip = load(FOREVER)
+    options = dict(slicing, max_cycles=3000)
+    assert asyncio.run(run(chip, 'rom', 0, options)) == 'CYCLES'
+    assert 3000 <= chip.CYCLES < 3100
+
+
+def test_breakpoint_at_slice_boundary():
+    """A slice ending at a breakpoint stops there."""
+    chip = load(FOREVER)
+    options = {'slice_instructions': 1, 'breakpoints': [2]}
+    assert asyncio.run(run(chip, 'rom', 0, options)) == 'BREAK'
+    assert chip.PROGRAM_COUNTER == 2
+
+
+def test_many_machines_share_the_loop():
+    """Concurrent machines each get a slice in turn."""
+    async def share():
+        chips = [load(FOREVER) for _ in range(200)]
+        tasks = [asyncio.create_task(run(chip, 'rom', 0,
+                                         {'slice_instructions': 10}))
+                 for chip in chips]
+        for _ in range(5):
+            await asyncio.sleep(0)
+        progress = [chip.CYCLES for chip in chips]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return progress, chips
+
+    progress, chips = asyncio.run(share())
+    assert min(progress) > 0
+    assert max(progress) - min(progress) <= 40
+    # Cancelled between slices, with the ports restored
+    assert all(chip.PROGRAM_COUNTER in (1, 2, 3) for chip in chips)
+
+
+def test_ports_and_pin10():
+    """Inputs are taken from, and outputs put on, the queues."""
+    async def session():
+        chip = load(PORTS)
+        queues = new_queues()
+        task = asyncio.create_task(run(chip, 'rom', 0, {}, queues))
+        await asyncio.sleep(0)
+        waiting = chip.PROGRAM_COUNTER
+        queues['input'].put_nowait(('rom', 2, 6))
+        queues['input'].put_nowait(('pin10', 1))
+        reason = await task
+        return chip, waiting, reason, queues['output'].get_nowait()
+
+    chip, waiting, reason, output = asyncio.run(session())
+    assert waiting == 3
+    assert reason == 'END'
+    assert output == ('rom', 2, 7)
+    assert chip.ROM_PORT[2] == 7
+    # The outputs were connected through the bus, and are disconnected
+    assert chip.OPERATIONS['wrr'] == chip.wrr
+    assert chip.BUS is None
+
+    chip = load(RAM_PORT)
+    queues = new_queues()
+    assert asyncio.run(run(chip, 'rom', 0, {}, queues)) == 'END'
+    assert queues['output'].get_nowait() == ('ram', 0, 1, 5)
+
+
+def test_idle_without_inputs():
+    """Without an input queue, an idle program stops."""
+    assert asyncio.run(run(load(PORTS), 'rom', 0)) == 'IDLE'
+
+
+def test_outputs_alongside_devices():
+    """Devices already connected to a port are kept, and notified too."""
+    chip = load(RAM_PORT)
+    seen = []
+    chip.connect_device(('ram', 0, 1), write=lambda port, value, cycles:
+                        seen.append(value))
+    queues = new_queues()
+    assert asyncio.run(run(chip, 'rom', 0, {}, queues)) == 'END'
+    assert queues['output'].get_nowait() == ('ram', 0, 1, 5)
+    assert seen == [5]
+    assert list(chip.BUS['writers']) == [('ram', 0, 1)]
+
+
+def test_decoded_and_memos_kept_between_slices(monkeypatch):
+    """Each slice uses the instructions decoded and memos of the last."""
+    import executer.exe_async as exe_async  # noqa
+    slices = []
+
+    def execute(chip, location, pc, options):
+        slices.append(options)
+        return execute_fast(chip, location, pc, options)
+
+    monkeypatch.setattr(exe_async, 'execute_fast', execute)
+    chip = load(CALLS)
+    options = {'slice_instructions': 5, 'memoise': True}
+    assert asyncio.run(run(chip, 'rom', 0, options)) == 'END'
+    assert len(slices) > 3
+    assert all(sliced['decoded'] is slices[0]['decoded'] and
+               sliced['memo'] is slices[0]['memo'] for sliced in slices)
+    assert 7 in slices[0]['memo']['routines']
+    fast = load(CALLS)
+    assert execute_fast(fast, 'rom', 0) == 'END'
+    assert (chip.REGISTERS, chip.CYCLES) == (fast.REGISTERS, fast.CYCLES)
+
+
+def test_waiting_for_input_bounded():
+    """Waiting for an input ends at the deadline, or once cancelled."""
+    import threading  # noqa
+    chip = load(PORTS)
+    options = {'max_time': 0.05}
+    assert asyncio.run(run(chip, 'rom', 0, options, new_queues())) == 'TIME'
+    assert chip.PROGRAM_COUNTER == 3
+
+    async def cancelled():
+        cancel = threading.Event()
+        asyncio.get_running_loop().call_later(0.05, cancel.set)
+        return await run(load(PORTS), 'rom', 0, {'cancel': cancel},
+                         new_queues())
+
+    assert asyncio.run(cancelled()) == 'CANCELLED'
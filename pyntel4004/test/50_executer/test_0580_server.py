@@ -0,0 +1,211 @@
+# Using pytest
+# Test the multi-session emulation server
+
+# Import system modules
+import json
+import os
+import socket
+import sys
+import threading
+sys.path.insert(1, '..' + os.sep + 'src')
+
+import pytest  # noqa
+
+from executer.exe_server import evict_sessions, find_session, \
+    handle_request, new_server, release_session, serve  # noqa
+
+SOURCE = """/ Served program
+        org     rom
+start,  ldm     5
+        xch     2
+        end
+"""
+
+COUNTER = """/ Count for ever
+        org     rom
+loop,   iac
+        jun     loop
+"""
+
+
+def request(server: dict, op: str, **fields) -> dict:
+    """Make a request of the server, which must succeed."""
+    response = handle_request(server, dict(fields, op=op))
+    assert response['ok'], response
+    return response
+
+
+def test_sessions(tmp_path):
+    """A session loads, steps, runs and inspects its own processor."""
+    server = new_server(str(tmp_path), 2)
+    program = request(server, 'assemble', source=SOURCE)['program']
+    first = request(server, 'open')['session']
+    second = request(server, 'open')['session']
+    assert first != second
+    assert server['pool'] == []
+
+    request(server, 'load', session=first, program=program)
+    request(server, 'load', session=second, source=COUNTER)
+    state = request(server, 'step', session=first, count=1)['state']
+    assert state['accumulator'] == 5
+    assert state['program_counter'] == 1
+    response = request(server, 'run', session=first)
+    assert response['reason'] == 'END'
+    assert response['state']['registers'][2] == 5
+
+    response = request(server, 'run', session=second,
+                       options={'idle': False, 'max_instructions': 100})
+    assert response['reason'] == 'INSTRUCTIONS'
+    assert response['state']['accumulator'] == 50 % 16
+    inspected = request(server, 'inspect', session=second, memory=True)
+    assert inspected['location'] == 'rom'
+    assert len(inspected['state']['ram']) == 2048
+    assert request(server, 'inspect', session=first)['state'][
+        'registers'][2] == 5
+
+    request(server, 'close', session=first)
+    assert len(server['pool']) == 1
+    assert server['pool'][0].REGISTERS[2] == 0
+    assert not handle_request(server, {'op': 'inspect',
+                                       'session': first})['ok']
+
+
+def test_program_cache(tmp_path, monkeypatch):
+    """A program is assembled once, however often it is used."""
+    import assembler.assemble as assemble_module
+    server = new_server(str(tmp_path))
+    first = request(server, 'assemble', source=SOURCE)
+
+    def fail(*_args):
+        raise AssertionError('assembled again')
+    monkeypatch.setattr(assemble_module, 'assemble', fail)
+    second = request(server, 'assemble', source=SOURCE)
+    assert first == second
+    assert len(server['programs']) == 1
+
+
+def test_errors(tmp_path):
+    """A failed request is answered with its error."""
+    server = new_server(str(tmp_path))
+    for fields in ({'op': 'reboot'}, {'op': 'run', 'session': 'missing'},
+                   {'op': 'assemble', 'source': 'org rom\nzzz 1\nend\n'},
+                   {'op': 'load', 'session': 'x', 'program': 'missing'}):
+        response = handle_request(server, fields)
+        assert not response['ok']
+        assert response['error'] != ''
+
+
+def test_concurrent_assembly_errors(tmp_path):
+    """Requests assembling at once each see only their own errors."""
+    server = new_server(str(tmp_path))
+    stdout = sys.stdout
+    errors = {}
+
+    def assemble(line):
+        source = '        org rom\n' + '        nop\n' * (line - 2) + \
+            '        zzz 1\n        end\n'
+        errors[line] = handle_request(server, {'op': 'assemble',
+                                               'source': source})['error']
+
+    threads = [threading.Thread(target=assemble, args=(line,))
+               for line in range(2, 22)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for line, error in errors.items():
+        assert "Invalid mnemonic 'zzz' at line: " + str(line) + '\n' in error
+    assert sys.stdout is stdout
+
+
+def test_idle_sessions_kept_as_snapshots(tmp_path):
+    """Idle and surplus sessions are evicted to disk, and restored."""
+    server = new_server(str(tmp_path))
+    session = request(server, 'open')['session']
+    request(server, 'load', session=session, source=SOURCE)
+    request(server, 'step', session=session, count=2)
+
+    server['idle_timeout'] = 0
+    request(server, 'assemble', source=SOURCE)
+    assert server['sessions'] == {}
+    assert os.path.isfile(str(tmp_path / (session + '.pickle')))
+    server['idle_timeout'] = 300
+
+    state = request(server, 'inspect', session=session)['state']
+    assert state['registers'][2] == 5
+    assert state['program_counter'] == 2
+    assert not os.path.isfile(str(tmp_path / (session + '.pickle')))
+
+    server['max_sessions'] = 1
+    newer = request(server, 'open')['session']
+    assert list(server['sessions']) == [newer]
+    assert request(server, 'run', session=session)['reason'] == 'END'
+
+
+def test_session_ids_never_paths(tmp_path):
+    """Only snapshots of sessions the server evicted are ever restored."""
+    server = new_server(str(tmp_path / 'snapshots'))
+    planted = tmp_path / 'evil'
+    planted.mkdir()
+    (planted / 'x.pickle').write_bytes(b'not a pickle')
+    forged = 16 * 'a'
+    (tmp_path / 'snapshots' / (forged + '.pickle')).write_bytes(b'forged')
+    for name in ('../evil/x', forged, 42, None):
+        response = handle_request(server, {'op': 'inspect', 'session': name})
+        assert not response['ok']
+        assert response['error'].startswith('KeyError')
+    assert (planted / 'x.pickle').is_file()
+    assert (tmp_path / 'snapshots' / (forged + '.pickle')).is_file()
+
+
+def test_held_sessions_not_evicted(tmp_path):
+    """A session found by a request is not evicted until released."""
+    server = new_server(str(tmp_path))
+    name = request(server, 'open')['session']
+    request(server, 'load', session=name, source=SOURCE)
+    session = find_session(server, name)
+    server['idle_timeout'] = 0
+    assert evict_sessions(server) == 0
+    assert server['sessions'][name] is session
+    release_session(server, session)
+    assert evict_sessions(server) == 1
+    assert name not in server['sessions']
+
+
+@pytest.mark.parametrize("unix", [True, False])
+def test_socket_protocol(tmp_path, unix):
+    """Requests and responses are JSON lines on a socket."""
+    if unix and not hasattr(socket, 'AF_UNIX'):
+        pytest.skip('Unix sockets are not available')
+    address = str(tmp_path / 'server.sock') if unix else ('127.0.0.1', 0)
+    socket_server = serve(address, new_server(str(tmp_path)))
+    thread = threading.Thread(target=socket_server.serve_forever)
+    thread.start()
+    try:
+        family = socket.AF_UNIX if unix else socket.AF_INET
+        with socket.socket(family, socket.SOCK_STREAM) as client:
+            client.connect(socket_server.server_address)
+            lines = client.makefile('rwb')
+            responses = []
+            for fields in ({'op': 'open'}, 'not json'):
+                lines.write((json.dumps(fields) if isinstance(fields, dict)
+                             else fields).encode('utf-8') + b'\n')
+                lines.flush()
+                responses.append(json.loads(lines.readline()))
+            session = responses[0]['session']
+            lines.write(json.dumps({'op': 'load', 'session': session,
+                                    'source': SOURCE}).encode('utf-8') +
+                        b'\n' + json.dumps({'op': 'run', 'session': session}).
+                        encode('utf-8') + b'\n')
+            lines.flush()
+            responses.append(json.loads(lines.readline()))
+            responses.append(json.loads(lines.readline()))
+    finally:
+        socket_server.shutdown()
+        socket_server.server_close()
+        thread.join()
+    assert responses[0]['ok']
+    assert not responses[1]['ok']
+    assert responses[2]['ok']
+    assert responses[3]['reason'] == 'END'
+    assert responses[3]['state']['registers'][2] == 5
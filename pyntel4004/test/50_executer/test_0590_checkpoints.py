@@ -0,0 +1,63 @@
+# Using pytest
+# Test execution with periodic checkpoints
+
+# Import system modules
+import os
+import sys
+sys.path.insert(1, '..' + os.sep + 'src')
+
+import pytest  # noqa
+
+from hardware.processor import Processor  # noqa
+from hardware.suboperations.checkpoint import checkpoint_size  # noqa
+from executer.exe_checkpoint import run_with_checkpoints  # noqa
+from executer.exe_fast import execute_fast  # noqa
+
+# src 0p / iac / wrm / jun back to the iac (forever, writing to RAM)
+FOREVER = [33, 242, 224, 64, 1]
+# ldm 3 / xch 0 / end
+SHORT = [211, 176, 256]
+
+
+def load(program: list) -> Processor:
+    """Return a processor with a program loaded into ROM."""
+    chip = Processor()
+    chip.ROM[:len(program)] = program
+    return chip
+
+
+def test_checkpoints_are_small():
+    """Each checkpoint after the first holds little more than a page."""
+    reason, checkpoints = run_with_checkpoints(
+        load(FOREVER), 'rom', 0, 100, {'max_instructions': 3000})
+    assert reason == 'INSTRUCTIONS'
+    assert [checkpoint['instructions'] for checkpoint in checkpoints] == \
+        list(range(0, 3001, 100))
+    assert all(checkpoint_size(checkpoint) < 256
+               for checkpoint in checkpoints[1:])
+
+
+@pytest.mark.parametrize("index", [0, 7, 29])
+def test_resume_from_checkpoint(index):
+    """Execution resumed from a checkpoint reaches the next one."""
+    _reason, checkpoints = run_with_checkpoints(
+        load(FOREVER), 'rom', 0, 100, {'max_instructions': 3000})
+    chip = Processor()
+    chip.restore_checkpoint(checkpoints[index])
+    assert execute_fast(chip, 'rom', chip.PROGRAM_COUNTER,
+                        {'max_instructions': 100}) == 'INSTRUCTIONS'
+    expected = Processor()
+    expected.restore_checkpoint(checkpoints[index + 1])
+    assert chip.snapshot() == expected.snapshot()
+
+
+def test_last_checkpoint_at_end():
+    """The last checkpoint is taken where execution stops."""
+    reason, checkpoints = run_with_checkpoints(load(SHORT), 'rom', 0, 100)
+    assert reason == 'END'
+    assert len(checkpoints) == 2
+    assert checkpoints[1]['instructions'] == 2
+    chip = Processor()
+    chip.restore_checkpoint(checkpoints[1])
+    assert chip.REGISTERS[0] == 3
+    assert chip.PROGRAM_COUNTER == 2
@@ -0,0 +1,100 @@
+# Using pytest
+# Test the bisection of the divergence between two runs
+
+# Import system modules
+import os
+import sys
+sys.path.insert(1, '..' + os.sep + 'src')
+
+import pytest  # noqa
+
+from assembler.asm_supporting import write_program_to_file  # noqa
+from hardware.processor import Processor  # noqa
+from executer.exe_bisect import bisect_runs, label_address, load_run, \
+    new_run  # noqa
+
+# isz 4 to itself / outer, isz 3 back to 0 / ld 5 / xch 6 / ld 6 / end
+# (272 instructions of loops before the first ld)
+NESTED = [116, 0, 115, 0, 165, 182, 166, 256]
+# The same, storing into R7
+NESTED_R7 = [116, 0, 115, 0, 165, 183, 166, 256]
+# The same, ending before the ld
+SHORTER = [116, 0, 115, 0, 256]
+# The label of the outer loop
+LABELS = [{'label': 'outer,', 'address': 2}]
+
+
+def run_of(program: list, registers: dict = None) -> dict:
+    """Return a run of a program loaded into ROM."""
+    chip = Processor()
+    chip.ROM[:len(program)] = program
+    for register, value in (registers or {}).items():
+        chip.REGISTERS[register] = value
+    return new_run(chip, 'rom', 0, LABELS)
+
+
+def make_image(folder, name: str, program: list) -> str:
+    """Write a program as an image."""
+    memory = program + [0] * (4096 - len(program))
+    filename = os.path.join(str(folder), name)
+    write_program_to_file(memory, filename, 'rom', LABELS, 'OBJ')
+    return filename + '.obj'
+
+
+def test_identical_runs():
+    """Identical runs do not diverge."""
+    report = bisect_runs(run_of(NESTED), run_of(NESTED), 100)
+    assert not report['diverged']
+    assert report['instructions'] == 275
+    assert report['first']['reason'] == report['second']['reason'] == 'END'
+    assert report['differences'] == []
+
+
+@pytest.mark.parametrize("interval", [1, 100, 1000])
+def test_inputs_diverge(interval):
+    """Runs from two initial states diverge at the first use of them."""
+    first = run_of(NESTED, {5: 2})
+    second = run_of(NESTED, {5: 9})
+    report = bisect_runs(first, second, interval,
+                         components=('control', 'accumulator'))
+    assert report['diverged']
+    assert report['instructions'] == 272
+    assert report['first']['address'] == '4 (outer+2)'
+    assert report['first']['instruction'] == \
+        report['second']['instruction']
+    assert report['first']['instruction'].startswith('ld')
+    assert report['differences'] == [{'item': 'ACC', 'first': 2,
+                                      'second': 9}]
+    assert first['chip'].PROGRAM_COUNTER == 5
+
+
+def test_programs_diverge(tmp_path):
+    """Runs of two images diverge at the instruction which differs."""
+    first = load_run(make_image(tmp_path, 'first', NESTED))
+    second = load_run(make_image(tmp_path, 'second', NESTED_R7))
+    first['chip'].REGISTERS[5] = second['chip'].REGISTERS[5] = 3
+    report = bisect_runs(first, second, 100, names={'R6': 'total'})
+    assert report['diverged']
+    assert report['instructions'] == 273
+    assert report['first']['address'] == '5 (outer+3)'
+    assert report['first']['instruction'] != \
+        report['second']['instruction']
+    assert {'item': 'R6 (total)', 'first': 3, 'second': 0} in \
+        report['differences']
+    assert {'item': 'R7', 'first': 0, 'second': 3} in report['differences']
+
+
+def test_run_ends_first():
+    """A run which stops early diverges where it stops."""
+    report = bisect_runs(run_of(NESTED), run_of(SHORTER), 100)
+    assert report['diverged']
+    assert report['instructions'] == 272
+    assert report['first']['reason'] == 'INSTRUCTIONS'
+    assert report['second']['reason'] == 'END'
+
+
+def test_label_address():
+    """Addresses are labelled with the nearest label at or before them."""
+    assert label_address(1, LABELS) == '1'
+    assert label_address(2, LABELS) == '2 (outer)'
+    assert label_address(6, LABELS) == '6 (outer+4)'
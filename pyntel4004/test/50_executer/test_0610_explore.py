@@ -0,0 +1,109 @@
+# Using pytest
+# Test the exhaustive exploration of the state space of a routine
+
+# Import system modules
+import os
+import sys
+sys.path.insert(1, '..' + os.sep + 'src')
+
+import pytest  # noqa
+
+from hardware.processor import Processor  # noqa
+from executer.exe_explore import explore  # noqa
+
+# add 1 / end
+ADD = [129, 256]
+# clc / ld 1 / add 3 / xch 1 / ld 0 / add 2 / xch 0 / end (R0R1 += R2R3)
+ADD8 = [241, 161, 131, 177, 160, 130, 176, 256]
+# kbp / end
+KBP = [252, 256]
+# fim 0p 0 / src 0p / rdm / iac / wrm / end
+INCREMENT_RAM = [32, 0, 33, 233, 242, 224, 256]
+# jcn (test signal 0) to itself / end
+WAIT = [25, 0, 256]
+
+
+def load(program: list) -> Processor:
+    """Return a processor with a program loaded into ROM."""
+    chip = Processor()
+    chip.ROM[:len(program)] = program
+    return chip
+
+
+def test_add_relation():
+    """Every combination of accumulator, register and carry is added."""
+    report = explore(load(ADD), 'rom', 0, ['ACC', 'R1', 'CARRY'],
+                     processes=1)
+    assert report['combinations'] == 512
+    assert report['stopped'] == {}
+    for (acc, register, carry), outputs in report['relation'].items():
+        chip = Processor()
+        chip.ACCUMULATOR = acc
+        chip.REGISTERS[1] = register
+        chip.CARRY = carry
+        assert outputs == chip.add(1)
+    assert len(report['states']) == len(set(
+        (register,) + outputs
+        for (_acc, register, _carry), outputs in report['relation'].items()))
+    accumulator = explore(load(ADD), 'rom', 0, ['ACC', 'R1', 'CARRY'],
+                          components=('accumulator',), processes=1)
+    assert len(accumulator['states']) == len(set(
+        accumulator['relation'].values()))
+    assert sum(state['count'] for state in
+               accumulator['states'].values()) == 512
+
+
+def test_kbp_relation():
+    """The keyboard process maps single bits, and errors otherwise."""
+    report = explore(load(KBP), 'rom', 0, ['ACC'], ('ACC',), processes=1)
+    expected = {0: 0, 1: 1, 2: 2, 4: 3, 8: 4}
+    assert report['relation'] == {(acc,): (expected.get(acc, 15),)
+                                  for acc in range(16)}
+
+
+def test_chosen_values_and_ram():
+    """Inputs may take chosen values, and RAM is put back each time."""
+    chip = load(INCREMENT_RAM)
+    chip.RAM[1] = 5
+    report = explore(chip, 'rom', 0, {'RAM[0][0][0][0]': range(10)},
+                     ('RAM[0][0][0][0]', 'RAM[0][0][0][1]'), processes=1)
+    assert report['relation'] == {(value,): (value + 1, 5)
+                                  for value in range(10)}
+    assert len(report['states']) == 10
+    assert chip.RAM[0] == 0
+
+
+def test_processes(monkeypatch):
+    """The report is the same however many processes explore it."""
+    import executer.exe_explore  # noqa
+    monkeypatch.setattr(executer.exe_explore, 'EXPLORE_CHUNK', 1000)
+    reports = [explore(load(ADD8), 'rom', 0, ['R1', 'R3', 'R0'],
+                       ('R0', 'R1', 'CARRY'), processes=processes)
+               for processes in (1, 3)]
+    assert reports[0]['combinations'] == 4096
+    assert reports[0] == reports[1]
+
+
+def test_stopped():
+    """Combinations which do not reach the end are reported."""
+    report = explore(load(WAIT), 'rom', 0, ['PIN10'], ('PIN10',),
+                     processes=1)
+    assert report['stopped'] == {(0,): 'IDLE'}
+    assert report['relation'] == {(0,): (0,), (1,): (1,)}
+
+
+def test_exception():
+    """An exception raised by an instruction stops a combination."""
+    report = explore(load([180, 256]), 'rom', 0, {'ACC': [15, 16]},
+                     ('R4',), processes=1)
+    assert report['relation'][(15,)] == (15,)
+    assert list(report['stopped']) == [(16,)]
+    assert report['stopped'][(16,)].startswith('ValueTooLargeForRegister')
+
+
+@pytest.mark.parametrize("item", ['R16', 'RAM[0][4][0][0]', 'STACK[0]',
+                                  'ROM_PORT[16]'])
+def test_unknown_item(item):
+    """Only items of the state may be explored."""
+    with pytest.raises(ValueError):
+        explore(load(ADD), 'rom', 0, [item], processes=1)
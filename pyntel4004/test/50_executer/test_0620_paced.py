@@ -0,0 +1,155 @@
+# Using pytest
+# Test real-time (paced) execution
+
+# Import system modules
+import os
+import sys
+sys.path.insert(1, '..' + os.sep + 'src')
+
+import pytest  # noqa
+
+from hardware.processor import Processor  # noqa
+from executer.execute import execute  # noqa
+from executer.exe_fast import CYCLE_TIME, execute_fast  # noqa
+from executer.exe_paced import RESYNC_USEC, run_paced  # noqa
+
+# src 0p / iac / wrm / jun back to the iac (forever, writing to RAM)
+FOREVER = [33, 242, 224, 64, 1]
+# jcn (test = 0) self, waiting for PIN 10 / end
+WAIT = [17, 0, 256]
+# fim 1p 0 / isz 2 self / isz 3 back to the inner loop / ldm 9 / end
+NESTED = [34, 0, 114, 2, 115, 2, 217, 256]
+
+
+class FakeTime:
+    """A wall clock which moves on only as it is slept (or worked) on."""
+
+    def __init__(self, overrun: float = 0.0, work: float = 0.0):
+        self.now = 0.0
+        self.overrun = overrun
+        self.work = work
+        self.sleeps = []
+
+    def clock(self) -> float:
+        """Return the time, each call taking some work."""
+        self.now = self.now + self.work
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        """Sleep, overrunning by a fixed amount."""
+        self.sleeps.append(seconds)
+        self.now = self.now + seconds + self.overrun
+
+
+def load(program: list) -> Processor:
+    """Return a processor with a program loaded into ROM."""
+    chip = Processor()
+    chip.ROM[:len(program)] = program
+    return chip
+
+
+def test_same_as_fast_loop():
+    """Paced execution leaves the same state as the fast loop."""
+    fake = FakeTime()
+    paced = load(NESTED)
+    reason, stats = run_paced(paced, 'rom', 0,
+                              {'clock': fake.clock, 'sleep': fake.sleep})
+    fast = load(NESTED)
+    assert reason == execute_fast(fast, 'rom', 0) == 'END'
+    assert (paced.ACCUMULATOR, paced.REGISTERS, paced.CYCLES) == \
+        (fast.ACCUMULATOR, fast.REGISTERS, fast.CYCLES)
+    assert stats['emulated_usec'] == pytest.approx(fast.CYCLES * CYCLE_TIME)
+
+
+def test_sleeps_keep_in_step():
+    """Each batch sleeps until its due time, learning the overrun."""
+    fake = FakeTime(overrun=0.0002)
+    chip = load(FOREVER)
+    reason, stats = run_paced(chip, 'rom', 0,
+                              {'max_cycles': 10000, 'clock': fake.clock,
+                               'sleep': fake.sleep})
+    assert reason == 'CYCLES'
+    assert stats['batches'] == len(fake.sleeps) > 40
+    assert stats['late_batches'] == 0
+    assert stats['emulated_usec'] == pytest.approx(chip.CYCLES * CYCLE_TIME)
+    # The overrun is learnt, and sleeps shortened by it
+    assert fake.sleeps[-1] < fake.sleeps[1] - 0.00015
+    assert abs(stats['drift_usec']) < 50
+    assert stats['max_wake_error_usec'] == pytest.approx(200)
+
+
+def test_speed():
+    """Emulated time may run faster than wall time."""
+    fake = FakeTime()
+    chip = load(FOREVER)
+    _, stats = run_paced(chip, 'rom', 0,
+                         {'max_cycles': 10000, 'speed': 4.0,
+                          'clock': fake.clock, 'sleep': fake.sleep})
+    assert fake.now == pytest.approx(stats['emulated_usec'] / 4e6)
+
+
+def test_late_batches_and_resync():
+    """A slow host runs late, and a long stall is not caught up."""
+    fake = FakeTime(work=0.004)
+    chip = load(FOREVER)
+    _, stats = run_paced(chip, 'rom', 0,
+                         {'max_cycles': 5000, 'clock': fake.clock,
+                          'sleep': fake.sleep})
+    assert stats['late_batches'] == stats['batches']
+    assert stats['max_late_usec'] > 1000
+    assert fake.sleeps == []
+
+    fake = FakeTime(work=0.2)
+    chip = load(FOREVER)
+    _, stats = run_paced(chip, 'rom', 0,
+                         {'max_cycles': 1000, 'clock': fake.clock,
+                          'sleep': fake.sleep})
+    assert stats['resyncs'] == stats['batches']
+    assert stats['max_late_usec'] > RESYNC_USEC
+
+
+def test_idle_loop_passes_time():
+    """Waiting in an idle loop passes time until an input changes."""
+    fake = FakeTime()
+    chip = load(WAIT)
+
+    def sleep(seconds):
+        fake.sleep(seconds)
+        if fake.now > 0.05:
+            chip.write_pin10(1)
+
+    reason, stats = run_paced(chip, 'rom', 0,
+                              {'max_cycles': 100000, 'clock': fake.clock,
+                               'sleep': sleep})
+    assert reason == 'END'
+    assert stats['idle_batches'] > 20
+    assert 0.05 < stats['emulated_usec'] / 1e6 < 0.06
+
+
+def test_limits_and_breakpoints():
+    """The run limits apply to the whole run."""
+    fake = FakeTime()
+    options = {'clock': fake.clock, 'sleep': fake.sleep}
+    chip = load(FOREVER)
+    assert run_paced(chip, 'rom', 0, dict(options, max_instructions=1000))[0] \
+        == 'INSTRUCTIONS'
+    assert chip.CYCLES == 2 + 333 * 4
+
+    chip = load(WAIT)
+    assert run_paced(chip, 'rom', 0, dict(options, max_time=0.01))[0] == \
+        'TIME'
+
+    chip = load(FOREVER)
+    assert run_paced(chip, 'rom', 0, dict(options, batch_usec=10.8 * 6,
+                                          breakpoints=[3]))[0] == 'BREAK'
+
+
+def test_execute_paced():
+    """execute() paces against the real clock when asked to."""
+    chip = load(FOREVER)
+    options = {'paced': True, 'max_cycles': 2000}
+    assert execute(chip, 'rom', 0, False, True, chip.OPERATIONS, options)
+    assert options['reason'] == 'CYCLES'
+    pacing = options['pacing']
+    assert pacing['elapsed_usec'] >= pacing['emulated_usec'] * 0.99
+    assert pacing['slept'] > 0
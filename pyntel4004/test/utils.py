@@ -1,5 +1,6 @@
 
 from hardware.processor import Processor
+from hardware.suboperations.digest import DIGEST_COMPONENTS
 
 ###############################################################################
 # Only used during testing to construct a command register of varying formats #
@@ -44,68 +45,29 @@ def encode_command_register(chip, register, address, shape):
     return command_register
 
 
+# Components of the state listed by is_same
+IS_SAME_COMPONENTS = {'': DIGEST_COMPONENTS, 'RAM': ('ram',),
+                      'REGISTERS': ('registers',),
+                      'COMMAND_REGISTER': ('ram',)}
+
+
 def is_same(chip1: Processor, chip2: Processor, component: str):
-    """Individual assertions that the two supplied chips are identical."""
+    """Assert that the two supplied chips are identical."""
     # Valid component values are:
     #
     # ''                ALL components
     # RAM               RAM
     # REGISTERS         Registers
     # COMMAND_REGISTER  Command Register
-
-    if component != '':
-        # skipcq: PYL-PYL-W0123
-        print('chip1:  ' + str(eval(('chip1.' + component))))
-        # skipcq: PYL-PYL-W0123
-        print('chip2:  ' + str(eval(('chip2.' + component))))
-
-    # Check RAM content
-    if component == 'RAM':
-        for i in range(4095):
-            if chip1.RAM[i] != chip2.RAM[i]:
-                print('RAM Location: ', i, '   ',
-                      chip1.RAM[i], '    ', chip2.RAM[i])
-            assert chip1.RAM[i] == chip2.RAM[i]
-
-    # Check Registers content
-    if component == 'REGISTERS':
-        for i in range(15):
-            if chip1.REGISTERS[i] != chip2.REGISTERS[i]:
-                print('Register: ', i, '   ',
-                      chip1.REGISTERS[i], '    ', chip2.REGISTERS[i])
-            assert chip1.REGISTERS[i] == chip2.REGISTERS[i]
-
-    # Check command registers
-    assert chip1.COMMAND_REGISTERS == chip2.COMMAND_REGISTERS
-
-    assert chip1.RAM == chip2.RAM
-    assert chip1.RAM_PORT == chip2.RAM_PORT
-
-    # Check ROM content
-    assert chip1.ROM == chip2.ROM
-    assert chip1.ROM_PORT == chip2.ROM_PORT
-
-    # Check PRAM, Registers and Stack
-    assert chip1.PRAM == chip2.PRAM
-    assert chip1.REGISTERS == chip2.REGISTERS
-    assert chip1.STACK == chip2.STACK
-
-    # Check Command Register
-    assert chip1.COMMAND_REGISTER == chip2.COMMAND_REGISTER
-
-    # Check RAM status characters
-    assert chip1.STATUS_CHARACTERS == chip2.STATUS_CHARACTERS
-
-    assert chip1.PIN_10_SIGNAL_TEST == chip2.PIN_10_SIGNAL_TEST
-
-    # Check Internals
-    assert chip1.ACCUMULATOR == chip2.ACCUMULATOR
-    assert chip1.ACBR == chip2.ACBR
-    assert chip1.STACK_POINTER == chip2.STACK_POINTER
-    assert chip1.PROGRAM_COUNTER == chip2.PROGRAM_COUNTER
-    assert chip1.CURRENT_DRAM_BANK == chip2.CURRENT_DRAM_BANK
-    assert chip1.CURRENT_RAM_BANK == chip2.CURRENT_RAM_BANK
-    assert chip1.CARRY == chip2.CARRY
-    assert chip1.WPM_COUNTER == chip2.WPM_COUNTER
-
+    #
+    # The whole state of the chips is compared by digest; if the digests
+    # differ, the items of the component which differ are printed (see
+    # Processor.diff).
+
+    same = chip1.digest() == chip2.digest()
+    if not same:
+        for difference in chip1.diff(chip2, IS_SAME_COMPONENTS[component]):
+            print(difference['item'] + ':  ', difference['first'],
+                  '    ', difference['second'])
+    assert same
     return True